@@ -1,16 +1,70 @@
-from langchain_chroma import Chroma
+from typing import Any, Callable, Optional
+from backend.services.chroma_client import get_chroma_client
 from backend.services.embedding_model import get_embedding_model
+from backend.services.vector_collections import active_collection_name, collection_embedding, collection_metadata
 from backend.utils.config import settings
 
-def get_vectorstore():
-    embedding_function = get_embedding_model()
+# Callers rely on the LangChain VectorStore interface plus:
+#   - delete(ids=...) and delete(where={"document_id": {"$in": [...]}})
+#   - get_by_ids(ids) returning documents with .id set
+#   - similarity_search_with_score returning cosine distances
+VECTOR_STORE_BACKENDS = ("chroma", "numpy")
+
+# The numpy index keeps its rows in memory, so one instance per process
+_numpy_store = None
+
+def get_vectorstore(collection_name: Optional[str] = None):
+    if settings.VECTOR_STORE_BACKEND == "numpy":
+        return _get_numpy_store()
+    if settings.VECTOR_STORE_BACKEND != "chroma":
+        raise ValueError(
+            f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}. "
+            f"Supported: {', '.join(VECTOR_STORE_BACKENDS)}"
+        )
+    # Imported on first use, langchain_chroma loads chromadb
+    from langchain_chroma import Chroma
+
+    # Changes when the collection is rebuilt, see services/vector_collections.py
+    collection_name = collection_name or active_collection_name()
+    # Queries must be embedded with the model the collection was built with
+    embedding_function = get_embedding_model(collection_embedding(collection_name))
     return Chroma(
-        collection_name="rag_collection",
+        collection_name=collection_name,
         embedding_function=embedding_function,
-        persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
-        collection_metadata={"hnsw:space": "cosine"}  # Cosine similarity
+        # Embedded, or the shared server when CHROMA_SERVER_URL is set
+        client=get_chroma_client(),
+        # Cosine similarity; HNSW parameters and embedding model only apply when the collection is created
+        collection_metadata=collection_metadata()
     )
 
+def write_to_vectorstore(write: Callable[[Any], Any]):
+    """
+    Apply `write(vectorstore)` to the active collection. If this worker saw a
+    rebuild swap collections while it ran, the write is repeated on the new
+    one so it isn't lost with the old collection; a swap it hasn't seen yet is
+    caught up by the rebuild itself.
+    """
+    if settings.VECTOR_STORE_BACKEND != "chroma":
+        return write(get_vectorstore())
+    name = active_collection_name()
+    result = write(get_vectorstore(name))
+    current = active_collection_name()
+    if current != name:
+        result = write(get_vectorstore(current))
+    return result
+
+def _get_numpy_store():
+    global _numpy_store
+    if _numpy_store is None:
+        from backend.services.numpy_vectorstore import NumpyVectorStore
+        _numpy_store = NumpyVectorStore(
+            settings.VECTOR_INDEX_DIRECTORY,
+            get_embedding_model(),
+            dtype=settings.VECTOR_INDEX_DTYPE,
+            dimensions=settings.VECTOR_INDEX_DIMENSIONS,
+        )
+    return _numpy_store
+
 def get_retriever():
     vectorstore = get_vectorstore()
     return vectorstore.as_retriever(search_kwargs={"k": 5})
@@ -1,8 +1,21 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from backend.routes import auth, admin, chat
 from backend.services.sqlite_client import init_db
+from backend.services.chat_log_writer import chat_log_writer
 from backend.services.langsmith_client import setup_langsmith
+from backend.services.metrics import render_metrics
+from backend.services.tracing import trace_store
+from backend.services.corpus_stats import run_reconciliation
+from backend.services.document_deleter import run_vector_delete_purge
+from backend.services.http_clients import close_http_clients
+from backend.services.chroma_client import close_chroma_executor
+from backend.services.instant_answers import instant_answers
+from backend.services.runtime_settings import runtime_settings
+from backend.services.vector_collections import refresh_active_collection, run_active_collection_refresh
+from backend.services.warmup import get_warmup_status, is_ready, warm_up
 from backend.utils.config import settings
 
 app = FastAPI(title=settings.PROJECT_NAME)
@@ -18,8 +31,46 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    setup_langsmith()
+    # LangSmith project setup does network I/O; keep it off the event loop
+    await asyncio.to_thread(setup_langsmith)
     await init_db()
+    await chat_log_writer.start()
+    await trace_store.start()
+    # Seeds the default greetings on a new database
+    await instant_answers.start()
+    # Loads the /admin/settings overrides and follows later changes
+    await runtime_settings.start()
+    if settings.VECTOR_STORE_BACKEND == "chroma":
+        # Before warm-up, which loads the active collection's index
+        await refresh_active_collection()
+    app.state.background_tasks = [
+        asyncio.create_task(run_reconciliation(settings.STATS_RECONCILE_INTERVAL)),
+        # Finish vector deletes left over from a failed or interrupted delete,
+        # now and periodically, retrying sooner after a failure
+        asyncio.create_task(run_vector_delete_purge(
+            settings.VECTOR_DELETE_PURGE_INTERVAL,
+            settings.VECTOR_DELETE_RETRY_SECONDS,
+            settings.VECTOR_DELETE_RETRY_MAX_SECONDS,
+        )),
+        # Load the index, open connections etc. before /ready reports ready
+        asyncio.create_task(warm_up()),
+    ]
+    if settings.VECTOR_STORE_BACKEND == "chroma":
+        # Followed from here on so rebuilds done by another worker are picked
+        # up without a database read per query
+        app.state.background_tasks.append(asyncio.create_task(run_active_collection_refresh()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in app.state.background_tasks:
+        task.cancel()
+    # Drain queued chat messages before the worker exits
+    await chat_log_writer.close()
+    await trace_store.close()
+    await instant_answers.close()
+    await runtime_settings.close()
+    await close_http_clients()
+    close_chroma_executor()
 
 app.include_router(auth.router, prefix=settings.API_V1_STR + "/auth")
 app.include_router(admin.router, prefix=settings.API_V1_STR)
@@ -28,3 +79,13 @@ app.include_router(chat.router, prefix=settings.API_V1_STR)
 @app.get("/")
 async def root():
     return {"message": "RAG Web API is running"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    return JSONResponse(get_warmup_status(), status_code=200 if is_ready() else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,15 +1,13 @@
 import shutil
 import os
 import uuid
-from typing import List
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from backend.services.sqlite_client import (
     create_document, 
     get_all_documents, 
     get_documents_paginated,
     get_document_count,
-    get_total_chunks,
-    delete_document, 
     get_all_users,
     get_users_paginated,
     get_user_count,
@@ -20,10 +18,25 @@ from backend.services.sqlite_client import (
 )
 from backend.services.chunker import chunk_text
 from backend.services.file_converter import convert_to_markdown, get_supported_extensions
-from backend.chains.retriever_chroma import get_vectorstore
+from backend.chains.retriever_chroma import write_to_vectorstore
+from backend.services.chroma_client import run_chroma
 from backend.utils.security import require_admin, get_password_hash
 from backend.utils.config import settings
-from backend.services.langsmith_client import get_recent_traces
+from backend.services.tracing import start_span, get_recent_traces
+from backend.services.corpus_stats import corpus_stats
+from backend.services.document_deleter import delete_documents
+from backend.services.context_selector import get_selection_params
+from backend.services.runtime_settings import Experiment, runtime_settings
+from backend.services.instant_answers import instant_answers
+from backend.services.vector_collections import (
+    describe_active_collection,
+    get_rebuild_status,
+    params_with,
+    start_rebuild,
+)
+from backend.services.model_scheduler import model_scheduler
+from backend.services.metrics import INGESTION_STAGE_SECONDS, INGESTION_DOCUMENTS_TOTAL, INGESTION_CHUNKS_TOTAL
+from dataclasses import asdict
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -33,6 +46,7 @@ async def upload_documents(
     files: List[UploadFile] = File(...),
     current_user: dict = Depends(require_admin)
 ):
+    span = start_span("upload_documents", files=len(files))
     supported = get_supported_extensions()
     results = []
     errors = []
@@ -45,31 +59,48 @@ async def upload_documents(
                 raise ValueError(f"Unsupported file type: {ext}. Supported: {', '.join(supported)}")
             
             # 1. Read content
-            content = await file.read()
+            with INGESTION_STAGE_SECONDS.time(stage="read"):
+                content = await file.read()
             
             # 2. Convert to Markdown (universal converter)
-            markdown_text = convert_to_markdown(content, file.filename)
+            with INGESTION_STAGE_SECONDS.time(stage="convert"):
+                markdown_text = convert_to_markdown(content, file.filename)
             
             # 3. Chunk using Markdown-aware splitter
-            chunks = chunk_text(markdown_text)
+            with INGESTION_STAGE_SECONDS.time(stage="chunk"):
+                tuning = runtime_settings.get()
+                chunks = chunk_text(markdown_text, tuning.chunk_size, tuning.chunk_overlap)
             
             # 4. ID generation
             doc_id = str(uuid.uuid4())
             
-            # 5. Add to Chroma
-            vectorstore = get_vectorstore()
-            # Add metadata to allow deletion by doc_id
-            metadatas = [{"document_id": doc_id, "source": file.filename} for _ in chunks]
-            vectorstore.add_texts(texts=chunks, metadatas=metadatas)
+            # 5. Add to Chroma (embedding happens here)
+            with INGESTION_STAGE_SECONDS.time(stage="embed_store"):
+                # Deterministic chunk ids let deletes go by id; metadata keeps doc_id for filtering
+                chunk_ids = [f"{doc_id}:{i}" for i in range(len(chunks))]
+                metadatas = [
+                    {"document_id": doc_id, "source": file.filename, "chunk_index": i}
+                    for i in range(len(chunks))
+                ]
+                # Lowest-priority model traffic, so uploads can't starve chat turns
+                async with model_scheduler.slot("ingest"):
+                    await run_chroma(
+                        write_to_vectorstore,
+                        lambda vectorstore: vectorstore.add_texts(texts=chunks, metadatas=metadatas, ids=chunk_ids),
+                    )
             
             # 6. Save to SQLite
             doc_data = {
                 "id": doc_id,
                 "filename": file.filename,
-                "chunk_count": len(chunks)
+                "chunk_count": len(chunks),
+                "chunk_ids": chunk_ids
             }
-            await create_document(doc_data)
+            with INGESTION_STAGE_SECONDS.time(stage="persist"):
+                await create_document(doc_data)
             
+            INGESTION_DOCUMENTS_TOTAL.inc(status="success")
+            INGESTION_CHUNKS_TOTAL.inc(len(chunks))
             results.append({
                 "id": doc_id, 
                 "filename": file.filename, 
@@ -77,12 +108,20 @@ async def upload_documents(
                 "status": "success"
             })
         except Exception as e:
+            INGESTION_DOCUMENTS_TOTAL.inc(status="failed")
             errors.append({
                 "filename": file.filename,
                 "error": str(e),
                 "status": "failed"
             })
     
+    span.set(
+        uploaded=len(results),
+        failed=len(errors),
+        chunks=sum(r["chunks"] for r in results),
+    )
+    span.end("error" if errors and not results else "success")
+
     return {
         "uploaded": len(results),
         "failed": len(errors),
@@ -112,19 +151,12 @@ async def list_documents(
 
 @router.delete("/documents/{doc_id}")
 async def delete_doc(doc_id: str, current_user: dict = Depends(require_admin)):
-    # Delete from SQLite
-    await delete_document(doc_id)
-    
-    # Delete from Chroma
-    vectorstore = get_vectorstore()
-    # Accessing the underlying collection to delete by metadata
-    try:
-        vectorstore._collection.delete(where={"document_id": doc_id})
-    except Exception as e:
-        # Log error but don't fail if already deleted or issue with Chroma
-        print(f"Error deleting from Chroma: {e}")
-    
-    return {"status": "deleted", "id": doc_id}
+    result = await delete_documents([doc_id])
+    return {
+        "status": "deleted",
+        "id": doc_id,
+        "pending_vector_deletes": result["pending_vector_deletes"]
+    }
 
 
 class BulkDeleteRequest(BaseModel):
@@ -134,47 +166,217 @@ class BulkDeleteRequest(BaseModel):
 @router.post("/documents/bulk-delete")
 async def bulk_delete_docs(request: BulkDeleteRequest, current_user: dict = Depends(require_admin)):
     """Delete multiple documents at once."""
-    deleted = []
-    errors = []
-    
-    vectorstore = get_vectorstore()
-    
-    for doc_id in request.document_ids:
-        try:
-            # Delete from SQLite
-            await delete_document(doc_id)
-            
-            # Delete from Chroma
-            try:
-                vectorstore._collection.delete(where={"document_id": doc_id})
-            except Exception as e:
-                print(f"Error deleting {doc_id} from Chroma: {e}")
-            
-            deleted.append(doc_id)
-        except Exception as e:
-            errors.append({"id": doc_id, "error": str(e)})
+    try:
+        result = await delete_documents(request.document_ids)
+    except Exception as e:
+        # The SQLite transaction rolled back, so nothing was deleted
+        raise HTTPException(status_code=500, detail=f"Bulk delete failed: {e}")
     
     return {
-        "deleted_count": len(deleted),
-        "deleted": deleted,
-        "errors": errors
+        "deleted_count": len(result["deleted"]),
+        "deleted": result["deleted"],
+        "not_found": result["not_found"],
+        "pending_vector_deletes": result["pending_vector_deletes"],
+        "errors": [{"id": doc_id, "error": "Document not found"} for doc_id in result["not_found"]]
     }
 
 
 @router.get("/stats")
 async def get_stats(current_user: dict = Depends(require_admin)):
-    doc_count = await get_document_count()
-    total_chunks = await get_total_chunks()
-    user_count = await get_user_count()
-    traces = get_recent_traces(limit=10)
+    stats = await corpus_stats.get()
+    traces = await get_recent_traces(limit=10)
     return {
-        "total_documents": doc_count,
-        "total_chunks": total_chunks,
-        "total_users": user_count,
+        "total_documents": stats["documents"],
+        "total_chunks": stats["chunks"],
+        "total_users": stats["users"],
+        "total_chat_sessions": stats["chat_sessions"],
+        "total_chat_messages": stats["chat_messages"],
+        "ingest_daily": stats["ingest_daily"],
+        "stats_version": stats["version"],
+        "instant_answers_daily": await instant_answers.get_daily(),
         "recent_traces": traces
     }
 
 
+@router.post("/stats/reconcile")
+async def reconcile_stats(current_user: dict = Depends(require_admin)):
+    """Recount the materialized stats from scratch and report any drift."""
+    drift = await corpus_stats.reconcile()
+    return {"drift": drift}
+
+
+class SelectionUpdate(BaseModel):
+    candidate_k: Optional[int] = None
+    min_k: Optional[int] = None
+    max_k: Optional[int] = None
+    max_distance: Optional[float] = None
+    relative_margin: Optional[float] = None
+    elbow_gap: Optional[float] = None
+
+
+@router.get("/retrieval/selection")
+async def get_selection(current_user: dict = Depends(require_admin)):
+    return asdict(get_selection_params())
+
+
+@router.put("/retrieval/selection")
+async def update_selection(update: SelectionUpdate, current_user: dict = Depends(require_admin)):
+    """Tune context selection without a restart; an explicit null disables a cutoff."""
+    try:
+        tuning = await runtime_settings.update(update.model_dump(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return asdict(tuning.selection())
+
+
+class ExperimentUpdate(BaseModel):
+    name: str
+    variants: Dict[str, Dict[str, Any]]
+    weights: Dict[str, float] = {}
+
+
+@router.get("/settings")
+async def get_runtime_settings(current_user: dict = Depends(require_admin)):
+    return runtime_settings.describe()
+
+
+@router.put("/settings")
+async def update_runtime_settings(changes: Dict[str, Any], current_user: dict = Depends(require_admin)):
+    """
+    Override performance settings for every worker without a restart; they
+    pick the change up within a second. chunk_size / chunk_overlap apply to
+    documents uploaded afterwards.
+    """
+    try:
+        await runtime_settings.update(changes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return runtime_settings.describe()
+
+
+@router.put("/settings/experiment")
+async def start_settings_experiment(experiment: ExperimentUpdate, current_user: dict = Depends(require_admin)):
+    """Split chat traffic between variants (overrides on top of the current settings) by user."""
+    try:
+        return await runtime_settings.start_experiment(Experiment(**experiment.model_dump()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/settings/experiment")
+async def stop_settings_experiment(current_user: dict = Depends(require_admin)):
+    return await runtime_settings.stop_experiment()
+
+
+@router.delete("/settings")
+async def reset_runtime_settings(current_user: dict = Depends(require_admin)):
+    await runtime_settings.reset()
+    return runtime_settings.describe()
+
+
+@router.delete("/settings/{name}")
+async def reset_runtime_setting(name: str, current_user: dict = Depends(require_admin)):
+    try:
+        await runtime_settings.reset([name])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return runtime_settings.describe()
+
+
+class InstantAnswerUpdate(BaseModel):
+    pattern: str
+    response: str
+    fuzzy: bool = True
+
+
+class InstantAnswerTest(BaseModel):
+    query: str
+
+
+@router.get("/instant-answers")
+async def list_instant_answers(days: int = 30, current_user: dict = Depends(require_admin)):
+    """Canned answers with their hits, and per day how many LLM calls they saved."""
+    return await instant_answers.describe(days)
+
+
+@router.post("/instant-answers")
+async def create_instant_answer(answer: InstantAnswerUpdate, current_user: dict = Depends(require_admin)):
+    try:
+        created = await instant_answers.create(answer.pattern, answer.response, answer.fuzzy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return asdict(created)
+
+
+@router.post("/instant-answers/match")
+async def test_instant_answer(test: InstantAnswerTest, current_user: dict = Depends(require_admin)):
+    """Which answer, if any, a chat message would get."""
+    match = await instant_answers.match(test.query)
+    if match is None:
+        return {"match": None}
+    return {
+        "match": match.kind,
+        "distance": match.distance,
+        "answer": asdict(match.answer) if match.answer else None,
+        "response": match.response,
+    }
+
+
+@router.put("/instant-answers/{answer_id}")
+async def update_instant_answer(answer_id: int, answer: InstantAnswerUpdate, current_user: dict = Depends(require_admin)):
+    try:
+        updated = await instant_answers.update(answer_id, answer.pattern, answer.response, answer.fuzzy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Instant answer not found")
+    return asdict(updated)
+
+
+@router.delete("/instant-answers/{answer_id}")
+async def delete_instant_answer(answer_id: int, current_user: dict = Depends(require_admin)):
+    if not await instant_answers.delete(answer_id):
+        raise HTTPException(status_code=404, detail="Instant answer not found")
+    return {"status": "deleted", "id": answer_id}
+
+
+class HnswUpdate(BaseModel):
+    m: Optional[int] = None
+    construction_ef: Optional[int] = None
+    search_ef: Optional[int] = None
+    batch_size: Optional[int] = None
+    sync_threshold: Optional[int] = None
+
+
+@router.get("/vectorstore")
+async def get_vectorstore_info(current_user: dict = Depends(require_admin)):
+    if settings.VECTOR_STORE_BACKEND != "chroma":
+        return {"backend": settings.VECTOR_STORE_BACKEND}
+    info = await run_chroma(describe_active_collection)
+    return {"backend": "chroma", **info, "rebuild": get_rebuild_status()}
+
+
+@router.put("/vectorstore/hnsw")
+async def update_hnsw(update: HnswUpdate, current_user: dict = Depends(require_admin)):
+    """
+    Change HNSW parameters of the Chroma collection. Chroma only reads them
+    when loading an index, search_ef included, so this rebuilds the collection
+    in the background from its stored embeddings and swaps it in when done
+    (progress in GET /admin/vectorstore).
+    """
+    if settings.VECTOR_STORE_BACKEND != "chroma":
+        raise HTTPException(status_code=400, detail="HNSW parameters only apply to the chroma backend")
+    changes = update.model_dump(exclude_unset=True)
+    try:
+        params = await run_chroma(params_with, **changes)
+        status = await start_rebuild(params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"rebuild": True, "status": status}
+
+
 @router.get("/users")
 async def list_users_route(
     page: int = 1, 
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend.chains.rag_chain import get_rag_chain
+from backend.chains.rag_chain import get_rag_chain, format_docs_with_refs, count_prompt_tokens
 from backend.utils.security import require_user, require_admin
 from typing import Optional
 import uuid
+import hashlib
 import json
 import asyncio
 import logging
@@ -12,11 +13,22 @@ import math
 import re
 import time
 from backend.chains.retriever_chroma import get_vectorstore
+from backend.services.chroma_client import run_chroma
 from backend.services.query_classifier import is_reimbursement_related_async, get_chat_response
+from backend.services.instant_answers import instant_answers, llm_calls_saved
 from backend.services.query_rewriter import rewrite_query_with_context
+from backend.services.chat_log_writer import create_chat_message, get_chat_history, flush_chat_log
+from backend.services.metrics import CHAT_STAGE_SECONDS, CHAT_REQUEST_SECONDS, CHAT_ROUTE_TOTAL, CHAT_ERRORS_TOTAL, RAG_PROMPT_TOKENS_TOTAL, RAG_MODEL_TOTAL, RAG_GENERATION_SECONDS, EXPERIMENT_REQUEST_SECONDS, record_llm_usage
+from backend.services.tracing import start_span
+from backend.services.single_flight import SingleFlight
+from backend.services.corpus_stats import corpus_version
+from backend.services.retrieval_cache import retrieval_cache
+from backend.services.context_selector import select_context
+from backend.services.runtime_settings import RuntimeSettings, runtime_settings
+from backend.services.context_packer import pack_context
+from backend.services.model_router import query_signals, choose_generation_model
+from backend.services.model_scheduler import SchedulerBusy, model_scheduler
 from backend.services.sqlite_client import (
-    create_chat_message, 
-    get_chat_history, 
     get_user_by_username,
     create_chat_session,
     get_user_sessions,
@@ -63,9 +75,113 @@ async def delete_session_route(session_id: str, current_user: dict = Depends(req
     if session_id not in session_ids:
         raise HTTPException(status_code=403, detail="Not authorized to delete this session")
     
+    # Make sure no queued messages land after the session is gone
+    await flush_chat_log()
     await delete_session(session_id)
     return {"status": "deleted", "id": session_id}
 
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?!.")
+
+
+BUSY_MESSAGE = "Server sedang sibuk, silakan coba lagi sebentar lagi."
+
+classify_flight = SingleFlight("classify")
+rag_flight = SingleFlight("rag_answer")
+
+
+async def rag_answer(search_query: str, question: str, chat_history: str, tuning: RuntimeSettings):
+    """
+    Retrieve, select, pack, route and stream one RAG answer with the given
+    runtime settings.
+
+    Yields ("context", info) once retrieval is done, ("token", text) while
+    generating, and finally ("answer", info) with the full response. Stage
+    metrics are recorded here, once per upstream run.
+    """
+    vectorstore = get_vectorstore()
+    
+    # Retrieve relevant documents using rewritten query
+    t3 = time.time()
+    k = tuning.candidate_k
+    if tuning.retrieval_cache_enabled:
+        docs_with_scores = await retrieval_cache.search(vectorstore, search_query, k, normalize_query(search_query))
+    else:
+        async with model_scheduler.slot("query"):
+            docs_with_scores = await run_chroma(vectorstore.similarity_search_with_score, search_query, k=k)
+    retrieval_time = time.time() - t3
+    CHAT_STAGE_SECONDS.observe(retrieval_time, stage="retrieval")
+    logger.info(f"[{retrieval_time:.2f}s] RETRIEVED {len(docs_with_scores)} DOCUMENTS")
+    retrieved = len(docs_with_scores)
+    
+    # Drop weak matches, then dedupe/merge into the token budget;
+    # [ref:N] numbering follows the packed list
+    docs_with_scores, selection = select_context(docs_with_scores, tuning.selection())
+    docs_with_scores, packing = pack_context(docs_with_scores, tuning.context_token_budget, tuning.duplicate_threshold)
+    logger.info(
+        f"CONTEXT: kept {selection['kept']} chunks ({selection['kept_tokens']} tokens), "
+        f"dropped {selection['dropped']} ({selection['dropped_tokens']} tokens), cutoff: {selection['cutoff']}; "
+        f"packed {packing['passages']} passages ({packing['tokens']} tokens), "
+        f"{packing['duplicates']} duplicates, {packing['merged']} merged, {packing['over_budget']} over budget"
+    )
+    
+    context = format_docs_with_refs([doc for doc, score in docs_with_scores])
+    prompt_tokens = count_prompt_tokens(context, chat_history, question)
+    RAG_PROMPT_TOKENS_TOTAL.inc(prompt_tokens["static"], part="static")
+    RAG_PROMPT_TOKENS_TOTAL.inc(prompt_tokens["dynamic"], part="dynamic")
+    
+    # Simple single-report lookups go to the smaller model
+    signals = query_signals(question, docs_with_scores, packing["tokens"], chat_history)
+    model, model_rule = choose_generation_model(signals, tuning.model_policy, tuning.default_model)
+    chain = get_rag_chain(model)
+    RAG_MODEL_TOTAL.inc(model=model, rule=model_rule)
+    logger.info(f"MODEL: {model} (rule: {model_rule}, signals: {signals})")
+    
+    yield "context", {
+        "docs_with_scores": docs_with_scores,
+        "retrieval": retrieval_time,
+        "retrieved": retrieved,
+        "context": selection,
+        "packing": packing,
+        "prompt_tokens": prompt_tokens,
+        "model": model,
+        "model_rule": model_rule,
+        "model_signals": signals,
+    }
+    
+    # langchain_core.callbacks pulls in the LangSmith tracer; imported on first use
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+    usage_handler = UsageMetadataCallbackHandler()
+    full_response = ""
+    t4 = time.time()
+    first_token_time = None
+    # The slot is held until the stream ends; the wait counts toward first token
+    async with model_scheduler.slot("chat"):
+        async for chunk in chain.astream({
+            "context": context,
+            "question": question,
+            "chat_history": chat_history
+        }, config={"callbacks": [usage_handler]}):
+            if chunk:
+                if first_token_time is None:
+                    first_token_time = time.time() - t4
+                    CHAT_STAGE_SECONDS.observe(first_token_time, stage="first_token")
+                    RAG_GENERATION_SECONDS.observe(first_token_time, model=model, phase="first_token")
+                    logger.info(f"[{first_token_time:.2f}s] First token received")
+                full_response += chunk
+                yield "token", chunk
+    
+    generation_time = time.time() - t4
+    CHAT_STAGE_SECONDS.observe(generation_time, stage="generation")
+    RAG_GENERATION_SECONDS.observe(generation_time, model=model, phase="total")
+    yield "answer", {
+        "response": full_response,
+        "usage": record_llm_usage(usage_handler.usage_metadata),
+        "upstream_first_token": first_token_time,
+        "upstream_generation": generation_time,
+    }
+
+
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest, current_user: dict = Depends(require_user)):
     user = await get_user_by_username(current_user["username"])
@@ -81,88 +197,124 @@ async def chat_stream(request: ChatRequest, current_user: dict = Depends(require
     history = await get_chat_history(session_id)
     formatted_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
     
-    await create_chat_message(user_id, "user", request.query, session_id)
+    with CHAT_STAGE_SECONDS.time(stage="persistence"):
+        await create_chat_message(user_id, "user", request.query, session_id)
     
     async def generate():
+        # One settings snapshot per turn; an experiment variant is stable per user
+        tuning, experiment, variant = runtime_settings.assign(user_id)
+        span = start_span(
+            "chat_stream", session_id=session_id, query=request.query,
+            settings_version=runtime_settings.version, experiment=experiment, variant=variant,
+        )
+        
+        def observe_request(total_time: float, route: str):
+            CHAT_REQUEST_SECONDS.observe(total_time, route=route)
+            if variant:
+                EXPERIMENT_REQUEST_SECONDS.observe(total_time, experiment=experiment, variant=variant, route=route)
+        
         try:
             start_time = time.time()
             
             yield f"data: {json.dumps({'type': 'session_id', 'session_id': session_id})}\n\n"
             
-            # Check for simple greetings FIRST (no LLM needed)
-            from backend.services.query_classifier import is_simple_greeting, get_instant_response
-            if is_simple_greeting(request.query):
-                response = get_instant_response(request.query)
+            # Greetings and other canned answers FIRST (no LLM needed)
+            instant = await instant_answers.match(request.query, tuning.instant_answer_max_distance)
+            if instant:
+                response = instant.response
                 
                 # Stream instantly
                 for word in response.split():
                     yield f"data: {json.dumps({'type': 'token', 'content': word + ' '})}\n\n"
                 
-                await create_chat_message(user_id, "assistant", response, session_id)
+                with CHAT_STAGE_SECONDS.time(stage="persistence"):
+                    await create_chat_message(user_id, "assistant", response, session_id)
                 total_time = time.time() - start_time
-                logger.info(f"INSTANT RESPONSE: {total_time:.2f}s (simple greeting)")
+                instant_answers.record_hit(
+                    instant, llm_calls_saved(request.query, formatted_history, tuning.rewrite_max_words)
+                )
+                CHAT_ROUTE_TOTAL.inc(route="greeting")
+                observe_request(total_time, "greeting")
+                span.set(
+                    route="greeting",
+                    instant_match=instant.kind,
+                    instant_pattern=instant.answer.pattern if instant.answer else None,
+                )
+                logger.info(f"INSTANT RESPONSE: {total_time:.2f}s ({instant.kind} match)")
                 yield f"data: {json.dumps({'type': 'done'})}\n\n"
                 return
             
             # Rewrite query with context (for non-greeting queries)
             t1 = time.time()
-            search_query = await rewrite_query_with_context(request.query, formatted_history)
+            search_query = await rewrite_query_with_context(request.query, formatted_history, tuning)
             rewrite_time = time.time() - t1
+            CHAT_STAGE_SECONDS.observe(rewrite_time, stage="rewrite")
+            span.set(search_query=search_query, rewrite=rewrite_time)
             logger.info(f"[{rewrite_time:.2f}s] QUERY REWRITING: '{request.query}' -> '{search_query}'")
             
             # Check if query needs RAG retrieval
             t2 = time.time()
-            needs_rag = await is_reimbursement_related_async(search_query)
+            if tuning.coalesce_enabled:
+                needs_rag = await classify_flight.run(
+                    (normalize_query(search_query), variant), lambda: is_reimbursement_related_async(search_query, tuning)
+                )
+            else:
+                needs_rag = await is_reimbursement_related_async(search_query, tuning)
             classify_time = time.time() - t2
+            CHAT_STAGE_SECONDS.observe(classify_time, stage="classify")
+            span.set(classify=classify_time)
             logger.info(f"[{classify_time:.2f}s] CLASSIFICATION: Needs RAG = {needs_rag}")
             
             if not needs_rag:
                 # Non-RAG response (longer conversational messages)
                 t3 = time.time()
-                response = await get_chat_response(request.query)
+                response = await get_chat_response(request.query, tuning)
                 chat_time = time.time() - t3
+                CHAT_STAGE_SECONDS.observe(chat_time, stage="chat")
                 
                 for word in response.split():
                     yield f"data: {json.dumps({'type': 'token', 'content': word + ' '})}\n\n"
                     await asyncio.sleep(0.02)
                 
-                await create_chat_message(user_id, "assistant", response, session_id)
+                with CHAT_STAGE_SECONDS.time(stage="persistence"):
+                    await create_chat_message(user_id, "assistant", response, session_id)
                 total_time = time.time() - start_time
+                CHAT_ROUTE_TOTAL.inc(route="CHAT")
+                observe_request(total_time, "CHAT")
+                span.set(route="CHAT", chat=chat_time)
                 logger.info(f"NON-RAG RESPONSE: {total_time:.2f}s (rewrite: {rewrite_time:.2f}s, classify: {classify_time:.2f}s, chat: {chat_time:.2f}s)")
                 yield f"data: {json.dumps({'type': 'done'})}\n\n"
                 return
             
-            # RAG flow 
-            chain, retriever = get_rag_chain()
-            vectorstore = get_vectorstore()
-            
-            # Retrieve relevant documents using rewritten query
-            t3 = time.time()
-            docs_with_scores = await asyncio.to_thread(
-                vectorstore.similarity_search_with_score,
-                search_query,
-                k=10
-            )
-            retrieval_time = time.time() - t3
-            logger.info(f"[{retrieval_time:.2f}s] RETRIEVED {len(docs_with_scores)} DOCUMENTS")
-            
-            full_response = ""
-            docs = [doc for doc, score in docs_with_scores]
+            # RAG flow; identical concurrent questions share one retrieval and
+            # generation, each client still gets its own persisted message
+            if tuning.coalesce_enabled:
+                key = (
+                    normalize_query(search_query),
+                    normalize_query(request.query),
+                    await corpus_version.get(),
+                    hashlib.sha1(formatted_history.encode()).hexdigest() if formatted_history else "",
+                    variant,
+                )
+                events = rag_flight.stream(key, lambda: rag_answer(search_query, request.query, formatted_history, tuning))
+            else:
+                events = rag_answer(search_query, request.query, formatted_history, tuning)
             
             t4 = time.time()
             first_token_time = None
-            async for chunk in chain.astream({
-                "context": docs,
-                "question": request.query,
-                "chat_history": formatted_history
-            }):
-                if chunk:
+            async for kind, data in events:
+                if kind == "token":
                     if first_token_time is None:
                         first_token_time = time.time() - t4
-                        logger.info(f"[{first_token_time:.2f}s] First token received")
-                    full_response += chunk
-                    yield f"data: {json.dumps({'type': 'token', 'content': chunk})}\n\n"
-            
+                    yield f"data: {json.dumps({'type': 'token', 'content': data})}\n\n"
+                elif kind == "context":
+                    # Events may be shared with other clients, so read without mutating
+                    docs_with_scores = data["docs_with_scores"]
+                    retrieval_time = data["retrieval"]
+                    span.set(**{k: v for k, v in data.items() if k != "docs_with_scores"})
+                elif kind == "answer":
+                    full_response = data["response"]
+                    span.set(**{k: v for k, v in data.items() if k != "response"})
             generation_time = time.time() - t4
             
             # Parse citations from response [ref:N] format
@@ -171,7 +323,8 @@ async def chat_stream(request: ChatRequest, current_user: dict = Depends(require
             
             # Clean response by removing citation markers for saved version
             clean_response = re.sub(r'\s*\[ref:\d+\]', '', full_response)
-            await create_chat_message(user_id, "assistant", clean_response, session_id)
+            with CHAT_STAGE_SECONDS.time(stage="persistence"):
+                await create_chat_message(user_id, "assistant", clean_response, session_id)
             
             # Show only sources that were actually cited by the LLM
             if cited_refs and docs_with_scores:
@@ -201,12 +354,29 @@ async def chat_stream(request: ChatRequest, current_user: dict = Depends(require
                     yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
             
             total_time = time.time() - start_time
+            CHAT_ROUTE_TOTAL.inc(route="RAG")
+            observe_request(total_time, "RAG")
+            span.set(route="RAG", first_token=first_token_time, generation=generation_time)
             logger.info(f"RAG RESPONSE: {total_time:.2f}s (rewrite: {rewrite_time:.2f}s, classify: {classify_time:.2f}s, retrieval: {retrieval_time:.2f}s, generation: {generation_time:.2f}s)")
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
             
+        except SchedulerBusy as e:
+            # Model call queue is full; fail fast so the user can retry
+            logger.warning(f"Chat turn rejected: {e}")
+            CHAT_ROUTE_TOTAL.inc(route="busy")
+            span.end("busy", str(e))
+            yield f"data: {json.dumps({'type': 'error', 'code': 'busy', 'message': BUSY_MESSAGE})}\n\n"
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
+            CHAT_ERRORS_TOTAL.inc()
+            span.end("error", str(e))
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-stream
+            span.end("cancelled")
+            raise
+        finally:
+            span.end()
     
     return StreamingResponse(
         generate(),
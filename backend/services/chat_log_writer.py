@@ -0,0 +1,200 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from backend.services import sqlite_client
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_timestamp() -> str:
+    # Same format as SQLite's CURRENT_TIMESTAMP so ordering stays consistent
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ChatLogWriter:
+    """
+    Write-behind persistence for chat messages.
+
+    Messages are queued in memory and written by a background task in batched
+    transactions, so persisting a turn never sits on the SSE critical path.
+    Messages stay visible to get_history() from the moment they are queued
+    until their batch is committed.
+    """
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 0.05, max_retries: int = 5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue: List[Dict] = []
+        self._pending: Dict[str, List[Dict]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+        # Readers and batch commits exclude each other so a reader never sees
+        # a message both in the database and in the pending buffer.
+        self._flushing = False
+        self._flush_done = asyncio.Event()
+        self._flush_done.set()
+        self._readers = 0
+        self._no_readers = asyncio.Event()
+        self._no_readers.set()
+        self._in_flight = 0
+
+        self.commits = 0
+        self.messages_written = 0
+        self.messages_dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task after draining everything still queued."""
+        if not self.running:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def append(self, user_id: str, role: str, content: str, session_id: str):
+        if not self.running:
+            await sqlite_client.create_chat_message(user_id, role, content, session_id)
+            return
+
+        message = {
+            "user_id": user_id,
+            "role": role,
+            "content": content,
+            "session_id": session_id,
+            "created_at": _utc_timestamp(),
+        }
+        self._pending[session_id].append(message)
+        self._queue.append(message)
+        self._wakeup.set()
+
+    async def get_history(self, session_id: str) -> List[Dict]:
+        while self._flushing:
+            await self._flush_done.wait()
+
+        self._readers += 1
+        self._no_readers.clear()
+        try:
+            rows = await sqlite_client.get_chat_history(session_id)
+            pending = self._pending.get(session_id, ())
+            return rows + [
+                {"role": m["role"], "content": m["content"], "created_at": m["created_at"]}
+                for m in pending
+            ]
+        finally:
+            self._readers -= 1
+            if self._readers == 0:
+                self._no_readers.set()
+
+    async def flush(self):
+        """Wait until every message queued so far has been committed."""
+        if not self.running:
+            return
+        self._wakeup.set()
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._queue and not self._in_flight)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": len(self._queue) + self._in_flight,
+            "commits": self.commits,
+            "messages_written": self.messages_written,
+            "messages_dropped": self.messages_dropped,
+        }
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._closing:
+                # Give concurrent streams a moment to join the same batch
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+
+            while self._queue:
+                batch = self._queue[:self.batch_size]
+                del self._queue[:self.batch_size]
+                await self._write_batch(batch)
+                # Let readers blocked on this batch through before the next one
+                await asyncio.sleep(0)
+
+            if self._closing:
+                return
+
+    async def _write_batch(self, batch: List[Dict]):
+        self._in_flight += len(batch)
+        try:
+            for attempt in range(1, self.max_retries + 1):
+                if await self._commit(batch):
+                    return
+                logger.error(f"Chat log flush failed (attempt {attempt}/{self.max_retries})")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+            logger.error(f"Dropping {len(batch)} chat messages after {self.max_retries} failed flushes")
+            self.messages_dropped += len(batch)
+            self._forget(batch)
+        finally:
+            self._in_flight -= len(batch)
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def _commit(self, batch: List[Dict]) -> bool:
+        self._flushing = True
+        self._flush_done.clear()
+        try:
+            await self._no_readers.wait()
+            await sqlite_client.create_chat_messages(batch)
+        except Exception as e:
+            logger.error(f"Error writing chat log batch: {e}")
+            return False
+        else:
+            self.commits += 1
+            self.messages_written += len(batch)
+            self._forget(batch)
+            return True
+        finally:
+            self._flushing = False
+            self._flush_done.set()
+
+    def _forget(self, batch: List[Dict]):
+        for message in batch:
+            session_messages = self._pending.get(message["session_id"])
+            if not session_messages:
+                continue
+            for i, pending in enumerate(session_messages):
+                if pending is message:
+                    del session_messages[i]
+                    break
+            if not session_messages:
+                del self._pending[message["session_id"]]
+
+
+chat_log_writer = ChatLogWriter()
+
+
+async def create_chat_message(user_id: str, role: str, content: str, session_id: str):
+    await chat_log_writer.append(user_id, role, content, session_id)
+
+
+async def get_chat_history(session_id: str) -> List[Dict]:
+    return await chat_log_writer.get_history(session_id)
+
+
+async def flush_chat_log():
+    await chat_log_writer.flush()
@@ -1,5 +1,73 @@
-import chromadb
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+from urllib.parse import urlparse
 from backend.utils.config import settings
 
-def get_chroma_client():
+# chromadb is imported on first use; it is the slowest import of the app
+if TYPE_CHECKING:
+    from chromadb.api import ClientAPI
+
+T = TypeVar("T")
+
+# One HTTP client per process; it keeps a pool of keep-alive connections
+_http_client: Optional["ClientAPI"] = None
+# Threads the request path calls Chroma from, see run_chroma
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_chroma_client() -> "ClientAPI":
+    """
+    Embedded client on CHROMA_PERSIST_DIRECTORY, or, with CHROMA_SERVER_URL
+    set, a client of the shared Chroma server (`chroma run`) so that workers
+    don't each load the index and writes are serialized in one process.
+    """
+    if settings.CHROMA_SERVER_URL:
+        return _get_http_client()
+    import chromadb
     return chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIRECTORY)
+
+def _get_http_client() -> "ClientAPI":
+    global _http_client
+    if _http_client is None:
+        import chromadb
+        from chromadb.config import Settings
+        url = urlparse(settings.CHROMA_SERVER_URL)
+        _http_client = chromadb.HttpClient(
+            host=url.hostname,
+            port=url.port or (443 if url.scheme == "https" else 8000),
+            ssl=url.scheme == "https",
+            # One connection per thread that can call it, see run_chroma
+            settings=Settings(
+                chroma_http_max_connections=settings.CHROMA_THREAD_POOL_SIZE,
+                chroma_http_max_keepalive_connections=settings.CHROMA_THREAD_POOL_SIZE,
+            ),
+        )
+    return _http_client
+
+async def run_chroma(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Like asyncio.to_thread, on a pool of CHROMA_THREAD_POOL_SIZE threads.
+
+    The client stays the sync one because the LangChain Chroma wrapper every
+    vector path goes through has no async interface, which rules out
+    chromadb's AsyncHttpClient. Searches, uploads and deletes run here rather
+    than in the event loop's default executor so that how many of them are in
+    flight is set explicitly (and matches the HTTP client's connection pool)
+    instead of depending on the CPU count, and so that they don't queue
+    behind other blocking work such as trace exports.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.CHROMA_THREAD_POOL_SIZE, thread_name_prefix="chroma")
+    # Keep tracing spans and other context variables, as to_thread does
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
+
+def close_chroma_executor():
+    """Stop the run_chroma threads at shutdown; calls already queued still finish."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -1,6 +1,6 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
-
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200):
+    # Imported here so the API starts without loading the splitters
+    from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
 
     # Define headers to split on
     headers_to_split_on = [
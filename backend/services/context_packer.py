@@ -0,0 +1,152 @@
+# Token-budgeted packing of the selected RAG context.
+#
+# Retrieved chunks often repeat each other: chunk_text overlaps neighbours by
+# up to 200 characters, and re-uploading a file indexes the same text again
+# under a new document id. Before the context is formatted with [ref:N]
+# markers, the packer
+#   1. drops chunks whose word shingles are mostly contained in a better-ranked
+#      chunk (near duplicates and re-uploads),
+#   2. merges consecutive chunks of one document into a single passage,
+#      removing the overlapped text, and
+#   3. fills the token budget in relevance order.
+# Contexts are at most a few dozen chunks, so shingle sets are compared
+# exactly rather than through MinHash signatures.
+
+import logging
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.services.metrics import CONTEXT_PACKING_TOTAL, CONTEXT_PACKED_TOKENS
+from backend.utils.config import settings
+from backend.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str) -> FrozenSet[Tuple[str, ...]]:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+
+def _containment(a: FrozenSet, b: FrozenSet) -> float:
+    """Share of the smaller set found in the other one."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _join_overlapping(first: str, second: str) -> str:
+    """Concatenate two neighbouring chunks, dropping the prefix of `second` that repeats the tail of `first`."""
+    probe = second[:32]
+    if probe:
+        start = first.find(probe, max(0, len(first) - len(second)))
+        while start != -1:
+            if second.startswith(first[start:]):
+                return first + second[len(first) - start:]
+            start = first.find(probe, start + 1)
+    return f"{first}\n\n{second}"
+
+
+def _drop_duplicates(ranked: List[Tuple[Document, float]], threshold: float) -> Tuple[List[Tuple[Document, float]], int]:
+    kept, kept_shingles = [], []
+    for doc, score in ranked:
+        shingles = _shingles(doc.page_content)
+        if any(_containment(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append((doc, score))
+        kept_shingles.append(shingles)
+    return kept, len(ranked) - len(kept)
+
+
+def _merge_neighbours(ranked: List[Tuple[Document, float]]) -> Tuple[List[Tuple[Document, float]], int]:
+    """
+    Merge runs of consecutive chunk_index values from the same document.
+
+    A merged passage takes the rank of its best chunk. Chunks stored before
+    chunk_index was recorded are left as they are.
+    """
+    groups: Dict[str, List[Tuple[Document, float]]] = {}
+    passages: List[List[Tuple[Document, float]]] = []
+    for doc, score in ranked:
+        doc_id, index = doc.metadata.get("document_id"), doc.metadata.get("chunk_index")
+        if doc_id is None or index is None:
+            passages.append([(doc, score)])
+        else:
+            groups.setdefault(doc_id, []).append((doc, score))
+
+    for chunks in groups.values():
+        chunks.sort(key=lambda pair: pair[0].metadata["chunk_index"])
+        run = [chunks[0]]
+        for pair in chunks[1:]:
+            if pair[0].metadata["chunk_index"] == run[-1][0].metadata["chunk_index"] + 1:
+                run.append(pair)
+            else:
+                passages.append(run)
+                run = [pair]
+        passages.append(run)
+
+    merged, merges = [], 0
+    for run in passages:
+        if len(run) == 1:
+            merged.append(run[0])
+            continue
+        text = run[0][0].page_content
+        for doc, _ in run[1:]:
+            text = _join_overlapping(text, doc.page_content)
+        metadata = dict(run[0][0].metadata, chunk_indexes=[doc.metadata["chunk_index"] for doc, _ in run])
+        merged.append((Document(page_content=text, metadata=metadata), min(score for _, score in run)))
+        merges += len(run) - 1
+
+    merged.sort(key=lambda pair: pair[1])
+    return merged, merges
+
+
+def pack_context(
+    docs_with_scores: List[Tuple[Document, float]],
+    token_budget: Optional[int] = None,
+    duplicate_threshold: Optional[float] = None,
+) -> Tuple[List[Tuple[Document, float]], Dict]:
+    """
+    De-duplicate, merge and budget the (document, distance) pairs for the prompt.
+
+    The returned list is in relevance order and is what [ref:N] numbers refer
+    to. The best passage is always kept, even if it alone exceeds the budget.
+    """
+    if token_budget is None:
+        token_budget = settings.RAG_CONTEXT_TOKEN_BUDGET
+    if duplicate_threshold is None:
+        duplicate_threshold = settings.RAG_DUPLICATE_THRESHOLD
+
+    ranked = sorted(docs_with_scores, key=lambda pair: pair[1])
+    unique, duplicates = _drop_duplicates(ranked, duplicate_threshold)
+    passages, merges = _merge_neighbours(unique)
+
+    packed, used, over_budget = [], 0, 0
+    for doc, score in passages:
+        tokens = count_tokens(doc.page_content)
+        if packed and used + tokens > token_budget:
+            over_budget += 1
+            continue
+        packed.append((doc, score))
+        used += tokens
+
+    report = {
+        "duplicates": duplicates,
+        "merged": merges,
+        "over_budget": over_budget,
+        "passages": len(packed),
+        "tokens": used,
+        "budget": token_budget,
+    }
+    CONTEXT_PACKING_TOTAL.inc(duplicates, outcome="duplicate")
+    CONTEXT_PACKING_TOTAL.inc(merges, outcome="merged")
+    CONTEXT_PACKING_TOTAL.inc(over_budget, outcome="over_budget")
+    CONTEXT_PACKED_TOKENS.observe(used)
+    return packed, report
@@ -0,0 +1,90 @@
+# Adaptive context selection for RAG turns.
+#
+# similarity_search_with_score returns a fixed number of candidates. Rather
+# than sending all of them to the LLM, keep the best min_k and then stop at the
+# first candidate that is too far away in absolute terms, too far behind the
+# best match, or separated from the one before it by a large jump (an elbow in
+# the distance curve). Distances are Chroma cosine distances, lower is closer.
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.services.metrics import CONTEXT_CHUNKS_TOTAL, CONTEXT_TOKENS_TOTAL, CONTEXT_CUTOFF_TOTAL
+from backend.utils.config import settings
+from backend.utils.tokens import count_tokens
+
+
+@dataclass(frozen=True)
+class SelectionParams:
+    # Candidates fetched from the vector store
+    candidate_k: int = settings.RETRIEVAL_CANDIDATE_K
+    min_k: int = settings.RETRIEVAL_MIN_K
+    max_k: int = settings.RETRIEVAL_MAX_K
+    # Each cutoff is disabled when None
+    max_distance: Optional[float] = settings.RETRIEVAL_MAX_DISTANCE
+    relative_margin: Optional[float] = settings.RETRIEVAL_RELATIVE_MARGIN
+    elbow_gap: Optional[float] = settings.RETRIEVAL_ELBOW_GAP
+
+    def validate(self):
+        if None in (self.candidate_k, self.min_k, self.max_k):
+            raise ValueError("candidate_k, min_k and max_k cannot be null")
+        if not 0 <= self.min_k <= self.max_k <= self.candidate_k:
+            raise ValueError("Expected 0 <= min_k <= max_k <= candidate_k")
+        for name in ("max_distance", "relative_margin", "elbow_gap"):
+            value = getattr(self, name)
+            if value is not None and value < 0:
+                raise ValueError(f"{name} must be non-negative")
+
+
+def get_selection_params() -> SelectionParams:
+    """Current parameters; they are runtime settings (see services/runtime_settings.py)."""
+    from backend.services.runtime_settings import runtime_settings
+    return runtime_settings.get().selection()
+
+
+def select_context(
+    docs_with_scores: List[Tuple[Document, float]],
+    params: Optional[SelectionParams] = None,
+) -> Tuple[List[Tuple[Document, float]], Dict]:
+    """
+    Trim retrieved (document, distance) pairs to the ones worth sending.
+
+    Returns the kept pairs in rank order and a report with kept/dropped chunk
+    and token counts plus the rule that ended the selection.
+    """
+    params = params or get_selection_params()
+    ranked = sorted(docs_with_scores, key=lambda pair: pair[1])
+    limit = min(len(ranked), params.max_k)
+    cut, reason = limit, "max_k" if len(ranked) > params.max_k else "none"
+
+    if ranked:
+        best = ranked[0][1]
+        for i in range(params.min_k, limit):
+            score = ranked[i][1]
+            if params.max_distance is not None and score > params.max_distance:
+                cut, reason = i, "absolute"
+            elif params.relative_margin is not None and score > best + params.relative_margin:
+                cut, reason = i, "relative"
+            elif params.elbow_gap and i > 0 and score - ranked[i - 1][1] >= params.elbow_gap:
+                cut, reason = i, "elbow"
+            else:
+                continue
+            break
+
+    kept, dropped = ranked[:cut], ranked[cut:]
+    report = {
+        "kept": len(kept),
+        "dropped": len(dropped),
+        "kept_tokens": sum(count_tokens(doc.page_content) for doc, _ in kept),
+        "dropped_tokens": sum(count_tokens(doc.page_content) for doc, _ in dropped),
+        "cutoff": reason,
+    }
+
+    CONTEXT_CHUNKS_TOTAL.inc(report["kept"], outcome="kept")
+    CONTEXT_CHUNKS_TOTAL.inc(report["dropped"], outcome="dropped")
+    CONTEXT_TOKENS_TOTAL.inc(report["kept_tokens"], outcome="kept")
+    CONTEXT_TOKENS_TOTAL.inc(report["dropped_tokens"], outcome="dropped")
+    CONTEXT_CUTOFF_TOTAL.inc(reason=reason)
+    return kept, report
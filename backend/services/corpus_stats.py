@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from backend.services import sqlite_client
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusStatsCache:
+    """
+    In-memory copy of the corpus_stats counters.
+
+    The copy is reloaded only when the version stamp in SQLite moves, and the
+    version is checked at most once per `max_staleness` seconds unless this
+    process wrote to the counters itself. Chat counters don't move the version
+    and are taken from the same check.
+    """
+
+    def __init__(self, max_staleness: float = 1.0):
+        self.max_staleness = max_staleness
+        self._snapshot: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._local_writes = -1
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Dict:
+        if self._is_fresh():
+            return self._snapshot
+
+        async with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+
+            local_writes = sqlite_client.stats_write_count
+            counters = await sqlite_client.get_stat_counters()
+            if self._snapshot is None or self._snapshot["version"] != counters.get("version"):
+                self._snapshot = await sqlite_client.get_corpus_stats()
+            else:
+                self._snapshot = {**self._snapshot, **{key: counters[key] for key in sqlite_client.CHAT_STAT_KEYS}}
+            self._checked_at = time.monotonic()
+            self._local_writes = local_writes
+            return self._snapshot
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and self._local_writes == sqlite_client.stats_write_count
+            and time.monotonic() - self._checked_at < self.max_staleness
+        )
+
+    async def reconcile(self) -> Dict[str, Dict[str, int]]:
+        """Recount everything from the source tables and fix any drift."""
+        drift = await sqlite_client.reconcile_stats()
+        if drift:
+            logger.warning(f"Corpus stats drift corrected: {drift}")
+        self._snapshot = None
+        return drift
+
+
+corpus_stats = CorpusStatsCache()
+
+
+class CorpusVersion:
+    """
+    Cached corpus_version counter, which moves whenever documents are added to
+    or removed from the vector store. Keys derived from retrieved context
+    include it, so they change with the corpus.
+
+    Writes by this process are seen immediately; writes by other workers
+    within `max_staleness` seconds.
+    """
+
+    def __init__(self, max_staleness: float = 1.0):
+        self.max_staleness = max_staleness
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._local_writes = -1
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> int:
+        if self._is_fresh():
+            return self._version
+
+        async with self._lock:
+            if not self._is_fresh():
+                local_writes = sqlite_client.corpus_write_count
+                self._version = await sqlite_client.get_corpus_version()
+                self._checked_at = time.monotonic()
+                self._local_writes = local_writes
+            return self._version
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._version is not None
+            and self._local_writes == sqlite_client.corpus_write_count
+            and time.monotonic() - self._checked_at < self.max_staleness
+        )
+
+
+corpus_version = CorpusVersion()
+
+
+async def run_reconciliation(interval: float):
+    """Background job: periodically recount the stats to catch drift."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await corpus_stats.reconcile()
+        except Exception as e:
+            logger.error(f"Corpus stats reconciliation failed: {e}")
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from backend.chains.retriever_chroma import write_to_vectorstore
+from backend.services.chroma_client import run_chroma
+from backend.services.metrics import PENDING_VECTOR_DELETES, VECTOR_DELETE_PURGE_FAILURES_TOTAL
+from backend.services.sqlite_client import (
+    delete_documents as delete_document_rows,
+    get_pending_vector_deletes,
+    clear_pending_vector_deletes,
+    count_pending_vector_deletes,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ids per vector store delete call; legacy documents are matched with $in
+CHUNK_ID_BATCH_SIZE = 1000
+DOCUMENT_ID_BATCH_SIZE = 100
+
+# Only one purge at a time per process so batches aren't deleted twice
+_purge_lock = asyncio.Lock()
+
+
+def _delete_vectors(rows: List[Dict]) -> List[int]:
+    """Delete the vectors for outbox rows; returns the row ids that succeeded."""
+    done = []
+
+    by_id = [row for row in rows if row["chunk_id"]]
+    for i in range(0, len(by_id), CHUNK_ID_BATCH_SIZE):
+        batch = by_id[i:i + CHUNK_ID_BATCH_SIZE]
+        try:
+            ids = [row["chunk_id"] for row in batch]
+            write_to_vectorstore(lambda vectorstore: vectorstore.delete(ids=ids))
+            done.extend(row["id"] for row in batch)
+        except Exception as e:
+            logger.error(f"Error deleting {len(batch)} chunks from vector store: {e}")
+
+    # Documents uploaded before chunk ids were tracked
+    by_document = [row for row in rows if not row["chunk_id"]]
+    for i in range(0, len(by_document), DOCUMENT_ID_BATCH_SIZE):
+        batch = by_document[i:i + DOCUMENT_ID_BATCH_SIZE]
+        try:
+            where = {"document_id": {"$in": [row["document_id"] for row in batch]}}
+            write_to_vectorstore(lambda vectorstore: vectorstore.delete(where=where))
+            done.extend(row["id"] for row in batch)
+        except Exception as e:
+            logger.error(f"Error deleting {len(batch)} documents from vector store: {e}")
+
+    return done
+
+
+async def purge_pending_vector_deletes() -> int:
+    """
+    Work through the vector deletion outbox; returns how many entries remain.
+
+    Safe to call repeatedly: entries are only cleared once the vector store
+    delete succeeded, so a failed run is retried by the next one.
+    """
+    async with _purge_lock:
+        while True:
+            rows = await get_pending_vector_deletes()
+            if not rows:
+                PENDING_VECTOR_DELETES.set(0)
+                return 0
+            done = await run_chroma(_delete_vectors, rows)
+            if done:
+                await clear_pending_vector_deletes(done)
+            if len(done) < len(rows):
+                # Vector store is failing; leave the rest for the next attempt
+                VECTOR_DELETE_PURGE_FAILURES_TOTAL.inc()
+                remaining = await count_pending_vector_deletes()
+                PENDING_VECTOR_DELETES.set(remaining)
+                return remaining
+
+
+async def run_vector_delete_purge(interval: float, retry: float, max_retry: float):
+    """
+    Background job: purge the outbox now and then every `interval` seconds,
+    so vectors of deleted documents don't stay searchable until the next
+    delete or restart. After a failed purge the next attempt comes sooner,
+    `retry` seconds doubling up to `max_retry`.
+    """
+    delay = retry
+    while True:
+        try:
+            remaining = await purge_pending_vector_deletes()
+        except Exception as e:
+            logger.error(f"Vector delete purge failed: {e}")
+            VECTOR_DELETE_PURGE_FAILURES_TOTAL.inc()
+            remaining = None
+        if remaining == 0:
+            delay = retry
+            await asyncio.sleep(interval)
+        else:
+            if remaining:
+                logger.warning(f"{remaining} vector deletes pending, retrying in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry)
+
+
+async def delete_documents(document_ids: List[str]) -> Dict:
+    """Delete documents from SQLite in one transaction, then purge their vectors."""
+    result = await delete_document_rows(document_ids)
+    try:
+        remaining = await purge_pending_vector_deletes()
+    except Exception as e:
+        logger.error(f"Vector deletion failed, will retry later: {e}")
+        remaining = await count_pending_vector_deletes()
+        PENDING_VECTOR_DELETES.set(remaining)
+
+    return {**result, "pending_vector_deletes": remaining}
@@ -1,8 +1,49 @@
-from langchain_openai import OpenAIEmbeddings
+from dataclasses import dataclass
+from typing import Dict, Optional
+from backend.services.http_clients import openai_client_kwargs
 from backend.utils.config import settings
 
-def get_embedding_model():
+# What collections created before the model was configurable were embedded with
+LEGACY_EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+@dataclass(frozen=True)
+class EmbeddingSpec:
+    """Embedding model and output size; dimensions None is the model's native size."""
+    model: str = settings.EMBEDDING_MODEL
+    dimensions: Optional[int] = settings.EMBEDDING_DIMENSIONS
+
+    def metadata(self) -> Dict:
+        """Collection metadata recording how its vectors were made."""
+        metadata = {"embedding_model": self.model}
+        if self.dimensions:
+            metadata["embedding_dimensions"] = self.dimensions
+        return metadata
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict]) -> "EmbeddingSpec":
+        metadata = metadata or {}
+        return cls(
+            model=metadata.get("embedding_model", LEGACY_EMBEDDING_MODEL),
+            dimensions=metadata.get("embedding_dimensions"),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.model} ({self.dimensions or 'native'} dimensions)"
+
+
+def get_embedding_model(spec: Optional[EmbeddingSpec] = None):
+    # langchain_openai is imported on first use to keep startup fast
+    from langchain_openai import OpenAIEmbeddings
+
+    spec = spec or EmbeddingSpec()
     return OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        openai_api_key=settings.OPENAI_API_KEY
+        model=spec.model,
+        # text-embedding-3 models shorten their output server-side
+        dimensions=spec.dimensions,
+        openai_api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL or None,
+        **openai_client_kwargs(),
+        # Compatible endpoints expect raw strings rather than tiktoken ids
+        check_embedding_ctx_length=not settings.OPENAI_BASE_URL
     )
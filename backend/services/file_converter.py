@@ -1,12 +1,14 @@
-# Converts PDF, Word (.docx), and TXT files to Markdown format
+# Converts PDF, Word (.docx), and TXT files to Markdown format.
+# PyMuPDF and python-docx are imported by the converters that need them, so
+# importing this module (and the admin routes) stays cheap.
 
-import fitz  # PyMuPDF
-from docx import Document
 from io import BytesIO
 import re
 
 
 def pdf_to_markdown(content: bytes) -> str:
+    import fitz  # PyMuPDF
+
     doc = fitz.open(stream=content, filetype="pdf")
     markdown_parts = []
     
@@ -88,6 +90,8 @@ def pdf_to_markdown(content: bytes) -> str:
 
 
 def docx_to_markdown(content: bytes) -> str:
+    from docx import Document
+
     doc = Document(BytesIO(content))
     markdown_parts = []
     
@@ -0,0 +1,111 @@
+# Shared HTTP clients for the OpenAI-compatible API.
+#
+# Every ChatOpenAI and OpenAIEmbeddings instance is handed these two clients
+# instead of building its own connection pool, so the rewriter, classifier,
+# generation and embedding calls all reuse the same keep-alive connections
+# (and TLS sessions) rather than handshaking per client or per vector store.
+# The async client serves the chat models on the event loop; the sync one the
+# embedding calls, which run in worker threads. HTTP/2 is used when the
+# optional h2 package is installed (pip install "httpx[http2]").
+#
+# Each request and each new TCP connection / TLS handshake is counted in
+# /metrics, so connections per request should stay near zero once warm. The
+# clients are created on first use and closed at shutdown (main.py).
+
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+from backend.services.metrics import OPENAI_HTTP_CONNECTIONS_TOTAL, OPENAI_HTTP_REQUESTS_TOTAL
+from backend.utils.config import settings
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# httpcore trace events for a new connection, by the handshake they complete
+_HANDSHAKE_EVENTS = {
+    "connection.connect_tcp.complete": "tcp",
+    "connection.start_tls.complete": "tls",
+}
+
+_async_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+
+
+def request_timeout() -> httpx.Timeout:
+    """Timeouts for model calls; the OpenAI SDK applies them per request."""
+    return httpx.Timeout(settings.OPENAI_TIMEOUT_SECONDS, connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _record_trace(name: str, event: str):
+    handshake = _HANDSHAKE_EVENTS.get(event)
+    if handshake:
+        OPENAI_HTTP_CONNECTIONS_TOTAL.inc(client=name, handshake=handshake)
+
+
+async def _trace_async(event: str, info: Dict):
+    _record_trace("async", event)
+
+
+def _trace_sync(event: str, info: Dict):
+    _record_trace("sync", event)
+
+
+async def _on_async_request(request: httpx.Request):
+    OPENAI_HTTP_REQUESTS_TOTAL.inc(client="async")
+    request.extensions["trace"] = _trace_async
+
+
+def _on_sync_request(request: httpx.Request):
+    OPENAI_HTTP_REQUESTS_TOTAL.inc(client="sync")
+    request.extensions["trace"] = _trace_sync
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=settings.OPENAI_HTTP2 and HTTP2_AVAILABLE,
+            limits=_limits(),
+            timeout=request_timeout(),
+            event_hooks={"request": [_on_async_request]},
+        )
+    return _async_client
+
+
+def get_http_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(
+            http2=settings.OPENAI_HTTP2 and HTTP2_AVAILABLE,
+            limits=_limits(),
+            timeout=request_timeout(),
+            event_hooks={"request": [_on_sync_request]},
+        )
+    return _sync_client
+
+
+def openai_client_kwargs() -> Dict:
+    """Keyword arguments wiring a ChatOpenAI / OpenAIEmbeddings to the shared clients."""
+    return {
+        "http_client": get_http_client(),
+        "http_async_client": get_async_http_client(),
+        "request_timeout": request_timeout(),
+    }
+
+
+async def close_http_clients():
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+    if _sync_client is not None:
+        _sync_client.close()
+    _async_client = _sync_client = None
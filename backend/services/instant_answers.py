@@ -0,0 +1,348 @@
+# Instant answers: canned replies served without any LLM call.
+#
+# Greetings, thanks and frequent questions used to go through query rewriting,
+# classification and a generated reply unless they were in a short hard-coded
+# list, word for word. Admins now manage a table of patterns and responses
+# (/admin/instant-answers). Patterns and queries are normalized (case,
+# punctuation, stretched letters, politeness particles such as "kak" or "ya")
+# and looked up in a character trie that also finds patterns within a small
+# edit distance, so "halo kak", "makasih banyak ya" or "terimakasi" are
+# answered instantly too.
+#
+# The table is cached per worker and reloaded when its version in the config
+# table moves, checked by a background task every MAX_STALENESS seconds so
+# chat turns never wait on SQLite for it. Hits and the LLM calls they saved
+# are buffered and written per answer and per day by a background flush; a
+# failed flush keeps them for the next one.
+
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from backend.services import sqlite_client
+from backend.services.metrics import INSTANT_ANSWERS_TOTAL, INSTANT_ANSWER_LLM_CALLS_SAVED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "instant_answers_version"
+SEEDED_KEY = "instant_answers_seeded"
+MAX_STALENESS = 1.0
+
+DEFAULT_RESPONSE = "Halo! Ada yang bisa saya bantu terkait reimbursement?"
+
+# Messages this short that match nothing still get DEFAULT_RESPONSE
+SHORT_QUERY_CHARS = 3
+
+# Forms of address and particles that don't change what a short message means
+FILLER_WORDS = frozenset({
+    "kak", "ka", "kakak", "min", "mimin", "gan", "bang", "mas", "mbak", "mba",
+    "pak", "bu", "bro", "sis", "ya", "yah", "dong", "deh", "sih", "nih", "lah", "aja",
+})
+
+# Seeded into the table once per database; admins edit it from there
+SIMPLE_GREETINGS = {
+    # Indonesian
+    "halo", "hai", "hi", "hey", "hello", "hallo",
+    "selamat pagi", "selamat siang", "selamat sore", "selamat malam",
+    "pagi", "siang", "sore", "malam",
+    "terima kasih", "terimakasih", "makasih", "thanks", "thank you", "thx",
+    "terima kasih banyak", "makasih banyak",
+    "ok", "oke", "okay", "sip", "siap", "baik",
+    "bye", "bye bye", "dadah", "sampai jumpa",
+    "hehe", "haha", "wkwk", "lol",
+    # English
+    "good morning", "good afternoon", "good evening", "good night",
+}
+
+INSTANT_RESPONSES = {
+    "halo": "Halo! Ada yang bisa saya bantu terkait data reimbursement?",
+    "hai": "Hai! Silakan tanyakan tentang data reimburse.",
+    "hi": "Hi! Ada yang bisa saya bantu?",
+    "hello": "Hello! Silakan tanyakan tentang reimbursement.",
+    "terima kasih": "Sama-sama! Senang bisa membantu.",
+    "terima kasih banyak": "Sama-sama! Senang bisa membantu.",
+    "terimakasih": "Sama-sama! Ada yang lain yang bisa saya bantu?",
+    "makasih": "Sama-sama! 😊",
+    "makasih banyak": "Sama-sama! 😊",
+    "thanks": "You're welcome!",
+    "ok": "Baik, ada pertanyaan lain tentang reimbursement?",
+    "oke": "Siap! Ada yang lain?",
+    "bye": "Sampai jumpa! 👋",
+}
+
+DEFAULT_ANSWERS = [
+    {"pattern": pattern, "response": INSTANT_RESPONSES.get(pattern, DEFAULT_RESPONSE)}
+    for pattern in sorted(SIMPLE_GREETINGS)
+]
+
+_NON_WORD = re.compile(r"[\W_]+")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+def normalize_text(text: str, squash: bool = False) -> str:
+    """
+    Lowercase words without punctuation or filler words. squash also collapses
+    repeated letters ("haloooo", "hallo" -> "halo"), for matching only.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    words = _NON_WORD.sub(" ", text).split()
+    if squash:
+        words = [_REPEATS.sub(r"\1", word) for word in words]
+    meaningful = [word for word in words if word not in FILLER_WORDS]
+    return " ".join(meaningful or words)
+
+
+def allowed_distance(length: int) -> int:
+    """Edits tolerated for a normalized query of this length; short words must match exactly."""
+    if length < 6:
+        return 0
+    return 1 if length < 10 else 2
+
+
+@dataclass(frozen=True)
+class InstantAnswer:
+    id: int
+    pattern: str
+    response: str
+    fuzzy: bool = True
+
+
+@dataclass(frozen=True)
+class InstantMatch:
+    response: str
+    # "exact", "fuzzy" or "short" (nothing matched but the message is tiny)
+    kind: str
+    answer: Optional[InstantAnswer] = None
+    distance: int = 0
+
+
+class _TrieNode:
+    __slots__ = ("children", "answer", "longest")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.answer: Optional[InstantAnswer] = None
+        # Length of the longest pattern below this node
+        self.longest = 0
+
+
+class InstantAnswerMatcher:
+    """Exact and bounded edit-distance lookup of normalized queries."""
+
+    def __init__(self, answers: List[InstantAnswer]):
+        self._exact: Dict[str, InstantAnswer] = {}
+        self._root = _TrieNode()
+        for answer in answers:
+            key = normalize_text(answer.pattern, squash=True)
+            if not key:
+                continue
+            # When two patterns normalize alike ("hallo", "halo") the one
+            # written that way wins, otherwise the oldest
+            if key in self._exact and (self._exact[key].pattern == key or answer.pattern != key):
+                continue
+            self._exact[key] = answer
+            if answer.fuzzy:
+                node = self._root
+                node.longest = max(node.longest, len(key))
+                for char in key:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.longest = max(node.longest, len(key))
+                node.answer = answer
+
+    def match(self, query: str, max_distance: int) -> Optional[InstantMatch]:
+        key = normalize_text(query, squash=True)
+        answer = self._exact.get(key)
+        if answer is not None:
+            return InstantMatch(answer.response, "exact", answer)
+        max_distance = min(max_distance, allowed_distance(len(key)))
+        # Questions longer than every pattern can't be within reach of one
+        if max_distance and len(key) <= self._root.longest + max_distance:
+            found = self._search(key, max_distance)
+            if found is not None:
+                distance, answer = found
+                return InstantMatch(answer.response, "fuzzy", answer, distance)
+        if len(key) <= SHORT_QUERY_CHARS:
+            return InstantMatch(DEFAULT_RESPONSE, "short")
+        return None
+
+    def _search(self, key: str, max_distance: int):
+        """
+        Closest pattern within max_distance (Levenshtein), walking the trie
+        one row of the edit-distance table per node. Only the band of cells
+        within max_distance of the diagonal is computed, and branches whose
+        row is all over the limit, or whose patterns are all too short, are
+        skipped.
+        """
+        n, limit = len(key), max_distance + 1
+        best = None
+        first_row = [i if i <= max_distance else limit for i in range(n + 1)]
+        stack = [(child, char, first_row, 1) for char, child in self._root.children.items()]
+        while stack:
+            node, char, previous, depth = stack.pop()
+            if node.longest < n - max_distance:
+                continue
+            row = [limit] * (n + 1)
+            row[0] = depth if depth <= max_distance else limit
+            for i in range(max(1, depth - max_distance), min(n, depth + max_distance) + 1):
+                row[i] = min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (key[i - 1] != char), limit)
+            if node.answer is not None and row[n] <= max_distance:
+                if best is None or (row[n], node.answer.id) < (best[0], best[1].id):
+                    best = (row[n], node.answer)
+            if min(row) <= max_distance:
+                stack.extend((child, next_char, row, depth + 1) for next_char, child in node.children.items())
+        return best
+
+
+def llm_calls_saved(query: str, chat_history: str, rewrite_max_words: int) -> int:
+    """
+    Model calls the full pipeline would have made for this message: the
+    classification and the reply, plus the rewrite when it would have run.
+    """
+    rewrite = bool(chat_history.strip()) and len(query.split()) <= rewrite_max_words
+    return 2 + int(rewrite)
+
+
+class InstantAnswers:
+    """Per-worker copy of the instant_answers table plus buffered hit counts."""
+
+    def __init__(self, max_staleness: float = MAX_STALENESS, flush_interval: float = 5.0):
+        self.max_staleness = max_staleness
+        self.flush_interval = flush_interval
+        self._matcher = InstantAnswerMatcher([])
+        self._version: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self._hits: Dict[int, int] = defaultdict(int)
+        self._daily: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "llm_calls_saved": 0})
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        if await sqlite_client.seed_instant_answers(DEFAULT_ANSWERS, SEEDED_KEY, VERSION_KEY):
+            logger.info(f"Seeded {len(DEFAULT_ANSWERS)} default instant answers")
+        await self.refresh()
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._refresh_loop()), asyncio.create_task(self._flush_loop())]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    async def refresh(self):
+        """Reload the table if its stored version moved."""
+        async with self._lock:
+            version = int(await sqlite_client.get_config_value(VERSION_KEY) or 0)
+            if version != self._version:
+                rows = await sqlite_client.get_instant_answers()
+                self._matcher = InstantAnswerMatcher([
+                    InstantAnswer(row["id"], row["pattern"], row["response"], row["fuzzy"]) for row in rows
+                ])
+                self._version = version
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.max_staleness)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Instant answers refresh failed: {e}")
+
+    def match_loaded(self, query: str, max_distance: Optional[int] = None) -> Optional[InstantMatch]:
+        """Match against the table as last loaded, without checking for changes."""
+        if max_distance is None:
+            from backend.services.runtime_settings import runtime_settings
+            max_distance = runtime_settings.get().instant_answer_max_distance
+        return self._matcher.match(query, max_distance)
+
+    async def match(self, query: str, max_distance: Optional[int] = None) -> Optional[InstantMatch]:
+        if self._version is None:
+            # Not started (scripts, benchmarks); later changes need start()
+            await self.refresh()
+        return self.match_loaded(query, max_distance)
+
+    def record_hit(self, match: InstantMatch, saved: int):
+        INSTANT_ANSWERS_TOTAL.inc(match=match.kind)
+        INSTANT_ANSWER_LLM_CALLS_SAVED_TOTAL.inc(saved)
+        if match.answer is not None:
+            self._hits[match.answer.id] += 1
+        daily = self._daily[time.strftime("%Y-%m-%d", time.gmtime())]
+        daily["hits"] += 1
+        daily["llm_calls_saved"] += saved
+
+    async def flush(self):
+        if not self._daily:
+            return
+        hits, daily = dict(self._hits), {day: dict(totals) for day, totals in self._daily.items()}
+        self._hits.clear()
+        self._daily.clear()
+        try:
+            await sqlite_client.record_instant_answer_hits(hits, daily)
+        except Exception as e:
+            # Written in one transaction, so none of it landed; the next flush retries
+            logger.error(f"Error writing instant answer hits: {e}")
+            for answer_id, count in hits.items():
+                self._hits[answer_id] += count
+            for day, totals in daily.items():
+                self._daily[day]["hits"] += totals["hits"]
+                self._daily[day]["llm_calls_saved"] += totals["llm_calls_saved"]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def describe(self, days: int = 30) -> Dict:
+        await self.flush()
+        return {
+            "version": self._version,
+            "items": await sqlite_client.get_instant_answers(),
+            "daily": await sqlite_client.get_instant_answer_daily(days),
+        }
+
+    async def get_daily(self, days: int = 30) -> List[Dict]:
+        await self.flush()
+        return await sqlite_client.get_instant_answer_daily(days)
+
+    async def create(self, pattern: str, response: str, fuzzy: bool = True) -> InstantAnswer:
+        """Add an answer for every worker; raises ValueError on a bad or duplicate pattern."""
+        pattern, response = self._validate(pattern, response)
+        try:
+            answer_id = await sqlite_client.create_instant_answer(pattern, response, fuzzy, VERSION_KEY)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Pattern already exists: {pattern}")
+        await self.refresh()
+        return InstantAnswer(answer_id, pattern, response, fuzzy)
+
+    async def update(self, answer_id: int, pattern: str, response: str, fuzzy: bool = True) -> Optional[InstantAnswer]:
+        """None if there is no such answer."""
+        pattern, response = self._validate(pattern, response)
+        try:
+            updated = await sqlite_client.update_instant_answer(answer_id, pattern, response, fuzzy, VERSION_KEY)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Pattern already exists: {pattern}")
+        await self.refresh()
+        return InstantAnswer(answer_id, pattern, response, fuzzy) if updated else None
+
+    async def delete(self, answer_id: int) -> bool:
+        deleted = await sqlite_client.delete_instant_answer(answer_id, VERSION_KEY)
+        await self.refresh()
+        return deleted
+
+    @staticmethod
+    def _validate(pattern: str, response: str):
+        normalized = normalize_text(pattern)
+        if not normalized:
+            raise ValueError("Pattern has no words left after normalization")
+        if not response.strip():
+            raise ValueError("Response cannot be empty")
+        return normalized, response.strip()
+
+
+instant_answers = InstantAnswers()
@@ -1,7 +1,8 @@
 import os
-from langsmith import Client
 from backend.utils.config import settings
 
+# langsmith.Client is imported only when LANGCHAIN_API_KEY is set
+
 def setup_langsmith():
     """Ensure environment variables are set for LangChain auto-tracing"""
     if settings.LANGCHAIN_API_KEY:
@@ -10,6 +11,7 @@ def setup_langsmith():
         os.environ["LANGCHAIN_PROJECT"] = settings.LANGCHAIN_PROJECT
         
         try:
+            from langsmith import Client
             client = Client(api_key=settings.LANGCHAIN_API_KEY)
             try:
                 client.read_project(project_name=settings.LANGCHAIN_PROJECT)
@@ -18,34 +20,30 @@ def setup_langsmith():
         except Exception as e:
             print(f"Warning: Could not initialize LangSmith project: {e}")
 
+_client = None
+
 def get_client():
-    if settings.LANGCHAIN_API_KEY:
-        return Client(api_key=settings.LANGCHAIN_API_KEY)
-    return None
+    global _client
+    if _client is None and settings.LANGCHAIN_API_KEY:
+        from langsmith import Client
+        _client = Client(api_key=settings.LANGCHAIN_API_KEY)
+    return _client
 
-def get_recent_traces(limit: int = 5):
+def export_spans(spans):
+    """Send finished local spans to LangSmith as runs. Blocking; call from a worker thread."""
     client = get_client()
     if not client:
-        return []
-    
-    try:
-        runs = client.list_runs(
+        return
+
+    for span in spans:
+        client.create_run(
+            id=span.id,
+            name=span.name,
+            run_type="chain",
+            inputs=span.metadata,
+            outputs={"status": span.status},
+            error=span.error,
+            start_time=span.start_time,
+            end_time=span.end_time,
             project_name=settings.LANGCHAIN_PROJECT,
-            execution_order=1,
-            limit=limit,
         )
-        return [
-            {
-                "id": str(run.id),
-                "name": run.name,
-                "start_time": run.start_time.isoformat() if run.start_time else None,
-                "latency": run.latency,
-                "status": run.status,
-            }
-            for run in runs
-        ]
-    except Exception as e:
-        if "not found" in str(e).lower() and "project" in str(e).lower():
-            return []
-        print(f"Error fetching LangSmith traces: {e}")
-        return []
@@ -0,0 +1,368 @@
+# In-process metrics exported in Prometheus text format at /metrics.
+# Values are per worker process; Prometheus aggregates across workers.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds, from SQLite point queries up to slow generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Dict:
+        """Count, sum and non-cumulative bucket counts for one label set."""
+        entry = self._values.get(self._key(labels))
+        if entry is None:
+            return {"count": 0, "sum": 0.0, "buckets": [0] * (len(self.buckets) + 1)}
+        with self._lock:
+            counts = list(entry[0])
+            total = entry[1][0]
+        return {"count": sum(counts), "sum": total, "buckets": counts}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator recording the duration of an async function in a histogram."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Chat pipeline
+CHAT_STAGE_SECONDS = Histogram(
+    "rag_chat_stage_seconds",
+    "Duration of each chat pipeline stage.",
+    ["stage"],
+)
+CHAT_REQUEST_SECONDS = Histogram(
+    "rag_chat_request_seconds",
+    "End-to-end duration of a chat turn by route.",
+    ["route"],
+)
+CHAT_ROUTE_TOTAL = Counter(
+    "rag_chat_route_total",
+    "Chat turns by route decision (greeting, CHAT, RAG).",
+    ["route"],
+)
+CHAT_ERRORS_TOTAL = Counter(
+    "rag_chat_errors_total",
+    "Chat turns that ended with an error event.",
+)
+LLM_FALLBACKS_TOTAL = Counter(
+    "rag_llm_fallbacks_total",
+    "Rewrite, classification and chat reply calls that failed and fell back to a default.",
+    ["stage"],
+)
+CONTEXT_CHUNKS_TOTAL = Counter(
+    "rag_context_chunks_total",
+    "Retrieved chunks kept for or dropped from the RAG prompt.",
+    ["outcome"],
+)
+CONTEXT_TOKENS_TOTAL = Counter(
+    "rag_context_tokens_total",
+    "Tokens in retrieved chunks kept for or dropped from the RAG prompt.",
+    ["outcome"],
+)
+CONTEXT_CUTOFF_TOTAL = Counter(
+    "rag_context_cutoff_total",
+    "RAG turns by the rule that ended context selection.",
+    ["reason"],
+)
+CONTEXT_PACKING_TOTAL = Counter(
+    "rag_context_packing_chunks_total",
+    "Selected chunks removed as duplicates, merged into a neighbour, or left out over the token budget.",
+    ["outcome"],
+)
+CONTEXT_PACKED_TOKENS = Histogram(
+    "rag_context_packed_tokens",
+    "Tokens of retrieved context sent with each RAG prompt.",
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000),
+)
+
+RAG_PROMPT_TOKENS_TOTAL = Counter(
+    "rag_prompt_tokens_total",
+    "Estimated RAG prompt tokens by part: the static system prefix or the per-turn remainder.",
+    ["part"],
+)
+RAG_MODEL_TOTAL = Counter(
+    "rag_generation_model_total",
+    "RAG turns by generation model and the routing rule that chose it.",
+    ["model", "rule"],
+)
+RAG_GENERATION_SECONDS = Histogram(
+    "rag_generation_seconds",
+    "RAG generation latency per model, to first token and in total.",
+    ["model", "phase"],
+)
+LLM_TOKENS_TOTAL = Counter(
+    "rag_llm_tokens_total",
+    "Token usage reported by the provider; cached_input is the part of input served from the prompt cache.",
+    ["model", "kind"],
+)
+RETRIEVAL_CACHE_TOTAL = Counter(
+    "rag_retrieval_cache_total",
+    "Vector searches served from this worker's cache, the shared SQLite cache, or run (miss).",
+    ["result"],
+)
+RETRIEVAL_CACHE_SAVED_SECONDS = Counter(
+    "rag_retrieval_cache_saved_seconds_total",
+    "Retrieval time saved by cache hits: the original search time minus the lookup time.",
+)
+
+
+def record_llm_usage(usage_by_model: Dict) -> Dict:
+    """Add UsageMetadataCallbackHandler.usage_metadata to LLM_TOKENS_TOTAL; returns the totals."""
+    totals = {"input": 0, "cached_input": 0, "output": 0}
+    for model, usage in usage_by_model.items():
+        counts = {
+            "input": usage.get("input_tokens", 0),
+            "cached_input": (usage.get("input_token_details") or {}).get("cache_read", 0),
+            "output": usage.get("output_tokens", 0),
+        }
+        for kind, value in counts.items():
+            LLM_TOKENS_TOTAL.inc(value, model=model, kind=kind)
+            totals[kind] += value
+    return totals
+
+
+COALESCED_TOTAL = Counter(
+    "rag_coalesced_total",
+    "Calls that started shared work (leader) or joined an identical one in flight (follower).",
+    ["flight", "role"],
+)
+
+# Model call admission (services/model_scheduler.py)
+MODEL_QUEUE_DEPTH = Gauge(
+    "rag_model_queue_depth",
+    "Model calls waiting for a slot, by traffic class.",
+    ["traffic"],
+)
+MODEL_IN_FLIGHT = Gauge(
+    "rag_model_in_flight",
+    "Model calls holding a slot, by traffic class.",
+    ["traffic"],
+)
+MODEL_QUEUE_SECONDS = Histogram(
+    "rag_model_queue_seconds",
+    "Time model calls waited for a slot, by traffic class.",
+    ["traffic"],
+)
+MODEL_ADMISSIONS_TOTAL = Counter(
+    "rag_model_admissions_total",
+    "Model calls admitted or turned away after their queue timeout, by traffic class.",
+    ["traffic", "outcome"],
+)
+
+# Shared OpenAI HTTP clients (services/http_clients.py)
+OPENAI_HTTP_REQUESTS_TOTAL = Counter(
+    "rag_openai_http_requests_total",
+    "HTTP requests sent to the OpenAI-compatible API, by shared client (async or sync).",
+    ["client"],
+)
+OPENAI_HTTP_CONNECTIONS_TOTAL = Counter(
+    "rag_openai_http_connections_total",
+    "New connections opened to the OpenAI-compatible API, by shared client and handshake (tcp or tls).",
+    ["client", "handshake"],
+)
+
+# Runtime settings (services/runtime_settings.py)
+RUNTIME_SETTINGS_VERSION = Gauge(
+    "rag_runtime_settings_version",
+    "Version of the runtime settings this worker has loaded.",
+)
+EXPERIMENT_REQUEST_SECONDS = Histogram(
+    "rag_experiment_request_seconds",
+    "End-to-end chat latency per settings experiment variant and route.",
+    ["experiment", "variant", "route"],
+)
+
+# Instant answers (services/instant_answers.py)
+INSTANT_ANSWERS_TOTAL = Counter(
+    "rag_instant_answers_total",
+    "Chat turns answered from the instant-answer table, by match kind (exact, fuzzy or short).",
+    ["match"],
+)
+INSTANT_ANSWER_LLM_CALLS_SAVED_TOTAL = Counter(
+    "rag_instant_answer_llm_calls_saved_total",
+    "Rewrite, classification and reply model calls skipped by instant answers.",
+)
+
+# Document ingestion
+INGESTION_STAGE_SECONDS = Histogram(
+    "rag_ingestion_stage_seconds",
+    "Duration of each document ingestion stage.",
+    ["stage"],
+)
+INGESTION_DOCUMENTS_TOTAL = Counter(
+    "rag_ingestion_documents_total",
+    "Uploaded documents by outcome.",
+    ["status"],
+)
+INGESTION_CHUNKS_TOTAL = Counter(
+    "rag_ingestion_chunks_total",
+    "Chunks written to the vector store.",
+)
+PENDING_VECTOR_DELETES = Gauge(
+    "rag_pending_vector_deletes",
+    "Outbox entries of deleted documents whose vectors are still searchable.",
+)
+VECTOR_DELETE_PURGE_FAILURES_TOTAL = Counter(
+    "rag_vector_delete_purge_failures_total",
+    "Outbox purges that left entries behind because the vector store delete failed.",
+)
+
+# Storage
+SQLITE_QUERY_SECONDS = Histogram(
+    "rag_sqlite_query_seconds",
+    "Duration of SQLite client calls, including connection setup.",
+    ["query"],
+)
@@ -0,0 +1,81 @@
+# Per-request choice of the RAG generation model.
+#
+# Most RAG turns are single-report lookups ("reimburse Angga Agustus") that the
+# nano model answers as well as mini, at lower latency and cost. Anything that
+# spans several reports, needs the chat history to resolve who/when, or asks
+# for discovery, comparison or aggregation stays on RAG_DEFAULT_MODEL. The
+# rules default to settings.RAG_MODEL_POLICY and can be changed at runtime
+# (model_policy / default_model in /admin/settings).
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.services.runtime_settings import runtime_settings
+
+MONTHS = (
+    "januari", "februari", "maret", "april", "mei", "juni", "juli",
+    "agustus", "september", "oktober", "november", "desember",
+)
+
+# Discovery, comparison and aggregation wording from the RAG prompt's question types
+COMPLEX_PATTERNS = re.compile(
+    r"siapa saja|daftar|list nama|ada siapa|semua|seluruh|bandingkan|dibanding|perbandingan|\bvs\b|"
+    r"rata-rata|rata rata|tren|per bulan|setiap bulan|tiap bulan|tertinggi|terendah|paling|ranking|"
+    r"who all|compare|average|trend",
+    re.IGNORECASE,
+)
+
+
+def query_signals(
+    query: str,
+    docs_with_scores: List[Tuple[Document, float]],
+    context_tokens: int,
+    chat_history: str = "",
+) -> Dict:
+    """Features the routing rules are evaluated against."""
+    lowered = query.lower()
+    documents = {
+        doc.metadata.get("document_id") or doc.metadata.get("source")
+        for doc, _ in docs_with_scores
+    }
+    return {
+        "documents": len(documents),
+        "context_tokens": context_tokens,
+        "query_words": len(query.split()),
+        "has_history": bool(chat_history and chat_history.strip()),
+        "complex": bool(COMPLEX_PATTERNS.search(lowered)) or sum(m in lowered for m in MONTHS) > 1,
+    }
+
+
+def _matches(rule: Dict, signals: Dict) -> bool:
+    limits = (
+        ("max_documents", "documents"),
+        ("max_context_tokens", "context_tokens"),
+        ("max_query_words", "query_words"),
+    )
+    for limit, signal in limits:
+        if rule.get(limit) is not None and signals[signal] > rule[limit]:
+            return False
+    if not rule.get("allow_history", True) and signals["has_history"]:
+        return False
+    if not rule.get("allow_complex", True) and signals["complex"]:
+        return False
+    return True
+
+
+def choose_generation_model(
+    signals: Dict,
+    policy: Optional[List[Dict]] = None,
+    default_model: Optional[str] = None,
+) -> Tuple[str, str]:
+    """Returns (model, name of the rule that chose it or "default")."""
+    if policy is None or default_model is None:
+        current = runtime_settings.get()
+        policy = current.model_policy if policy is None else policy
+        default_model = default_model or current.default_model
+    for rule in policy:
+        if _matches(rule, signals):
+            return rule["model"], rule.get("name", rule["model"])
+    return default_model, "default"
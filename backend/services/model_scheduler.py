@@ -0,0 +1,132 @@
+# Admission control for OpenAI calls.
+#
+# Every model call takes a slot from the scheduler first. Slots are capped in
+# total and per traffic class, so a large upload can't use up the rate limit
+# that chat turns need. When the total cap is reached, freed slots go to the
+# waiting calls of the highest-priority class first: query (rewrite, classify,
+# query embedding) and chat (generation) before ingest (document embedding).
+# A call that waits longer than its class's queue timeout raises
+# SchedulerBusy, which the chat stream reports as a "busy" error instead of
+# stalling on 429 retries. Limits are per worker process.
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from backend.services.metrics import MODEL_ADMISSIONS_TOTAL, MODEL_IN_FLIGHT, MODEL_QUEUE_DEPTH, MODEL_QUEUE_SECONDS
+from backend.utils.config import settings
+
+# Highest priority first
+TRAFFIC_CLASSES = ("query", "chat", "ingest")
+
+
+class SchedulerBusy(Exception):
+    """A model call waited longer than its queue timeout."""
+
+
+class ModelScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        limits: Dict[str, int],
+        timeouts: Dict[str, Optional[float]],
+    ):
+        unknown = set(limits) - set(TRAFFIC_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown traffic classes: {', '.join(sorted(unknown))}")
+        self.max_concurrency = max_concurrency
+        self.limits = {traffic: limits.get(traffic, max_concurrency) for traffic in TRAFFIC_CLASSES}
+        self.timeouts = {traffic: timeouts.get(traffic) for traffic in TRAFFIC_CLASSES}
+        self._in_flight = {traffic: 0 for traffic in TRAFFIC_CLASSES}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {traffic: deque() for traffic in TRAFFIC_CLASSES}
+
+    @property
+    def total_in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def _queued(self, traffic: str) -> int:
+        return sum(1 for waiter in self._queues[traffic] if not waiter.done())
+
+    def _has_slot(self, traffic: str) -> bool:
+        return self.total_in_flight < self.max_concurrency and self._in_flight[traffic] < self.limits[traffic]
+
+    def _grant(self, traffic: str):
+        self._in_flight[traffic] += 1
+        MODEL_IN_FLIGHT.inc(traffic=traffic)
+
+    def _dispatch(self):
+        """Hand free slots to waiting calls, highest-priority class first."""
+        for traffic in TRAFFIC_CLASSES:
+            queue = self._queues[traffic]
+            while queue and self._has_slot(traffic):
+                waiter = queue.popleft()
+                if waiter.done():
+                    # Gave up already
+                    continue
+                MODEL_QUEUE_DEPTH.dec(traffic=traffic)
+                self._grant(traffic)
+                waiter.set_result(None)
+
+    async def acquire(self, traffic: str):
+        if traffic not in self._queues:
+            raise ValueError(f"Unknown traffic class: {traffic}")
+        start = time.perf_counter()
+        # Releases dispatch right away, so a free slot means nobody eligible is queued
+        if self._has_slot(traffic):
+            self._grant(traffic)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[traffic].append(waiter)
+            MODEL_QUEUE_DEPTH.inc(traffic=traffic)
+            try:
+                await asyncio.wait_for(waiter, self.timeouts[traffic])
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as we gave up; hand the slot back
+                    self.release(traffic)
+                else:
+                    waiter.cancel()
+                    MODEL_QUEUE_DEPTH.dec(traffic=traffic)
+                if isinstance(e, asyncio.TimeoutError):
+                    MODEL_ADMISSIONS_TOTAL.inc(traffic=traffic, outcome="timeout")
+                    raise SchedulerBusy(
+                        f"No {traffic} model slot within {self.timeouts[traffic]}s "
+                        f"({self.total_in_flight} calls running, {self._queued(traffic)} {traffic} calls queued)"
+                    ) from None
+                raise
+        MODEL_QUEUE_SECONDS.observe(time.perf_counter() - start, traffic=traffic)
+        MODEL_ADMISSIONS_TOTAL.inc(traffic=traffic, outcome="admitted")
+
+    def release(self, traffic: str):
+        self._in_flight[traffic] -= 1
+        MODEL_IN_FLIGHT.dec(traffic=traffic)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, traffic: str):
+        """Hold one model call slot of `traffic` for the duration of the block."""
+        await self.acquire(traffic)
+        try:
+            yield
+        finally:
+            self.release(traffic)
+
+    def snapshot(self) -> Dict:
+        return {
+            traffic: {
+                "in_flight": self._in_flight[traffic],
+                "queued": self._queued(traffic),
+                "limit": self.limits[traffic],
+                "timeout": self.timeouts[traffic],
+            }
+            for traffic in TRAFFIC_CLASSES
+        }
+
+
+model_scheduler = ModelScheduler(
+    settings.MODEL_MAX_CONCURRENCY,
+    settings.MODEL_CLASS_LIMITS,
+    settings.MODEL_QUEUE_TIMEOUTS,
+)
@@ -0,0 +1,425 @@
+# Flat vector index in a memory-mapped NumPy file (VECTOR_STORE_BACKEND=numpy).
+#
+# At tens of thousands of chunks an exact scan is a handful of matrix
+# products: recall is exact, there is no HNSW graph to build or keep in memory,
+# and filtered queries only score the matching rows. The scan reads every
+# vector, so its latency grows with rows x dimensions; int8 storage and
+# truncated dimensions keep it small (see benchmarks/vector_backends.py). Vectors are L2-normalized, optionally truncated to
+# VECTOR_INDEX_DIMENSIONS (text-embedding-3 models keep working on shortened
+# vectors), and stored as int8, float16 or float32 in a .npy file under
+# `directory`. The file is memory-mapped, so workers share it through the page
+# cache. Chunk ids, texts and metadata live in <directory>/index.sqlite, which
+# also names the current vector file.
+#
+# Writes take SQLite's write lock (BEGIN IMMEDIATE), so workers can add and
+# delete concurrently; each worker reloads its in-memory view when
+# PRAGMA data_version shows another connection committed. Growing or
+# compacting the matrix writes a new file that becomes current in the same
+# commit as the row changes, so a failed write never leaves the two out of
+# step. Deleted rows are left as holes until there are enough to compact.
+#
+# Filters use the subset of Chroma's `where` syntax the backend needs:
+# field equality, $eq, $ne, $in, $nin, $and and $or.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# float16 halves the file but NumPy converts it slowly; int8 is smaller and faster
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Unit vectors have every component in [-1, 1]
+INT8_SCALE = 127.0
+# Rows converted to float32 per matrix product, bounds the scratch memory
+SEARCH_BLOCK_ROWS = 1024
+INITIAL_CAPACITY = 1024
+# Compact once this many rows, and this share of the file, are deleted
+COMPACT_MIN_DEAD_ROWS = 1024
+COMPACT_DEAD_FRACTION = 0.3
+
+
+def matches_filter(metadata: Dict, where: Dict) -> bool:
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq":
+                    ok = value == operand
+                elif op == "$ne":
+                    ok = value != operand
+                elif op == "$in":
+                    ok = value in operand
+                elif op == "$nin":
+                    ok = value not in operand
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if not ok:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    def __init__(
+        self,
+        directory: str,
+        embedding_function: Embeddings,
+        dtype: str = "int8",
+        dimensions: Optional[int] = None,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}. Supported: {', '.join(DTYPES)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.dtype = dtype
+        self.dimensions = dimensions
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._data_version = None
+        # Vector files written / superseded by the write in progress
+        self._new_files: List[str] = []
+        self._old_files: List[str] = []
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # Loading
+
+    def _load(self):
+        """(Re)build the in-memory view from index.sqlite and the vector file."""
+        for attempt in range(3):
+            try:
+                return self._load_once()
+            except FileNotFoundError:
+                # Another worker swapped the vector file between our reads
+                if attempt == 2:
+                    raise
+
+    def _load_once(self):
+        # Read settings and rows from one snapshot (writes already hold one)
+        own_snapshot = not self._db.in_transaction
+        if own_snapshot:
+            self._db.execute("BEGIN")
+        try:
+            self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            stored = dict(self._db.execute("SELECT key, value FROM settings").fetchall())
+            rows = self._db.execute("SELECT row, id, text, metadata FROM chunks ORDER BY row").fetchall()
+        finally:
+            if own_snapshot:
+                self._db.execute("COMMIT")
+
+        if stored:
+            if stored["dtype"] != self.dtype or (self.dimensions and int(stored["dimensions"]) != self.dimensions):
+                raise ValueError(
+                    f"Vector index in {self.directory} holds {stored['dimensions']}-dimensional "
+                    f"{stored['dtype']} vectors; rebuild it to use {self.dimensions or 'full'}-dimensional {self.dtype}"
+                )
+            self.dimensions = int(stored["dimensions"])
+
+        size = rows[-1][0] + 1 if rows else 0
+        self._ids: List[Optional[str]] = [None] * size
+        self._texts: List[Optional[str]] = [None] * size
+        self._metadatas: List[Optional[Dict]] = [None] * size
+        self._row_of: Dict[str, int] = {}
+        for row, chunk_id, text, metadata in rows:
+            self._ids[row] = chunk_id
+            self._texts[row] = text
+            self._metadatas[row] = json.loads(metadata)
+            self._row_of[chunk_id] = row
+        self._live = np.zeros(size, dtype=bool)
+        self._live[list(self._row_of.values())] = True
+
+        self._vectors_file = stored.get("vectors_file")
+        self._vectors = None
+        if self._vectors_file:
+            self._vectors = np.load(os.path.join(self.directory, self._vectors_file), mmap_mode="r+")
+
+    def _refresh(self):
+        """Reload if another connection (worker) committed since we last looked."""
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._new_files, self._old_files = [], []
+            try:
+                self._refresh()
+                yield
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._remove_files(self._new_files)
+                # The in-memory view may be half updated
+                self._load()
+                raise
+            # Workers still mapping an old file keep it readable until they reload
+            self._remove_files(self._old_files)
+
+    def _remove_files(self, names: List[str]):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    # Vectors
+
+    def _prepare(self, embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        """Truncate and L2-normalize, as float32."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(vectors), -1)
+        if self.dimensions:
+            if vectors.shape[1] < self.dimensions:
+                raise ValueError(f"Embeddings have {vectors.shape[1]} dimensions, index expects {self.dimensions}")
+            vectors = vectors[:, :self.dimensions]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors.astype(DTYPES[self.dtype])
+
+    def _ensure_capacity(self, rows: int, dimensions: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, INITIAL_CAPACITY)
+        self._rewrite(np.arange(len(self._ids)), new_capacity, dimensions)
+
+    def _rewrite(self, rows: np.ndarray, capacity: int, dimensions: int):
+        """Copy `rows` of the current matrix into a new file, current once the write commits."""
+        name = f"vectors-{uuid.uuid4().hex[:12]}.npy"
+        self._new_files.append(name)
+        vectors = np.lib.format.open_memmap(
+            os.path.join(self.directory, name), mode="w+", dtype=DTYPES[self.dtype], shape=(capacity, dimensions)
+        )
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            vectors[start:start + len(block)] = self._vectors[block]
+        vectors.flush()
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('vectors_file', ?)", (name,))
+        if self._vectors_file:
+            self._old_files.append(self._vectors_file)
+        self._vectors, self._vectors_file = vectors, name
+
+    def _compact_if_needed(self):
+        dead = len(self._ids) - len(self._row_of)
+        if dead < COMPACT_MIN_DEAD_ROWS or dead < COMPACT_DEAD_FRACTION * len(self._ids):
+            return
+        rows = np.flatnonzero(self._live)
+        capacity = max(INITIAL_CAPACITY, len(rows) * 2)
+        self._rewrite(rows, capacity, self._vectors.shape[1])
+        # Ascending order never moves a row onto one that is still occupied
+        self._db.executemany(
+            "UPDATE chunks SET row = ? WHERE row = ?",
+            [(new, int(old)) for new, old in enumerate(rows) if new != old],
+        )
+        self._ids = [self._ids[row] for row in rows]
+        self._texts = [self._texts[row] for row in rows]
+        self._metadatas = [self._metadatas[row] for row in rows]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._live = np.ones(len(rows), dtype=bool)
+        logger.info(f"Compacted vector index: {dead} deleted rows removed, {len(rows)} kept")
+
+    # VectorStore interface
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self.embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add precomputed embeddings; ids that already exist are replaced."""
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+
+        with self._write():
+            # After the refresh, so dimensions set by another worker apply
+            vectors = self._encode(self._prepare(embeddings))
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+            self._db.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                [("dtype", self.dtype), ("dimensions", str(self.dimensions))],
+            )
+            self._delete_rows([self._row_of[i] for i in ids if i in self._row_of])
+
+            start = len(self._ids)
+            self._ensure_capacity(start + len(ids), vectors.shape[1])
+            self._vectors[start:start + len(ids)] = vectors
+            self._vectors.flush()
+            self._db.executemany(
+                "INSERT INTO chunks (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, chunk_id, text, json.dumps(metadata)) for i, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))],
+            )
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._row_of.update({chunk_id: start + i for i, chunk_id in enumerate(ids)})
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        return ids
+
+    def _delete_rows(self, rows: List[int]):
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            self._db.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+        for row in rows:
+            del self._row_of[self._ids[row]]
+            self._ids[row] = self._texts[row] = self._metadatas[row] = None
+            self._live[row] = False
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete by chunk id and/or metadata filter, e.g. where={"document_id": {"$in": [...]}}."""
+        with self._write():
+            rows = {self._row_of[i] for i in ids or [] if i in self._row_of}
+            if where:
+                rows.update(row for row in self._row_of.values() if matches_filter(self._metadatas[row], where))
+            self._delete_rows(sorted(rows))
+            self._compact_if_needed()
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            self._refresh()
+            return [self._document(self._row_of[i]) for i in ids if i in self._row_of]
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self._texts[row], metadata=dict(self._metadatas[row]), id=self._ids[row])
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # Search
+
+    def search_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Exact top-k for a batch of query embeddings; returns (document, cosine
+        distance) lists in the order of the queries.
+        """
+        queries = self._prepare(embeddings)
+        with self._lock:
+            self._refresh()
+            if not self._row_of or self._vectors is None:
+                return [[] for _ in queries]
+
+            if filter:
+                # Pre-filter: only the matching rows are scored
+                rows = np.array([row for row in self._row_of.values() if matches_filter(self._metadatas[row], filter)], dtype=np.int64)
+                rows.sort()
+            else:
+                rows = None
+            size = len(self._ids) if rows is None else len(rows)
+            if size == 0:
+                return [[] for _ in queries]
+
+            scores = np.empty((size, len(queries)), dtype=np.float32)
+            for start in range(0, size, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, size)
+                block = self._vectors[start:stop] if rows is None else self._vectors[rows[start:stop]]
+                scores[start:stop] = block.astype(np.float32, copy=False) @ queries.T
+            if self.dtype == "int8":
+                scores /= INT8_SCALE
+            if rows is None:
+                scores[~self._live] = -np.inf
+
+            results = []
+            for column in scores.T:
+                top = min(k, size)
+                best = np.argpartition(-column, top - 1)[:top]
+                best = best[np.argsort(-column[best])]
+                results.append([
+                    (self._document(row), float(1.0 - column[i]))
+                    for i, row in ((i, int(i if rows is None else rows[i])) for i in best)
+                    if np.isfinite(column[i])
+                ])
+            return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([self.embedding_function.embed_query(query)], k, filter)[0]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "./vector_index",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -1,64 +1,44 @@
-from langchain_openai import ChatOpenAI
+import logging
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
+from backend.services.model_scheduler import SchedulerBusy, model_scheduler
+from backend.services.http_clients import openai_client_kwargs
+from backend.services.metrics import LLM_FALLBACKS_TOTAL
+from backend.services.instant_answers import DEFAULT_RESPONSE, instant_answers
+from backend.services.runtime_settings import RuntimeSettings, runtime_settings
 from backend.utils.config import settings
 
-
-# Simple greetings that don't need LLM classification (instant response)
-SIMPLE_GREETINGS = {
-    # Indonesian
-    "halo", "hai", "hi", "hey", "hello", "hallo",
-    "selamat pagi", "selamat siang", "selamat sore", "selamat malam",
-    "pagi", "siang", "sore", "malam",
-    "terima kasih", "terimakasih", "makasih", "thanks", "thank you", "thx",
-    "ok", "oke", "okay", "sip", "siap", "baik",
-    "bye", "bye bye", "dadah", "sampai jumpa",
-    "hehe", "haha", "wkwk", "lol",
-    # English
-    "good morning", "good afternoon", "good evening", "good night",
-}
+logger = logging.getLogger(__name__)
 
 
 def is_simple_greeting(query: str) -> bool:
-    """Check if query is a simple greeting without LLM."""
-    normalized = query.lower().strip().rstrip("!?.,:;")
-    return normalized in SIMPLE_GREETINGS or len(normalized) <= 3
-
-
-# Pre-defined instant responses for simple greetings
-INSTANT_RESPONSES = {
-    "halo": "Halo! Ada yang bisa saya bantu terkait data reimbursement?",
-    "hai": "Hai! Silakan tanyakan tentang data reimburse.",
-    "hi": "Hi! Ada yang bisa saya bantu?",
-    "hello": "Hello! Silakan tanyakan tentang reimbursement.",
-    "terima kasih": "Sama-sama! Senang bisa membantu.",
-    "terimakasih": "Sama-sama! Ada yang lain yang bisa saya bantu?",
-    "makasih": "Sama-sama! 😊",
-    "thanks": "You're welcome!",
-    "ok": "Baik, ada pertanyaan lain tentang reimbursement?",
-    "oke": "Siap! Ada yang lain?",
-    "bye": "Sampai jumpa! 👋",
-}
+    """Check if query has an instant answer (no LLM needed)."""
+    return instant_answers.match_loaded(query) is not None
 
 
 def get_instant_response(query: str) -> str:
     """Get instant response for simple greetings."""
-    normalized = query.lower().strip().rstrip("!?.,:;")
-    return INSTANT_RESPONSES.get(normalized, "Halo! Ada yang bisa saya bantu terkait reimbursement?")
+    match = instant_answers.match_loaded(query)
+    return match.response if match else DEFAULT_RESPONSE
 
 
-# Initialize a fast, cheap model for classification
-_classifier_llm = None
+# A fast, cheap model for classification, one instance per (model, max_tokens)
+_classifier_llms = {}
 
-def get_classifier_llm():
-    global _classifier_llm
-    if _classifier_llm is None:
-        _classifier_llm = ChatOpenAI(
-            model="gpt-4.1-nano", 
+def get_classifier_llm(tuning: Optional[RuntimeSettings] = None):
+    tuning = tuning or runtime_settings.get()
+    key = (tuning.classifier_model, tuning.classifier_max_tokens)
+    if key not in _classifier_llms:
+        from langchain_openai import ChatOpenAI
+        _classifier_llms[key] = ChatOpenAI(
+            model=tuning.classifier_model, 
             temperature=0,
             openai_api_key=settings.OPENAI_API_KEY,
-            max_tokens=50
+            base_url=settings.OPENAI_BASE_URL or None,
+            **openai_client_kwargs(),
+            max_tokens=tuning.classifier_max_tokens
         )
-    return _classifier_llm
+    return _classifier_llms[key]
 
 
 CLASSIFICATION_PROMPT = ChatPromptTemplate.from_template("""
@@ -76,7 +56,7 @@ Respond with ONLY one word: either "RAG" or "CHAT"
 """)
 
 
-async def classify_query(query: str) -> str:
+async def classify_query(query: str, tuning: Optional[RuntimeSettings] = None) -> str:
     """
     Classify query using LLM.
     
@@ -85,9 +65,10 @@ async def classify_query(query: str) -> str:
         "CHAT" if query is just greeting/thanks/etc
     """
     try:
-        llm = get_classifier_llm()
+        llm = get_classifier_llm(tuning)
         chain = CLASSIFICATION_PROMPT | llm
-        result = await chain.ainvoke({"query": query})
+        async with model_scheduler.slot("query"):
+            result = await chain.ainvoke({"query": query})
         classification = result.content.strip().upper()
         
         # Validate response
@@ -95,8 +76,11 @@ async def classify_query(query: str) -> str:
             return classification
         return "RAG"  # Default to RAG if unclear
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
-        print(f"Classification error: {e}")
+        logger.warning(f"Classification failed, defaulting to RAG: {e}")
+        LLM_FALLBACKS_TOTAL.inc(stage="classify")
         return "RAG"  # Default to RAG on error
 
 
@@ -115,14 +99,15 @@ def is_reimbursement_related(query: str) -> bool:
         return True
 
 
-async def is_reimbursement_related_async(query: str) -> bool:
-    """Check if query needs RAG - with fast-path for simple greetings."""
-    # Fast path: simple greetings don't need RAG
-    if is_simple_greeting(query):
+async def is_reimbursement_related_async(query: str, tuning: Optional[RuntimeSettings] = None) -> bool:
+    """Check if query needs RAG - with fast-path for instant answers."""
+    # Fast path: greetings and other canned answers don't need RAG
+    max_distance = tuning.instant_answer_max_distance if tuning else None
+    if await instant_answers.match(query, max_distance):
         return False
     
     # Otherwise use LLM classification
-    result = await classify_query(query)
+    result = await classify_query(query, tuning)
     return result == "RAG"
 
 
@@ -132,9 +117,9 @@ CHAT_RESPONSES = {
 }
 
 
-async def get_chat_response(query: str) -> str:
+async def get_chat_response(query: str, tuning: Optional[RuntimeSettings] = None) -> str:
     try:
-        llm = get_classifier_llm()
+        llm = get_classifier_llm(tuning)
         prompt = ChatPromptTemplate.from_template("""
         Kamu adalah asisten ramah untuk sistem reimbursement.
         User mengirim pesan yang BUKAN tentang data reimbursement (sapaan/ucapan terima kasih/dll).
@@ -147,18 +132,26 @@ async def get_chat_response(query: str) -> str:
         Balasan singkat (1-2 kalimat):
 """)
         chain = prompt | llm
-        result = await chain.ainvoke({"query": query})
+        async with model_scheduler.slot("chat"):
+            result = await chain.ainvoke({"query": query})
         return result.content.strip()
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
-        print(f"Chat response error: {e}")
+        logger.warning(f"Chat response failed, using the default reply: {e}")
+        LLM_FALLBACKS_TOTAL.inc(stage="chat")
         return CHAT_RESPONSES["default"]
 
 
 async def get_non_rag_response(query: str) -> str:
     try:
-        logger.info(f"Chat response: {await get_chat_response(query)}")
-        return await get_chat_response(query)
+        response = await get_chat_response(query)
+        logger.info(f"Chat response: {response}")
+        return response
+    except SchedulerBusy:
+        raise
     except Exception as e:
         logger.error(f"Failed to get chat response: {e}")
+        LLM_FALLBACKS_TOTAL.inc(stage="chat")
         return CHAT_RESPONSES["default"]
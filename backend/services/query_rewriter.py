@@ -1,48 +1,62 @@
-from langchain_openai import ChatOpenAI
+import logging
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
+from backend.services.model_scheduler import SchedulerBusy, model_scheduler
+from backend.services.http_clients import openai_client_kwargs
+from backend.services.metrics import LLM_FALLBACKS_TOTAL
+from backend.services.runtime_settings import RuntimeSettings, runtime_settings
 from backend.utils.config import settings
 
+logger = logging.getLogger(__name__)
 
-# Cache the LLM instance
-_rewriter_llm = None
 
-def get_rewriter_llm():
-    global _rewriter_llm
-    if _rewriter_llm is None:
-        _rewriter_llm = ChatOpenAI(
-            model="gpt-4.1-nano", 
+# One LLM instance per (model, max_tokens), both are runtime settings
+_rewriter_llms = {}
+
+def get_rewriter_llm(tuning: Optional[RuntimeSettings] = None):
+    tuning = tuning or runtime_settings.get()
+    key = (tuning.rewriter_model, tuning.rewriter_max_tokens)
+    if key not in _rewriter_llms:
+        from langchain_openai import ChatOpenAI
+        _rewriter_llms[key] = ChatOpenAI(
+            model=tuning.rewriter_model, 
             temperature=0,
             openai_api_key=settings.OPENAI_API_KEY,
-            max_tokens=100
+            base_url=settings.OPENAI_BASE_URL or None,
+            **openai_client_kwargs(),
+            max_tokens=tuning.rewriter_max_tokens
         )
-    return _rewriter_llm
+    return _rewriter_llms[key]
+
+
+# Compiled once at import instead of on every rewrite
+REWRITE_PROMPT = ChatPromptTemplate.from_template("""Rewrite this query for search by adding context from history.
+
+        History: {chat_history}
+
+        Query: "{query}"
+
+        Rewritten (just the search terms):""")
 
 
-async def rewrite_query_with_context(query: str, chat_history: str) -> str:   
+async def rewrite_query_with_context(query: str, chat_history: str, tuning: Optional[RuntimeSettings] = None) -> str:   
+    tuning = tuning or runtime_settings.get()
     # FAST PATH: If no history, return query as-is (no LLM needed)
     if not chat_history or not chat_history.strip():
         return query
     
     # Long queries are usually complete, skip rewrite
-    if len(query.split()) > 5:
+    if len(query.split()) > tuning.rewrite_max_words:
         return query
     
     try:
-        llm = get_rewriter_llm()
-        
-        prompt = ChatPromptTemplate.from_template("""Rewrite this query for search by adding context from history.
-
-        History: {chat_history}
-
-        Query: "{query}"
-
-        Rewritten (just the search terms):""")
-        
-        chain = prompt | llm
-        result = await chain.ainvoke({
-            "query": query,
-            "chat_history": chat_history[-500:] 
-        })
+        llm = get_rewriter_llm(tuning)
+        chain = REWRITE_PROMPT | llm
+        async with model_scheduler.slot("query"):
+            result = await chain.ainvoke({
+                "query": query,
+                "chat_history": chat_history[-tuning.rewrite_history_chars:] if tuning.rewrite_history_chars else ""
+            })
         
         rewritten = result.content.strip().strip('"').strip("'")
         
@@ -52,7 +66,10 @@ async def rewrite_query_with_context(query: str, chat_history: str) -> str:
             
         return rewritten
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
-        print(f"Query rewrite error: {e}")
+        logger.warning(f"Query rewrite failed, using the original query: {e}")
+        LLM_FALLBACKS_TOTAL.inc(stage="rewrite")
         return query
 
@@ -0,0 +1,132 @@
+# Cache of vector search results for repeated (rewritten) queries.
+#
+# A RAG turn embeds its query over the network and searches the index, even
+# when the same rewritten query was answered a minute ago. Results are cached
+# as chunk ids and distances, tagged with the corpus_version they were
+# computed at, so any upload or delete invalidates them. Two tiers:
+#
+#   - an LRU of hydrated documents in this process, and
+#   - the retrieval_cache table in SQLite, shared by every worker; a hit
+#     there only needs the chunk texts fetched from the vector store by id.
+#
+# Entries also expire after RETRIEVAL_CACHE_TTL_SECONDS.
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.services import sqlite_client
+from backend.services.chroma_client import run_chroma
+from backend.services.corpus_stats import corpus_version
+from backend.services.metrics import RETRIEVAL_CACHE_SAVED_SECONDS, RETRIEVAL_CACHE_TOTAL
+from backend.services.model_scheduler import model_scheduler
+from backend.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    def __init__(self, max_entries: int, shared_max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.shared_max_entries = shared_max_entries
+        self.ttl = ttl
+        # key -> (corpus_version, created_at, seconds, docs_with_scores)
+        self._entries: "OrderedDict[str, Tuple[int, float, float, List[Tuple[Document, float]]]]" = OrderedDict()
+
+    async def search(self, vectorstore, query: str, k: int, key: str) -> List[Tuple[Document, float]]:
+        """
+        similarity_search_with_score(query, k), served from cache when the same
+        key was searched at the current corpus version. `key` is the caller's
+        normalized form of the query.
+        """
+        key = hashlib.sha1(f"{k}\n{key}".encode()).hexdigest()
+        version = await corpus_version.get()
+        start = time.perf_counter()
+
+        cached = self._get_local(key, version)
+        if cached is not None:
+            seconds, docs_with_scores = cached
+            self._record("hit_memory", seconds, time.perf_counter() - start)
+            return docs_with_scores
+
+        try:
+            cached = await self._get_shared(vectorstore, key, version)
+        except Exception as e:
+            logger.warning(f"Shared retrieval cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            seconds, docs_with_scores = cached
+            self._put_local(key, version, seconds, docs_with_scores)
+            self._record("hit_shared", seconds, time.perf_counter() - start)
+            return docs_with_scores
+
+        # Embedding the query is a model call
+        async with model_scheduler.slot("query"):
+            docs_with_scores = await run_chroma(vectorstore.similarity_search_with_score, query, k=k)
+        seconds = time.perf_counter() - start
+        RETRIEVAL_CACHE_TOTAL.inc(result="miss")
+
+        # Results without ids (e.g. a store that does not return them) can't be
+        # rehydrated by other workers, so they stay local
+        self._put_local(key, version, seconds, docs_with_scores)
+        if all(doc.id for doc, _ in docs_with_scores):
+            try:
+                await sqlite_client.put_cached_retrieval(
+                    key,
+                    version,
+                    json.dumps([[doc.id, score] for doc, score in docs_with_scores]),
+                    seconds,
+                    self.shared_max_entries,
+                    time.time() - self.ttl,
+                )
+            except Exception as e:
+                logger.warning(f"Shared retrieval cache write failed: {e}")
+        return docs_with_scores
+
+    def _record(self, result: str, original_seconds: float, lookup_seconds: float):
+        RETRIEVAL_CACHE_TOTAL.inc(result=result)
+        RETRIEVAL_CACHE_SAVED_SECONDS.inc(max(0.0, original_seconds - lookup_seconds))
+
+    def _get_local(self, key: str, version: int) -> Optional[Tuple[float, List[Tuple[Document, float]]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_version, created_at, seconds, docs_with_scores = entry
+        if entry_version != version or time.time() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return seconds, docs_with_scores
+
+    def _put_local(self, key: str, version: int, seconds: float, docs_with_scores: List[Tuple[Document, float]]):
+        self._entries[key] = (version, time.time(), seconds, docs_with_scores)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, vectorstore, key: str, version: int) -> Optional[Tuple[float, List[Tuple[Document, float]]]]:
+        row = await sqlite_client.get_cached_retrieval(key, version, time.time() - self.ttl)
+        if row is None:
+            return None
+        results = json.loads(row["results"])
+        if not results:
+            return row["seconds"], []
+
+        ids = [chunk_id for chunk_id, _ in results]
+        by_id = {doc.id: doc for doc in await run_chroma(vectorstore.get_by_ids, ids)}
+        if len(by_id) != len(ids):
+            # A chunk vanished without the version moving yet; search again
+            return None
+        return row["seconds"], [(by_id[chunk_id], score) for chunk_id, score in results]
+
+
+retrieval_cache = RetrievalCache(
+    settings.RETRIEVAL_CACHE_SIZE,
+    settings.RETRIEVAL_CACHE_SHARED_SIZE,
+    settings.RETRIEVAL_CACHE_TTL_SECONDS,
+)
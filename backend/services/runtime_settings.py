@@ -0,0 +1,262 @@
+# Performance settings that can be changed while the API is running.
+#
+# Retrieval k and cutoffs, context budget, model choice and max_tokens,
+# chunking and the cache / coalescing switches are read from a snapshot kept
+# in memory. Its defaults are the environment settings (or the values the code
+# used before they were tunable); overrides made through /admin/settings are
+# stored as JSON in the SQLite config table next to a version counter. A
+# background task in every worker checks the counter every MAX_STALENESS
+# seconds and rebuilds the snapshot when it moved, so a change reaches all
+# workers within about a second without a restart, and reading the settings
+# on a request never touches the database.
+#
+# An experiment splits chat traffic between variants, each a set of overrides
+# on top of the current snapshot. Users are assigned by a stable hash, the
+# variant is recorded on the chat trace and in
+# rag_experiment_request_seconds, so settings can be A/B tested live.
+
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from backend.services import sqlite_client
+from backend.services.context_selector import SelectionParams
+from backend.services.metrics import RUNTIME_SETTINGS_VERSION
+from backend.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERRIDES_KEY = "runtime_settings"
+EXPERIMENT_KEY = "runtime_experiment"
+VERSION_KEY = "runtime_settings_version"
+MAX_STALENESS = 1.0
+
+
+@dataclass(frozen=True)
+class RuntimeSettings:
+    # Context selection, see SelectionParams
+    candidate_k: int = settings.RETRIEVAL_CANDIDATE_K
+    min_k: int = settings.RETRIEVAL_MIN_K
+    max_k: int = settings.RETRIEVAL_MAX_K
+    max_distance: Optional[float] = settings.RETRIEVAL_MAX_DISTANCE
+    relative_margin: Optional[float] = settings.RETRIEVAL_RELATIVE_MARGIN
+    elbow_gap: Optional[float] = settings.RETRIEVAL_ELBOW_GAP
+    retrieval_cache_enabled: bool = settings.RETRIEVAL_CACHE_ENABLED
+    # Context packing
+    context_token_budget: int = settings.RAG_CONTEXT_TOKEN_BUDGET
+    duplicate_threshold: float = settings.RAG_DUPLICATE_THRESHOLD
+    # Generation model routing
+    default_model: str = settings.RAG_DEFAULT_MODEL
+    model_policy: List[Dict[str, Any]] = field(default_factory=lambda: list(settings.RAG_MODEL_POLICY))
+    # Query rewriting: queries longer than rewrite_max_words are used as-is
+    rewriter_model: str = "gpt-4.1-nano"
+    rewriter_max_tokens: int = 100
+    rewrite_max_words: int = 5
+    rewrite_history_chars: int = 500
+    # Classification and non-RAG replies
+    classifier_model: str = "gpt-4.1-nano"
+    classifier_max_tokens: int = 50
+    coalesce_enabled: bool = settings.CHAT_COALESCE_ENABLED
+    # Instant answers: edits allowed in a fuzzy match, 0 for exact matches only
+    instant_answer_max_distance: int = 2
+    # Ingestion; applies to documents uploaded afterwards
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+
+    def selection(self) -> SelectionParams:
+        return SelectionParams(**{f.name: getattr(self, f.name) for f in fields(SelectionParams)})
+
+    def validate(self):
+        self.selection().validate()
+        for name in ("context_token_budget", "rewriter_max_tokens", "classifier_max_tokens", "chunk_size"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        for name in ("rewrite_max_words", "rewrite_history_chars", "instant_answer_max_distance"):
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} must be non-negative")
+        if not 0 < self.duplicate_threshold <= 1:
+            raise ValueError("duplicate_threshold must be in (0, 1]")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError("Expected 0 <= chunk_overlap < chunk_size")
+        for name in ("default_model", "rewriter_model", "classifier_model"):
+            if not getattr(self, name):
+                raise ValueError(f"{name} cannot be empty")
+        for rule in self.model_policy:
+            if not isinstance(rule, dict) or not rule.get("model"):
+                raise ValueError("Every model_policy rule needs a model")
+
+
+_adapter = TypeAdapter(RuntimeSettings)
+SETTING_NAMES = tuple(f.name for f in fields(RuntimeSettings))
+
+
+def build_settings(overrides: Dict[str, Any]) -> RuntimeSettings:
+    """Defaults plus overrides, type-checked and validated; raises ValueError."""
+    unknown = set(overrides) - set(SETTING_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    try:
+        tuning = _adapter.validate_python({**asdict(RuntimeSettings()), **overrides})
+    except ValidationError as e:
+        raise ValueError(str(e))
+    tuning.validate()
+    return tuning
+
+
+@dataclass(frozen=True)
+class Experiment:
+    name: str
+    # Variant name -> overrides on top of the current settings
+    variants: Dict[str, Dict[str, Any]]
+    # Relative traffic per variant; equal split when empty
+    weights: Dict[str, float] = field(default_factory=dict)
+
+    def validate(self):
+        if not self.name:
+            raise ValueError("Experiment name cannot be empty")
+        if len(self.variants) < 2:
+            raise ValueError("An experiment needs at least two variants")
+        unknown = set(self.weights) - set(self.variants)
+        if unknown:
+            raise ValueError(f"Weights for unknown variants: {', '.join(sorted(unknown))}")
+        if any(weight < 0 for weight in self.weights.values()) or (self.weights and not sum(self.weights.values())):
+            raise ValueError("Weights must be non-negative and not all zero")
+
+    def assign(self, subject: str) -> str:
+        """Stable variant for a user: the same subject always lands in the same variant."""
+        weights = [(name, self.weights.get(name, 0 if self.weights else 1)) for name in sorted(self.variants)]
+        digest = hashlib.sha1(f"{self.name}:{subject}".encode()).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64 * sum(weight for _, weight in weights)
+        for name, weight in weights:
+            if point < weight:
+                return name
+            point -= weight
+        return weights[-1][0]
+
+
+class RuntimeSettingsStore:
+    def __init__(self, max_staleness: float = MAX_STALENESS):
+        self.max_staleness = max_staleness
+        self._version: Optional[int] = None
+        self._overrides: Dict[str, Any] = {}
+        self._current = RuntimeSettings()
+        self._experiment: Optional[Experiment] = None
+        self._variants: Dict[str, RuntimeSettings] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.max_staleness)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Runtime settings refresh failed: {e}")
+
+    async def refresh(self):
+        """Reload the snapshot if the stored version moved."""
+        async with self._lock:
+            rows = await sqlite_client.get_config_values(VERSION_KEY, OVERRIDES_KEY, EXPERIMENT_KEY)
+            version = int(rows.get(VERSION_KEY, 0))
+            if version != self._version:
+                self._load(version, rows)
+
+    def _load(self, version: int, rows: Dict[str, str]):
+        try:
+            overrides = json.loads(rows.get(OVERRIDES_KEY) or "{}")
+            current = build_settings(overrides)
+            experiment, variants = None, {}
+            if rows.get(EXPERIMENT_KEY):
+                experiment = Experiment(**json.loads(rows[EXPERIMENT_KEY]))
+                variants = {name: build_settings({**overrides, **changes}) for name, changes in experiment.variants.items()}
+        except (ValueError, TypeError) as e:
+            # E.g. a stored override the current defaults no longer allow
+            logger.error(f"Ignoring runtime settings version {version}: {e}")
+            self._version = version
+            return
+        self._overrides, self._current = overrides, current
+        self._experiment, self._variants = experiment, variants
+        if self._version is not None:
+            logger.info(f"Runtime settings version {version} loaded: overrides {overrides}, experiment {experiment}")
+        self._version = version
+        RUNTIME_SETTINGS_VERSION.set(version)
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def get(self) -> RuntimeSettings:
+        return self._current
+
+    def assign(self, subject: str) -> Tuple[RuntimeSettings, Optional[str], Optional[str]]:
+        """Settings for one user's request, and the experiment and variant it fell into, if any."""
+        experiment, variants = self._experiment, self._variants
+        if experiment is None:
+            return self._current, None, None
+        variant = experiment.assign(subject)
+        return variants[variant], experiment.name, variant
+
+    def describe(self) -> Dict:
+        return {
+            "version": self._version,
+            "values": asdict(self._current),
+            "overrides": dict(self._overrides),
+            "experiment": asdict(self._experiment) if self._experiment else None,
+        }
+
+    async def _save(self, values: Dict[str, Optional[str]]):
+        await sqlite_client.set_config_values(values, VERSION_KEY)
+        await self.refresh()
+
+    async def update(self, changes: Dict[str, Any]) -> RuntimeSettings:
+        """Override settings for every worker; raises ValueError on bad values."""
+        await self.refresh()
+        overrides = {**self._overrides, **changes}
+        current = build_settings(overrides)
+        if self._experiment:
+            # Variants apply on top, so they must stay valid too
+            for variant in self._experiment.variants.values():
+                build_settings({**overrides, **variant})
+        await self._save({OVERRIDES_KEY: json.dumps(overrides)})
+        return current
+
+    async def reset(self, names: Optional[List[str]] = None) -> RuntimeSettings:
+        """Back to the defaults for the given settings, or all of them."""
+        await self.refresh()
+        unknown = set(names or ()) - set(SETTING_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        overrides = {k: v for k, v in self._overrides.items() if names is not None and k not in names}
+        await self._save({OVERRIDES_KEY: json.dumps(overrides)})
+        return self._current
+
+    async def start_experiment(self, experiment: Experiment) -> Dict:
+        await self.refresh()
+        experiment.validate()
+        for variant in experiment.variants.values():
+            build_settings({**self._overrides, **variant})
+        await self._save({EXPERIMENT_KEY: json.dumps(asdict(experiment))})
+        return self.describe()
+
+    async def stop_experiment(self) -> Dict:
+        await self._save({EXPERIMENT_KEY: None})
+        return self.describe()
+
+
+runtime_settings = RuntimeSettingsStore()
@@ -0,0 +1,111 @@
+# Coalescing of identical in-flight work.
+#
+# At month-end many users ask the same question within seconds. Calls that
+# share a key while one is already running join it instead of starting their
+# own: `run` shares a single awaited result, `stream` shares one producer whose
+# events are replayed to every subscriber, including ones that join midway.
+# Entries are removed as soon as the work finishes; this is not a cache.
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from backend.services.metrics import COALESCED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Any):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def changed(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._results: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _Flight] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await func(), or the result of an identical call already in progress."""
+        task = self._results.get(key)
+        if task is None:
+            COALESCED_TOTAL.inc(flight=self.name, role="leader")
+            # Own task, so the caller that started it can go away without
+            # cancelling the work for everyone else
+            task = self._results[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._results.pop(key, None) if self._results.get(key) is t else None)
+        else:
+            COALESCED_TOTAL.inc(flight=self.name, role="follower")
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, producer: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate producer()'s events, sharing one producer per key.
+
+        The producer runs as its own task so that a subscriber disconnecting
+        does not cut the stream short for the others; it is cancelled only
+        when every subscriber has gone.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            COALESCED_TOTAL.inc(flight=self.name, role="leader")
+            flight = self._streams[key] = _Flight()
+            flight.task = asyncio.create_task(self._produce(key, flight, producer))
+        else:
+            COALESCED_TOTAL.inc(flight=self.name, role="follower")
+
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                if index < len(flight.events):
+                    yield flight.events[index]
+                    index += 1
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.changed()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+
+    async def _produce(self, key: Hashable, flight: _Flight, producer: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for event in producer():
+                flight.publish(event)
+        except asyncio.CancelledError:
+            flight.finish(asyncio.CancelledError())
+        except Exception as e:
+            logger.error(f"Shared {self.name} stream failed: {e}")
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            # Later callers start a fresh flight
+            if self._streams.get(key) is flight:
+                del self._streams[key]
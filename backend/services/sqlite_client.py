@@ -1,8 +1,15 @@
+import time
 import aiosqlite
 from backend.utils.config import settings
+from backend.services.metrics import SQLITE_QUERY_SECONDS, timed
 
 DB_PATH = settings.SQLITE_DB_PATH
 
+
+def _timed_query(func):
+    return timed(SQLITE_QUERY_SECONDS, query=func.__name__)(func)
+
+
 async def init_db():
     async with aiosqlite.connect(DB_PATH) as db:
         # Enable WAL mode for better concurrency
@@ -58,6 +65,110 @@ async def init_db():
             columns = [col[1] for col in await cursor.fetchall()]
             if "session_id" not in columns:
                 await db.execute("ALTER TABLE chat_history ADD COLUMN session_id TEXT")
+
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, created_at)"
+        )
+
+        # Bounded ring of recent request spans, trimmed by services/tracing.py
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS traces (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT,
+                name TEXT,
+                start_time TEXT,
+                latency REAL,
+                status TEXT,
+                error TEXT,
+                metadata TEXT
+            )
+        """)
+
+        # Vector store ids of each document's chunks, so deletes can go by id
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                document_id TEXT NOT NULL
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_document_chunks_document ON document_chunks (document_id)"
+        )
+        # Vector deletions still owed for documents already removed from SQLite.
+        # A NULL chunk_id means the document predates chunk tracking and has to
+        # be deleted by metadata.
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS pending_vector_deletes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id TEXT NOT NULL,
+                chunk_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Vector search results shared between workers (see services/retrieval_cache.py)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS retrieval_cache (
+                key TEXT PRIMARY KEY,
+                corpus_version INTEGER NOT NULL,
+                results TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_retrieval_cache_created ON retrieval_cache (created_at)"
+        )
+
+        # Counters maintained alongside every write (see _bump_stats)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS corpus_stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_daily (
+                day TEXT PRIMARY KEY,
+                documents INTEGER NOT NULL DEFAULT 0,
+                chunks INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Canned answers served without any LLM call (see services/instant_answers.py);
+        # patterns are stored normalized
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS instant_answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pattern TEXT UNIQUE NOT NULL,
+                response TEXT NOT NULL,
+                fuzzy INTEGER NOT NULL DEFAULT 1,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS instant_answer_daily (
+                day TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                llm_calls_saved INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        async with db.execute("SELECT COUNT(*) FROM corpus_stats") as cursor:
+            seeded = (await cursor.fetchone())[0] > 0
+        # OR IGNORE also adds keys introduced after a database was seeded
+        await db.executemany(
+            "INSERT OR IGNORE INTO corpus_stats (key, value) VALUES (?, 0)",
+            [(key,) for key in STAT_KEYS]
+        )
+        if not seeded:
+            await _recompute_stats(db)
+            await db.execute("""
+                INSERT OR REPLACE INTO ingest_daily (day, documents, chunks)
+                SELECT date(created_at), COUNT(*), COALESCE(SUM(chunk_count), 0)
+                FROM documents GROUP BY date(created_at)
+            """)
                 
         await db.commit()
 
@@ -66,16 +177,80 @@ async def get_db():
         db.row_factory = aiosqlite.Row
         yield db
 
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Sequence
+
+# Stay well below SQLite's bound-parameter limit in IN (...) lists
+MAX_SQL_VARIABLES = 500
+
+def _batched(items: Sequence, size: int = MAX_SQL_VARIABLES):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# "version" moves on every counter change except the chat counters;
+# "corpus_version" only when the set of searchable documents changes (upload,
+# delete, vector purge)
+STAT_KEYS = ("documents", "chunks", "users", "chat_sessions", "chat_messages", "version", "corpus_version")
+# Change on nearly every chat turn, so they are adjusted without moving
+# "version"; readers pick them up with the version check (get_stat_counters)
+CHAT_STAT_KEYS = ("chat_sessions", "chat_messages")
+
+# Number of stat / corpus updates made by this process, lets in-memory copies
+# notice local writes without polling SQLite
+stats_write_count = 0
+corpus_write_count = 0
 
+async def _bump_stats(db, **deltas):
+    """
+    Apply counter deltas inside the caller's transaction and bump the version,
+    unless only chat counters changed.
+    """
+    global stats_write_count, corpus_write_count
+    params = [(delta, key) for key, delta in deltas.items() if delta]
+    chat_only = bool(deltas) and set(deltas) <= set(CHAT_STAT_KEYS)
+    if not chat_only:
+        params.append((1, "version"))
+        stats_write_count += 1
+    if not params:
+        return
+    await db.executemany("UPDATE corpus_stats SET value = value + ? WHERE key = ?", params)
+    if deltas.get("corpus_version"):
+        corpus_write_count += 1
+
+async def _recompute_stats(db) -> Dict[str, Dict[str, int]]:
+    """Recount every counter from the source tables; returns the ones that drifted."""
+    queries = {
+        "documents": "SELECT COUNT(*) FROM documents",
+        "chunks": "SELECT COALESCE(SUM(chunk_count), 0) FROM documents",
+        "users": "SELECT COUNT(*) FROM users",
+        "chat_sessions": "SELECT COUNT(*) FROM chat_sessions",
+        "chat_messages": "SELECT COUNT(*) FROM chat_history",
+    }
+    async with db.execute("SELECT key, value FROM corpus_stats") as cursor:
+        stored = {key: value for key, value in await cursor.fetchall()}
+
+    drift = {}
+    for key, query in queries.items():
+        async with db.execute(query) as cursor:
+            actual = (await cursor.fetchone())[0]
+        if stored.get(key) != actual:
+            drift[key] = {"stored": stored.get(key), "actual": actual}
+            await db.execute("UPDATE corpus_stats SET value = ? WHERE key = ?", (actual, key))
+
+    if drift:
+        await _bump_stats(db)
+    return drift
+
+@_timed_query
 async def create_user(user: Dict):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             "INSERT INTO users (id, username, password_hash, role) VALUES (?, ?, ?, ?)",
             (user["id"], user["username"], user["password_hash"], user["role"])
         )
+        await _bump_stats(db, users=1)
         await db.commit()
 
+@_timed_query
 async def get_user_by_username(username: str) -> Optional[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -85,14 +260,31 @@ async def get_user_by_username(username: str) -> Optional[Dict]:
                 return dict(row)
             return None
 
+@_timed_query
 async def create_document(doc: Dict):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             "INSERT INTO documents (id, filename, chunk_count) VALUES (?, ?, ?)",
             (doc["id"], doc["filename"], doc["chunk_count"])
         )
+        await db.execute(
+            """
+            INSERT INTO ingest_daily (day, documents, chunks) VALUES (date('now'), 1, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                documents = documents + 1,
+                chunks = chunks + excluded.chunks
+            """,
+            (doc["chunk_count"],)
+        )
+        if doc.get("chunk_ids"):
+            await db.executemany(
+                "INSERT OR IGNORE INTO document_chunks (chunk_id, document_id) VALUES (?, ?)",
+                [(chunk_id, doc["id"]) for chunk_id in doc["chunk_ids"]]
+            )
+        await _bump_stats(db, documents=1, chunks=doc["chunk_count"], corpus_version=1)
         await db.commit()
 
+@_timed_query
 async def get_all_documents() -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -100,6 +292,7 @@ async def get_all_documents() -> List[Dict]:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+@_timed_query
 async def get_documents_paginated(limit: int, offset: int, search: str = None) -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -117,6 +310,7 @@ async def get_documents_paginated(limit: int, offset: int, search: str = None) -
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+@_timed_query
 async def get_document_count(search: str = None) -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         query = "SELECT COUNT(*) FROM documents"
@@ -130,17 +324,94 @@ async def get_document_count(search: str = None) -> int:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
+@_timed_query
 async def get_total_chunks() -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute("SELECT SUM(chunk_count) FROM documents") as cursor:
             row = await cursor.fetchone()
             return row[0] if row and row[0] else 0
 
-async def delete_document(doc_id: str):
+@_timed_query
+async def delete_documents(doc_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    Delete documents in one transaction and queue their vectors for deletion.
+
+    Returns the ids that were deleted and the ids that did not exist.
+    """
+    doc_ids = list(dict.fromkeys(doc_ids))
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        await db.execute("BEGIN IMMEDIATE")
+
+        found = {}
+        for batch in _batched(doc_ids):
+            placeholders = ",".join("?" * len(batch))
+            async with db.execute(
+                f"SELECT id, chunk_count FROM documents WHERE id IN ({placeholders})", batch
+            ) as cursor:
+                found.update({row[0]: row[1] or 0 for row in await cursor.fetchall()})
+
+        deleted = [doc_id for doc_id in doc_ids if doc_id in found]
+        tracked = set()
+        for batch in _batched(deleted):
+            placeholders = ",".join("?" * len(batch))
+            # Move tracked chunk ids into the outbox, then drop the rows
+            await db.execute(
+                f"""
+                INSERT INTO pending_vector_deletes (document_id, chunk_id)
+                SELECT document_id, chunk_id FROM document_chunks WHERE document_id IN ({placeholders})
+                """,
+                batch
+            )
+            async with db.execute(
+                f"SELECT DISTINCT document_id FROM document_chunks WHERE document_id IN ({placeholders})", batch
+            ) as cursor:
+                tracked.update(row[0] for row in await cursor.fetchall())
+            await db.execute(f"DELETE FROM document_chunks WHERE document_id IN ({placeholders})", batch)
+            await db.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", batch)
+
+        untracked = [doc_id for doc_id in deleted if doc_id not in tracked]
+        if untracked:
+            await db.executemany(
+                "INSERT INTO pending_vector_deletes (document_id, chunk_id) VALUES (?, NULL)",
+                [(doc_id,) for doc_id in untracked]
+            )
+
+        if deleted:
+            await _bump_stats(db, documents=-len(deleted), chunks=-sum(found.values()), corpus_version=1)
         await db.commit()
 
+    return {
+        "deleted": deleted,
+        "not_found": [doc_id for doc_id in doc_ids if doc_id not in found],
+    }
+
+@_timed_query
+async def get_pending_vector_deletes(limit: int = 5000) -> List[Dict]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            "SELECT id, document_id, chunk_id FROM pending_vector_deletes ORDER BY id LIMIT ?", (limit,)
+        ) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+@_timed_query
+async def clear_pending_vector_deletes(ids: List[int]):
+    async with aiosqlite.connect(DB_PATH) as db:
+        for batch in _batched(ids):
+            placeholders = ",".join("?" * len(batch))
+            await db.execute(f"DELETE FROM pending_vector_deletes WHERE id IN ({placeholders})", batch)
+        # The vectors just left the index, so results cached since the row delete are stale
+        await _bump_stats(db, corpus_version=1)
+        await db.commit()
+
+@_timed_query
+async def count_pending_vector_deletes() -> int:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT COUNT(*) FROM pending_vector_deletes") as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+@_timed_query
 async def get_all_users() -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -148,6 +419,7 @@ async def get_all_users() -> List[Dict]:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+@_timed_query
 async def get_users_paginated(limit: int, offset: int, search: str = None, role: str = None) -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -169,6 +441,7 @@ async def get_users_paginated(limit: int, offset: int, search: str = None, role:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+@_timed_query
 async def get_user_count(search: str = None, role: str = None) -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         query = "SELECT COUNT(*) FROM users WHERE 1=1"
@@ -186,6 +459,7 @@ async def get_user_count(search: str = None, role: str = None) -> int:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
+@_timed_query
 async def update_user(user_id: str, username: str, role: str, password_hash: str = None):
     async with aiosqlite.connect(DB_PATH) as db:
         if password_hash:
@@ -200,19 +474,25 @@ async def update_user(user_id: str, username: str, role: str, password_hash: str
             )
         await db.commit()
 
+@_timed_query
 async def delete_user(user_id: str):
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        cursor = await db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        if cursor.rowcount:
+            await _bump_stats(db, users=-cursor.rowcount)
         await db.commit()
 
+@_timed_query
 async def create_chat_session(session_id: str, user_id: str, title: str):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             "INSERT INTO chat_sessions (id, user_id, title) VALUES (?, ?, ?)",
             (session_id, user_id, title)
         )
+        await _bump_stats(db, chat_sessions=1)
         await db.commit()
 
+@_timed_query
 async def get_user_sessions(user_id: str) -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
@@ -220,6 +500,7 @@ async def get_user_sessions(user_id: str) -> List[Dict]:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+@_timed_query
 async def update_session_title(session_id: str, title: str):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
@@ -228,28 +509,262 @@ async def update_session_title(session_id: str, title: str):
         )
         await db.commit()
 
+@_timed_query
 async def delete_session(session_id: str):
     async with aiosqlite.connect(DB_PATH) as db:
         # Delete all messages in the session
-        await db.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+        messages = await db.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
         # Delete the session itself
-        await db.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+        sessions = await db.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+        await _bump_stats(db, chat_messages=-messages.rowcount, chat_sessions=-sessions.rowcount)
         await db.commit()
 
+@_timed_query
 async def create_chat_message(user_id: str, role: str, content: str, session_id: str):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             "INSERT INTO chat_history (user_id, role, content, session_id) VALUES (?, ?, ?, ?)",
             (user_id, role, content, session_id)
         )
+        await _bump_stats(db, chat_messages=1)
         await db.commit()
 
+@_timed_query
+async def create_chat_messages(messages: List[Dict]):
+    """Insert a batch of chat messages in a single transaction."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.executemany(
+            "INSERT INTO chat_history (user_id, role, content, session_id, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(m["user_id"], m["role"], m["content"], m["session_id"], m["created_at"]) for m in messages]
+        )
+        await _bump_stats(db, chat_messages=len(messages))
+        await db.commit()
+
+@_timed_query
 async def get_chat_history(session_id: str) -> List[Dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
         async with db.execute(
-            "SELECT role, content, created_at FROM chat_history WHERE session_id = ? ORDER BY created_at ASC", 
+            "SELECT role, content, created_at FROM chat_history WHERE session_id = ? ORDER BY created_at ASC, id ASC", 
             (session_id,)
         ) as cursor:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
+
+@_timed_query
+async def get_stat_counters() -> Dict[str, int]:
+    """The corpus_stats counters alone, without the daily ingest rows."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT key, value FROM corpus_stats") as cursor:
+            return {key: value for key, value in await cursor.fetchall()}
+
+@_timed_query
+async def get_corpus_version() -> int:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT value FROM corpus_stats WHERE key = 'corpus_version'") as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+@_timed_query
+async def get_cached_retrieval(key: str, corpus_version: int, min_created_at: float) -> Optional[Dict]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            "SELECT results, seconds FROM retrieval_cache WHERE key = ? AND corpus_version = ? AND created_at >= ?",
+            (key, corpus_version, min_created_at)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+@_timed_query
+async def put_cached_retrieval(
+    key: str, corpus_version: int, results: str, seconds: float, max_entries: int, min_created_at: float
+):
+    """Store one search result, dropping stale and expired rows and the oldest beyond max_entries."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO retrieval_cache (key, corpus_version, results, seconds, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, corpus_version, results, seconds, time.time())
+        )
+        await db.execute(
+            "DELETE FROM retrieval_cache WHERE corpus_version < ? OR created_at < ?",
+            (corpus_version, min_created_at)
+        )
+        await db.execute(
+            """
+            DELETE FROM retrieval_cache WHERE key IN (
+                SELECT key FROM retrieval_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_entries,)
+        )
+        await db.commit()
+
+@_timed_query
+async def get_config_value(key: str) -> Optional[str]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT value FROM config WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+@_timed_query
+async def set_config_value(key: str, value: str, corpus_changed: bool = False):
+    """Upsert a config entry; corpus_changed also invalidates anything keyed by corpus_version."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
+        if corpus_changed:
+            await _bump_stats(db, corpus_version=1)
+        await db.commit()
+
+@_timed_query
+async def delete_config_value(key: str):
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("DELETE FROM config WHERE key = ?", (key,))
+        await db.commit()
+
+async def _bump_config_version(db, version_key: str):
+    await db.execute(
+        "INSERT INTO config (key, value) VALUES (?, '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+        (version_key,)
+    )
+
+@_timed_query
+async def set_config_values(values: Dict[str, Optional[str]], version_key: str) -> int:
+    """
+    Upsert several config entries (None deletes one) and increment the integer
+    under version_key in the same transaction; returns the new version.
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        for key, value in values.items():
+            if value is None:
+                await db.execute("DELETE FROM config WHERE key = ?", (key,))
+            else:
+                await db.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
+        await _bump_config_version(db, version_key)
+        async with db.execute("SELECT value FROM config WHERE key = ?", (version_key,)) as cursor:
+            version = int((await cursor.fetchone())[0])
+        await db.commit()
+        return version
+
+@_timed_query
+async def get_config_values(*keys: str) -> Dict[str, str]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            f"SELECT key, value FROM config WHERE key IN ({','.join('?' * len(keys))})", keys
+        ) as cursor:
+            return dict(await cursor.fetchall())
+
+@_timed_query
+async def get_instant_answers() -> List[Dict]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            "SELECT id, pattern, response, fuzzy, hits, created_at, updated_at FROM instant_answers ORDER BY id"
+        ) as cursor:
+            return [{**dict(row), "fuzzy": bool(row["fuzzy"])} for row in await cursor.fetchall()]
+
+@_timed_query
+async def seed_instant_answers(answers: List[Dict], seeded_key: str, version_key: str) -> bool:
+    """Insert the default answers once per database; False if it was seeded before."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        async with db.execute("SELECT 1 FROM config WHERE key = ?", (seeded_key,)) as cursor:
+            if await cursor.fetchone():
+                await db.rollback()
+                return False
+        await db.executemany(
+            "INSERT OR IGNORE INTO instant_answers (pattern, response, fuzzy) VALUES (?, ?, ?)",
+            [(a["pattern"], a["response"], int(a.get("fuzzy", True))) for a in answers]
+        )
+        await db.execute("INSERT INTO config (key, value) VALUES (?, '1')", (seeded_key,))
+        await _bump_config_version(db, version_key)
+        await db.commit()
+        return True
+
+@_timed_query
+async def create_instant_answer(pattern: str, response: str, fuzzy: bool, version_key: str) -> int:
+    """Raises sqlite3.IntegrityError if the pattern already exists."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute(
+            "INSERT INTO instant_answers (pattern, response, fuzzy) VALUES (?, ?, ?)",
+            (pattern, response, int(fuzzy))
+        )
+        await _bump_config_version(db, version_key)
+        await db.commit()
+        return cursor.lastrowid
+
+@_timed_query
+async def update_instant_answer(answer_id: int, pattern: str, response: str, fuzzy: bool, version_key: str) -> bool:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute(
+            "UPDATE instant_answers SET pattern = ?, response = ?, fuzzy = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (pattern, response, int(fuzzy), answer_id)
+        )
+        if not cursor.rowcount:
+            return False
+        await _bump_config_version(db, version_key)
+        await db.commit()
+        return True
+
+@_timed_query
+async def delete_instant_answer(answer_id: int, version_key: str) -> bool:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute("DELETE FROM instant_answers WHERE id = ?", (answer_id,))
+        if not cursor.rowcount:
+            return False
+        await _bump_config_version(db, version_key)
+        await db.commit()
+        return True
+
+@_timed_query
+async def record_instant_answer_hits(hits: Dict[int, int], daily: Dict[str, Dict[str, int]]):
+    """Add buffered hit counts per answer and per day."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.executemany(
+            "UPDATE instant_answers SET hits = hits + ? WHERE id = ?",
+            [(count, answer_id) for answer_id, count in hits.items()]
+        )
+        await db.executemany(
+            "INSERT INTO instant_answer_daily (day, hits, llm_calls_saved) VALUES (?, ?, ?) "
+            "ON CONFLICT(day) DO UPDATE SET hits = hits + excluded.hits, "
+            "llm_calls_saved = llm_calls_saved + excluded.llm_calls_saved",
+            [(day, totals["hits"], totals["llm_calls_saved"]) for day, totals in daily.items()]
+        )
+        await db.commit()
+
+@_timed_query
+async def get_instant_answer_daily(days: int = 30) -> List[Dict]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT day, hits, llm_calls_saved FROM instant_answer_daily ORDER BY day DESC LIMIT ?",
+            (days,)
+        ) as cursor:
+            return [
+                {"day": day, "hits": hits, "llm_calls_saved": saved}
+                for day, hits, saved in await cursor.fetchall()
+            ]
+
+@_timed_query
+async def get_corpus_stats(days: int = 30) -> Dict:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT key, value FROM corpus_stats") as cursor:
+            stats = {key: value for key, value in await cursor.fetchall()}
+        async with db.execute(
+            "SELECT day, documents, chunks FROM ingest_daily ORDER BY day DESC LIMIT ?",
+            (days,)
+        ) as cursor:
+            stats["ingest_daily"] = [
+                {"day": day, "documents": documents, "chunks": chunks}
+                for day, documents, chunks in await cursor.fetchall()
+            ]
+        return stats
+
+@_timed_query
+async def reconcile_stats() -> Dict[str, Dict[str, int]]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        # Take the write lock up front so counts and corrections see the same data
+        await db.execute("BEGIN IMMEDIATE")
+        drift = await _recompute_stats(db)
+        await db.commit()
+        return drift
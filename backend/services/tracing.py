@@ -0,0 +1,172 @@
+# Lightweight request tracing.
+#
+# Spans for chat and upload requests are buffered in memory and written in
+# batches to a bounded SQLite table, so the admin dashboard can list recent
+# traces without calling LangSmith. When LangSmith is configured, finished
+# spans are also exported to it in the background.
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiosqlite
+from backend.services.sqlite_client import DB_PATH
+from backend.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    def __init__(self, name: str, metadata: Optional[Dict] = None):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.start_time = datetime.now(timezone.utc)
+        self.metadata = dict(metadata or {})
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.end_time: Optional[datetime] = None
+        self.latency: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def set(self, **metadata):
+        self.metadata.update(metadata)
+
+    def end(self, status: str = "success", error: Optional[str] = None):
+        if self.end_time is not None:
+            return
+        self.latency = time.perf_counter() - self._start
+        self.end_time = datetime.now(timezone.utc)
+        self.status = status
+        self.error = error
+        trace_store.record(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.end("error", str(exc))
+        else:
+            self.end()
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "start_time": self.start_time.isoformat(),
+            "latency": self.latency,
+            "status": self.status,
+            "error": self.error,
+            "metadata": self.metadata,
+        }
+
+
+class TraceStore:
+    """Buffers finished spans and flushes them to the `traces` ring table."""
+
+    def __init__(self, capacity: int = 1000, flush_interval: float = 1.0, export_queue_size: int = 1000):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._buffer: List[Span] = []
+        self._export_queue: Optional[asyncio.Queue] = None
+        self._export_queue_size = export_queue_size
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+        if settings.LANGCHAIN_API_KEY and settings.TRACE_EXPORT_LANGSMITH:
+            self._export_queue = asyncio.Queue(maxsize=self._export_queue_size)
+            self._tasks.append(asyncio.create_task(self._export_loop()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def record(self, span: Span):
+        self._buffer.append(span)
+        if self._export_queue is not None:
+            try:
+                self._export_queue.put_nowait(span)
+            except asyncio.QueueFull:
+                logger.warning("Trace export queue full, dropping span")
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                await db.executemany(
+                    "INSERT INTO traces (id, name, start_time, latency, status, error, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (s.id, s.name, s.start_time.isoformat(), s.latency, s.status, s.error, json.dumps(s.metadata, default=str))
+                        for s in spans
+                    ]
+                )
+                # Keep only the newest `capacity` rows
+                await db.execute(
+                    "DELETE FROM traces WHERE seq <= (SELECT MAX(seq) FROM traces) - ?",
+                    (self.capacity,)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Error writing traces: {e}")
+
+    async def get_recent(self, limit: int = 10) -> List[Dict]:
+        async with aiosqlite.connect(DB_PATH) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                "SELECT id, name, start_time, latency, status FROM traces ORDER BY seq DESC LIMIT ?",
+                (limit,)
+            ) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+
+        # Spans finished since the last flush are newer than anything on disk
+        unflushed = [
+            {key: span.to_dict()[key] for key in ("id", "name", "start_time", "latency", "status")}
+            for span in reversed(self._buffer)
+        ]
+        return (unflushed + rows)[:limit]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _export_loop(self):
+        from backend.services.langsmith_client import export_spans
+
+        while True:
+            spans = [await self._export_queue.get()]
+            while not self._export_queue.empty() and len(spans) < 100:
+                spans.append(self._export_queue.get_nowait())
+            try:
+                await asyncio.to_thread(export_spans, spans)
+            except Exception as e:
+                logger.warning(f"LangSmith export failed for {len(spans)} spans: {e}")
+
+
+trace_store = TraceStore(capacity=settings.TRACE_STORE_CAPACITY)
+
+
+def start_span(name: str, **metadata) -> Span:
+    """Start a span; call .end() (or use it as a context manager) to record it."""
+    return Span(name, metadata)
+
+
+async def get_recent_traces(limit: int = 10) -> List[Dict]:
+    return await trace_store.get_recent(limit)
@@ -0,0 +1,376 @@
+# Chroma collection lifecycle: HNSW parameters and rebuild-and-swap.
+#
+# HNSW parameters are read when Chroma loads a collection's index, so changing
+# any of them, search_ef included, means building a new collection.
+# rebuild_collection copies the stored embeddings (no re-embedding) into a
+# collection created with the new parameters while the old one keeps serving,
+# catches up on uploads and deletes made during the copy, then switches the
+# active collection name in the SQLite config table. Every worker polls that
+# name in the background (run_active_collection_refresh) and picks the new one
+# up within ACTIVE_NAME_STALENESS seconds, so active_collection_name() never
+# touches the database; writes that land on the old collection in that window
+# are copied over by _reconcile_after_swap. A new collection is loaded fresh,
+# by embedded clients and a Chroma server alike, so nothing has to be reopened.
+#
+# Each collection records the embedding model it was built with (see
+# EmbeddingSpec) and get_vectorstore embeds queries with that model, so a
+# rebuild into a collection with a different EmbeddingSpec (re-embedding the
+# chunk texts, as migrate_embeddings.py does) switches vectors and query
+# embeddings together.
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Dict, Optional, Set
+
+from backend.services import sqlite_client
+from backend.services.chroma_client import get_chroma_client
+from backend.services.embedding_model import EmbeddingSpec, get_embedding_model
+from backend.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = "rag_collection"
+ACTIVE_COLLECTION_KEY = "chroma_collection"
+# Collection an interrupted re-embedding run resumes into
+MIGRATION_KEY = "chroma_migration"
+ACTIVE_NAME_STALENESS = 1.0
+COPY_BATCH_SIZE = 1000
+# Texts per embedding request when re-embedding
+EMBED_BATCH_SIZE = 100
+# Catch-up passes before giving up on a corpus that keeps changing
+MAX_CATCH_UP_PASSES = 5
+# Old collection is kept this long after the swap for writes still in flight
+DROP_DELAY_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class HnswParams:
+    m: int = settings.CHROMA_HNSW_M
+    construction_ef: int = settings.CHROMA_HNSW_CONSTRUCTION_EF
+    search_ef: int = settings.CHROMA_HNSW_SEARCH_EF
+    batch_size: int = settings.CHROMA_HNSW_BATCH_SIZE
+    sync_threshold: int = settings.CHROMA_HNSW_SYNC_THRESHOLD
+
+    def validate(self):
+        for f in fields(self):
+            if getattr(self, f.name) is None or getattr(self, f.name) < 1:
+                raise ValueError(f"{f.name} must be a positive integer")
+        if self.m < 2:
+            raise ValueError("m must be at least 2")
+        if self.sync_threshold < self.batch_size:
+            raise ValueError("sync_threshold must be at least batch_size")
+
+    def metadata(self) -> Dict:
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": self.m,
+            "hnsw:construction_ef": self.construction_ef,
+            "hnsw:search_ef": self.search_ef,
+            "hnsw:batch_size": self.batch_size,
+            "hnsw:sync_threshold": self.sync_threshold,
+        }
+
+
+def collection_metadata(params: Optional[HnswParams] = None, embedding: Optional[EmbeddingSpec] = None) -> Dict:
+    """Metadata for a new collection; Chroma ignores it for existing ones."""
+    return {**(params or HnswParams()).metadata(), **(embedding or EmbeddingSpec()).metadata()}
+
+
+def collection_params(collection) -> HnswParams:
+    """HNSW parameters a collection was built with."""
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    metadata = collection.metadata or {}
+    defaults = HnswParams()
+    return HnswParams(
+        m=hnsw.get("max_neighbors", defaults.m),
+        construction_ef=hnsw.get("ef_construction", defaults.construction_ef),
+        search_ef=hnsw.get("ef_search", defaults.search_ef),
+        batch_size=metadata.get("hnsw:batch_size", defaults.batch_size),
+        sync_threshold=hnsw.get("sync_threshold", defaults.sync_threshold),
+    )
+
+
+# Active collection name
+
+_active_name: Optional[str] = None
+# Collections never change their embedding model, so this only grows
+_embedding_specs: Dict[str, EmbeddingSpec] = {}
+
+
+def active_collection_name() -> str:
+    """Name of the collection queries and writes go to, as last loaded by refresh_active_collection."""
+    return _active_name or DEFAULT_COLLECTION
+
+
+async def refresh_active_collection() -> str:
+    """Reload the active collection name from the config table."""
+    global _active_name
+    _active_name = await sqlite_client.get_config_value(ACTIVE_COLLECTION_KEY) or DEFAULT_COLLECTION
+    return _active_name
+
+
+async def run_active_collection_refresh(interval: float = ACTIVE_NAME_STALENESS):
+    """Background job: follow collection swaps made by this or another worker."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_active_collection()
+        except Exception as e:
+            logger.error(f"Active collection refresh failed: {e}")
+
+
+def collection_embedding(name: str) -> EmbeddingSpec:
+    """Embedding model a collection's vectors come from; the configured one if it doesn't exist yet."""
+    if name not in _embedding_specs:
+        try:
+            collection = get_chroma_client().get_collection(name)
+        except Exception:
+            # Created from settings on first use
+            return EmbeddingSpec()
+        _embedding_specs[name] = EmbeddingSpec.from_metadata(collection.metadata)
+    return _embedding_specs[name]
+
+
+async def pending_migration() -> Optional[str]:
+    """Collection an interrupted migrate_embeddings.py run left behind, if any."""
+    return await sqlite_client.get_config_value(MIGRATION_KEY)
+
+
+# Rebuild
+
+_rebuild_task: Optional[asyncio.Task] = None
+_rebuild_status: Dict = {"state": "idle"}
+
+
+def get_rebuild_status() -> Dict:
+    return dict(_rebuild_status)
+
+
+def describe_active_collection() -> Dict:
+    name = active_collection_name()
+    collection = get_chroma_client().get_or_create_collection(name, metadata=collection_metadata())
+    return {
+        "collection": name,
+        "count": collection.count(),
+        "embedding": asdict(EmbeddingSpec.from_metadata(collection.metadata)),
+        "hnsw": asdict(collection_params(collection)),
+    }
+
+
+def _ids(collection) -> Set[str]:
+    return set(collection.get(include=[])["ids"])
+
+
+class _Reembedder:
+    """Embeds chunk texts with another model, at most `rate` texts per second."""
+
+    def __init__(self, spec: EmbeddingSpec, rate: Optional[float] = None):
+        self.embedding = get_embedding_model(spec)
+        self.rate = rate
+        self._next_at = time.monotonic()
+
+    def __call__(self, texts):
+        if self.rate:
+            wait = self._next_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._next_at = max(self._next_at, time.monotonic()) + len(texts) / self.rate
+        return self.embedding.embed_documents(texts)
+
+
+def _copy(source, target, ids, embed: Optional[_Reembedder] = None, stop: Optional[threading.Event] = None) -> int:
+    """
+    Upsert chunks into target, with their stored embeddings or re-embedded by
+    `embed`. `stop` ends the copy of a cancelled rebuild, whose thread
+    to_thread leaves running.
+    """
+    ids = sorted(ids)
+    batch_size = EMBED_BATCH_SIZE if embed else COPY_BATCH_SIZE
+    include = ["documents", "metadatas"] if embed else ["embeddings", "documents", "metadatas"]
+    for i in range(0, len(ids), batch_size):
+        batch = source.get(ids=ids[i:i + batch_size], include=include)
+        if batch["ids"]:
+            embeddings = embed(batch["documents"]) if embed else batch["embeddings"]
+            _check_stop(stop)
+            target.upsert(
+                ids=batch["ids"],
+                embeddings=embeddings,
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+            )
+        _rebuild_status["copying"] = f"{min(i + batch_size, len(ids))}/{len(ids)}"
+    return len(ids)
+
+
+def _check_stop(stop: Optional[threading.Event]):
+    if stop is not None and stop.is_set():
+        raise RuntimeError("Rebuild cancelled")
+
+
+def _delete(target, ids) -> int:
+    ids = sorted(ids)
+    for i in range(0, len(ids), COPY_BATCH_SIZE):
+        target.delete(ids=ids[i:i + COPY_BATCH_SIZE])
+    return len(ids)
+
+
+def _corpus_version() -> int:
+    with closing(sqlite3.connect(settings.SQLITE_DB_PATH)) as db:
+        row = db.execute("SELECT value FROM corpus_stats WHERE key = 'corpus_version'").fetchone()
+        return row[0] if row else 0
+
+
+def _build(old_name: str, new_name: str, params: HnswParams, embedding: EmbeddingSpec,
+           embed: Optional[_Reembedder], resume: bool, stop: threading.Event) -> Dict:
+    """Copy the old collection into a new one until a pass sees no corpus change."""
+    client = get_chroma_client()
+    old = client.get_collection(old_name)
+    metadata = collection_metadata(params, embedding)
+    if resume:
+        # Chunks already copied by an earlier run are skipped below
+        new = client.get_or_create_collection(new_name, metadata=metadata)
+        if EmbeddingSpec.from_metadata(new.metadata) != embedding:
+            raise RuntimeError(f"{new_name} holds {EmbeddingSpec.from_metadata(new.metadata)} vectors, not {embedding}")
+    else:
+        new = client.create_collection(new_name, metadata=metadata)
+    report = {"copied": 0, "deleted": 0, "passes": 0}
+    while True:
+        version = _corpus_version()
+        old_ids, new_ids = _ids(old), _ids(new)
+        report["copied"] += _copy(old, new, old_ids - new_ids, embed, stop)
+        _check_stop(stop)
+        report["deleted"] += _delete(new, new_ids - old_ids)
+        report["passes"] += 1
+        _rebuild_status.update(progress=dict(report), count=len(old_ids))
+        if _corpus_version() == version:
+            return report
+        if report["passes"] >= MAX_CATCH_UP_PASSES:
+            raise RuntimeError("Corpus kept changing during the rebuild; try again when uploads are quiet")
+
+
+def _existing_documents(document_ids: Set[str]) -> Set[str]:
+    ids = sorted(document_ids)
+    found = set()
+    with closing(sqlite3.connect(settings.SQLITE_DB_PATH)) as db:
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            rows = db.execute(f"SELECT id FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch)
+            found.update(row[0] for row in rows)
+    return found
+
+
+def _reconcile_after_swap(old_name: str, new_name: str, swapped_ids: Set[str], embed: Optional[_Reembedder]) -> Dict:
+    """
+    Apply writes that landed on the old collection between the last catch-up
+    pass and the swap. New-collection ids unknown at swap time are uploads made
+    after it and are left alone. Chunks are only copied while their document
+    still exists, since deletes after the swap only went to the new collection.
+    """
+    client = get_chroma_client()
+    old, new = client.get_collection(old_name), client.get_collection(new_name)
+    old_ids = _ids(old)
+    missing = sorted(old_ids - swapped_ids)
+    if missing:
+        metadatas = old.get(ids=missing, include=["metadatas"])
+        by_document = {chunk_id: (metadata or {}).get("document_id") for chunk_id, metadata in zip(metadatas["ids"], metadatas["metadatas"])}
+        existing = _existing_documents({doc_id for doc_id in by_document.values() if doc_id})
+        missing = [chunk_id for chunk_id, doc_id in by_document.items() if doc_id in existing]
+    return {
+        "copied": _copy(old, new, missing, embed),
+        "deleted": _delete(new, (swapped_ids - old_ids) & _ids(new)),
+    }
+
+
+async def rebuild_collection(
+    params: HnswParams,
+    new_name: Optional[str] = None,
+    embedding: Optional[EmbeddingSpec] = None,
+    rate: Optional[float] = None,
+    resume: bool = False,
+    drop_previous: bool = True,
+) -> Dict:
+    """
+    Build a collection with `params`, swap it in, and drop the old one after a
+    delay. With an `embedding` other than the old collection's, chunk texts are
+    re-embedded at up to `rate` per second instead of copying vectors. With
+    `resume`, `new_name` may hold chunks from an interrupted run and is kept if
+    this one fails too.
+    """
+    old_name = await refresh_active_collection()
+    new_name = new_name or new_collection_name()
+    embedding = embedding or collection_embedding(old_name)
+    embed = _Reembedder(embedding, rate) if embedding != collection_embedding(old_name) else None
+    _rebuild_status.clear()
+    _rebuild_status.update(state="building", collection=new_name, params=asdict(params), started_at=time.time())
+    if embed:
+        _rebuild_status["embedding"] = asdict(embedding)
+    stop = threading.Event()
+    start = time.perf_counter()
+    try:
+        report = await asyncio.to_thread(_build, old_name, new_name, params, embedding, embed, resume, stop)
+        swapped_ids = await asyncio.to_thread(lambda: _ids(get_chroma_client().get_collection(new_name)))
+        # Same ids, but rankings may differ, so cached search results go too
+        await sqlite_client.set_config_value(ACTIVE_COLLECTION_KEY, new_name, corpus_changed=True)
+        await refresh_active_collection()
+        _rebuild_status.update(state="swapped", previous=old_name)
+        await asyncio.sleep(ACTIVE_NAME_STALENESS * 2)
+        report["after_swap"] = await asyncio.to_thread(_reconcile_after_swap, old_name, new_name, swapped_ids, embed)
+        report["seconds"] = round(time.perf_counter() - start, 2)
+        _rebuild_status["report"] = report
+        logger.info(f"Vector collection rebuilt: {old_name} -> {new_name} ({report})")
+
+        if drop_previous:
+            await asyncio.sleep(DROP_DELAY_SECONDS)
+            await asyncio.to_thread(get_chroma_client().delete_collection, old_name)
+            logger.info(f"Dropped previous vector collection {old_name}")
+        _rebuild_status["state"] = "done"
+    except BaseException as e:
+        stop.set()
+        logger.error(f"Collection rebuild failed: {e!r}")
+        if _rebuild_status["state"] == "building" and not resume:
+            # Never served, so nothing is lost by dropping it
+            try:
+                await asyncio.to_thread(get_chroma_client().delete_collection, new_name)
+            except Exception:
+                pass
+        _rebuild_status.update(state="failed", error=str(e))
+        raise
+    return report
+
+
+def new_collection_name() -> str:
+    return f"{DEFAULT_COLLECTION}_{time.strftime('%Y%m%d%H%M%S')}"
+
+
+async def start_rebuild(params: HnswParams) -> Dict:
+    """Run rebuild_collection in the background; raises RuntimeError if one is running."""
+    global _rebuild_task
+    params.validate()
+    if _rebuild_task is not None and not _rebuild_task.done():
+        raise RuntimeError("A rebuild is already running")
+    if await pending_migration():
+        raise RuntimeError("An embedding migration is in progress; finish or abort it with migrate_embeddings.py")
+    new_name = new_collection_name()
+    _rebuild_status.clear()
+    _rebuild_status.update(state="building", collection=new_name, params=asdict(params), started_at=time.time())
+    _rebuild_task = asyncio.create_task(rebuild_collection(params, new_name))
+    # Failures are reported through get_rebuild_status()
+    _rebuild_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return get_rebuild_status()
+
+
+def params_with(**changes) -> HnswParams:
+    """Active collection's parameters with `changes` applied; raises ValueError on bad values."""
+    known = {f.name for f in fields(HnswParams)}
+    unknown = set(changes) - known
+    if unknown:
+        raise ValueError(f"Unknown HNSW parameters: {', '.join(sorted(unknown))}")
+    collection = get_chroma_client().get_or_create_collection(active_collection_name(), metadata=collection_metadata())
+    params = replace(collection_params(collection), **changes)
+    params.validate()
+    return params
@@ -0,0 +1,107 @@
+# Startup warm-up.
+#
+# A fresh worker pays several one-off costs on its first chat turns: Chroma
+# loads the HNSW index on the first query, the shared HTTP clients open their
+# first connections, the model clients and chains are built, tiktoken loads
+# its encoding and the modules imported on first use (PyMuPDF, python-docx,
+# langchain_openai, langchain_chroma...) are loaded.
+# warm_up() pays them right after startup, in the background, and GET /ready
+# answers 503 until it has finished so the load balancer only routes to warm
+# workers. A step that fails is logged and skipped; the worker still becomes
+# ready, serving as it would have without warm-up.
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Dict
+
+from backend.services.http_clients import get_async_http_client
+from backend.utils.config import settings
+from backend.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "reimbursement"
+
+# Imported lazily by the request paths; langchain_openai and langchain_chroma
+# are loaded by the model_clients and vectorstore steps
+DEFERRED_IMPORTS = ("fitz", "docx", "langchain_core.callbacks")
+
+_status: Dict = {"state": "pending", "steps": {}}
+
+
+def _import_deferred():
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+
+
+def _build_model_clients():
+    from backend.chains.rag_chain import get_rag_chain
+    from backend.services.query_classifier import get_classifier_llm
+    from backend.services.query_rewriter import get_rewriter_llm
+    from backend.services.runtime_settings import runtime_settings
+
+    tuning = runtime_settings.get()
+    get_rewriter_llm(tuning)
+    get_classifier_llm(tuning)
+    models = {tuning.default_model} | {rule["model"] for rule in tuning.model_policy}
+    for model in models:
+        get_rag_chain(model)
+
+
+def _query_vectorstore():
+    from backend.chains.retriever_chroma import get_vectorstore
+
+    # Embeds the query too, which opens the sync client's connection
+    get_vectorstore().similarity_search(WARMUP_QUERY, k=1)
+
+
+async def _open_connection():
+    # Any response, even 404 from a compatible endpoint, leaves a pooled connection
+    base_url = (settings.OPENAI_BASE_URL or "https://api.openai.com/v1").rstrip("/")
+    await get_async_http_client().get(
+        f"{base_url}/models",
+        headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+    )
+
+
+STEPS = (
+    ("imports", _import_deferred),
+    ("tokenizer", lambda: count_tokens(WARMUP_QUERY)),
+    ("model_clients", _build_model_clients),
+    ("vectorstore", _query_vectorstore),
+    ("connection", _open_connection),
+)
+
+
+async def warm_up():
+    if not settings.WARMUP_ENABLED:
+        _status["state"] = "ready"
+        return
+    _status["state"] = "warming_up"
+    started = time.perf_counter()
+    for name, step in STEPS:
+        step_started = time.perf_counter()
+        result = {}
+        try:
+            if asyncio.iscoroutinefunction(step):
+                await step()
+            else:
+                await asyncio.to_thread(step)
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - step_started, 3)
+        _status["steps"][name] = result
+    _status["seconds"] = round(time.perf_counter() - started, 3)
+    _status["state"] = "ready"
+    logger.info(f"Warm-up finished in {_status['seconds']}s: {_status['steps']}")
+
+
+def is_ready() -> bool:
+    return _status["state"] == "ready"
+
+
+def get_warmup_status() -> Dict:
+    return {**_status, "steps": dict(_status["steps"])}
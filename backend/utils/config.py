@@ -1,4 +1,5 @@
 import os
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,14 +10,121 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
 
     OPENAI_API_KEY: str
+    # Optional OpenAI-compatible endpoint (e.g. a local stub for load tests)
+    OPENAI_BASE_URL: str = ""
     
     # LangSmith / LangChain
     LANGCHAIN_TRACING_V2: str = "false"
     LANGCHAIN_API_KEY: str = ""
     LANGCHAIN_PROJECT: str = "rag-web"
 
+    # Vector store backend: "chroma", or "numpy" for the memory-mapped flat
+    # index in services/numpy_vectorstore.py, which stores vectors as int8,
+    # float16 or float32, optionally truncated to VECTOR_INDEX_DIMENSIONS.
+    # Switching backends needs the corpus copied over (migrate_vectors.py).
+    VECTOR_STORE_BACKEND: str = "chroma"
+    VECTOR_INDEX_DTYPE: str = "int8"
+    VECTOR_INDEX_DIMENSIONS: Optional[int] = None
+
+    # Embedding model for new Chroma collections; dimensions shortens
+    # text-embedding-3 vectors (e.g. 1024 or 256). A collection records the
+    # model it was built with and queries follow it, so changing these for an
+    # existing corpus takes a re-embedding run of migrate_embeddings.py.
+    EMBEDDING_MODEL: str = "text-embedding-3-large"
+    EMBEDDING_DIMENSIONS: Optional[int] = None
+
+    # HNSW parameters for new Chroma collections (Chroma's defaults). An
+    # existing collection keeps the ones it was built with until it is rebuilt
+    # through PUT /admin/vectorstore/hnsw (see services/vector_collections.py)
+    CHROMA_HNSW_M: int = 16
+    CHROMA_HNSW_CONSTRUCTION_EF: int = 100
+    CHROMA_HNSW_SEARCH_EF: int = 100
+    CHROMA_HNSW_BATCH_SIZE: int = 100
+    CHROMA_HNSW_SYNC_THRESHOLD: int = 1000
+
+    # Retrieval, packing, model routing and coalescing settings below are the
+    # defaults; they can be overridden at runtime through /admin/settings
+    # (see services/runtime_settings.py).
+    # Adaptive context selection (see services/context_selector.py); distances
+    # are cosine, and a cutoff left unset is disabled
+    RETRIEVAL_CANDIDATE_K: int = 10
+    RETRIEVAL_MIN_K: int = 3
+    RETRIEVAL_MAX_K: int = 8
+    RETRIEVAL_MAX_DISTANCE: Optional[float] = 0.75
+    RETRIEVAL_RELATIVE_MARGIN: Optional[float] = 0.2
+    RETRIEVAL_ELBOW_GAP: Optional[float] = 0.08
+    # Search results cache (see services/retrieval_cache.py): entries per
+    # worker, entries in the shared SQLite table, and lifetime in seconds
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_SIZE: int = 512
+    RETRIEVAL_CACHE_SHARED_SIZE: int = 5000
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 600
+    # Context packing (see services/context_packer.py)
+    RAG_CONTEXT_TOKEN_BUDGET: int = 3000
+    RAG_DUPLICATE_THRESHOLD: float = 0.8
+    # Generation model routing (see services/model_router.py). Rules are tried
+    # in order and the first whose limits all hold picks the model; otherwise
+    # RAG_DEFAULT_MODEL is used. Set as JSON in the environment to override.
+    RAG_DEFAULT_MODEL: str = "gpt-4.1-mini"
+    RAG_MODEL_POLICY: List[Dict[str, Any]] = [
+        {
+            "name": "single_document_lookup",
+            "model": "gpt-4.1-nano",
+            "max_documents": 1,
+            "max_context_tokens": 1500,
+            "max_query_words": 12,
+            "allow_history": False,
+            "allow_complex": False,
+        },
+    ]
+
+    # Admission control for OpenAI calls (see services/model_scheduler.py), per
+    # worker: slots in total and per traffic class, and seconds a call may wait
+    # for one before the chat turn fails fast as busy (null waits indefinitely)
+    MODEL_MAX_CONCURRENCY: int = 32
+    MODEL_CLASS_LIMITS: Dict[str, int] = {"query": 16, "chat": 24, "ingest": 8}
+    MODEL_QUEUE_TIMEOUTS: Dict[str, Optional[float]] = {"query": 5.0, "chat": 10.0, "ingest": None}
+
+    # Shared HTTP clients for all OpenAI calls (see services/http_clients.py):
+    # pool size, idle connections kept open and for how long, and timeouts.
+    # HTTP/2 also needs the h2 package installed.
+    OPENAI_HTTP2: bool = True
+    OPENAI_MAX_CONNECTIONS: int = 64
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+
+    # Share one rewrite-to-answer pipeline between identical concurrent
+    # questions (see services/single_flight.py)
+    CHAT_COALESCE_ENABLED: bool = True
+
+    # Local request tracing (see services/tracing.py)
+    TRACE_STORE_CAPACITY: int = 1000
+    TRACE_EXPORT_LANGSMITH: bool = True
+
+    # Warm the vector index, model clients and connections after startup;
+    # GET /ready answers 503 until done (see services/warmup.py)
+    WARMUP_ENABLED: bool = True
+
+    # Seconds between full recounts of the materialized corpus stats
+    STATS_RECONCILE_INTERVAL: int = 3600
+    # Seconds between checks of the vector deletion outbox, and the retry
+    # delay after a failed purge (doubling up to the max)
+    VECTOR_DELETE_PURGE_INTERVAL: float = 60.0
+    VECTOR_DELETE_RETRY_SECONDS: float = 5.0
+    VECTOR_DELETE_RETRY_MAX_SECONDS: float = 300.0
+
     # Paths
     CHROMA_PERSIST_DIRECTORY: str = "./chroma"
+    # Shared Chroma server (e.g. `chroma run --path ./chroma --port 8001`) for
+    # multi-worker deployments; empty uses CHROMA_PERSIST_DIRECTORY in-process
+    CHROMA_SERVER_URL: str = ""
+    # Chroma searches, uploads and deletes that can run at once per worker
+    # (threads, and HTTP connections to CHROMA_SERVER_URL); see
+    # services/chroma_client.py run_chroma
+    CHROMA_THREAD_POOL_SIZE: int = 16
+    VECTOR_INDEX_DIRECTORY: str = "./vector_index"
     SQLITE_DB_PATH: str = "./rag_web.db"
     LLM_CACHE_PATH: str = ".langchain.db"
 
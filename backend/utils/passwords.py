@@ -0,0 +1,11 @@
+# Password hashing, kept apart from security.py so CLI utilities such as
+# create_admin.py can hash passwords without importing FastAPI or JWT
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
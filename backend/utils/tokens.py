@@ -0,0 +1,26 @@
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer used by the gpt-4.1 family
+ENCODING_NAME = "o200k_base"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        # tiktoken downloads encodings on first use; offline we estimate instead
+        logger.warning(f"Token encoding unavailable, estimating from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for prompt accounting, ~4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4) if text else 0
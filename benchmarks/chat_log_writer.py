@@ -0,0 +1,107 @@
+"""
+Compare direct chat message writes with the write-behind chat log writer.
+
+Simulates concurrent chat streams that read history, persist the user
+message, stream for a while and persist the assistant message, then reports
+SQLite commit count and persistence latency for both modes.
+
+Usage:
+    python -m benchmarks.chat_log_writer --streams 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from benchmarks.common import isolated_environment, summarize
+
+isolated_environment()
+
+import aiosqlite  # noqa: E402
+from backend.services import sqlite_client  # noqa: E402
+from backend.services.chat_log_writer import ChatLogWriter  # noqa: E402
+
+commit_count = 0
+_original_commit = aiosqlite.Connection.commit
+
+
+async def _counting_commit(self):
+    global commit_count
+    commit_count += 1
+    return await _original_commit(self)
+
+
+aiosqlite.Connection.commit = _counting_commit
+
+
+async def run_streams(mode: str, streams: int, stream_seconds: float, seed: int):
+    global commit_count
+    writer = ChatLogWriter()
+    if mode == "write-behind":
+        await writer.start()
+
+    rng = random.Random(seed)
+    user_id = str(uuid.uuid4())
+    session_ids = [str(uuid.uuid4()) for _ in range(streams)]
+    for i, session_id in enumerate(session_ids):
+        await sqlite_client.create_chat_session(session_id, user_id, f"bench {i}")
+
+    persist_latencies = []
+    turn_latencies = []
+    errors = []
+
+    async def persist(role: str, content: str, session_id: str):
+        t = time.perf_counter()
+        try:
+            await writer.append(user_id, role, content, session_id)
+        except Exception as e:
+            errors.append(str(e))
+        persist_latencies.append(time.perf_counter() - t)
+
+    async def stream(i: int, session_id: str):
+        t0 = time.perf_counter()
+        await writer.get_history(session_id)
+        await persist("user", f"question {i}", session_id)
+        await asyncio.sleep(rng.uniform(0, stream_seconds))
+        await persist("assistant", f"answer {i}", session_id)
+        turn_latencies.append(time.perf_counter() - t0)
+
+        history = await writer.get_history(session_id)
+        if mode == "write-behind":
+            assert len(history) == 2, f"read-your-writes violated for stream {i}: {history}"
+
+    commit_count = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(stream(i, session_id) for i, session_id in enumerate(session_ids)))
+    await writer.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "streams": streams,
+        "message_commits": commit_count,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "persist_latency": summarize(persist_latencies),
+        "turn_latency": summarize(turn_latencies),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--stream-seconds", type=float, default=0.5, help="max simulated generation time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    await sqlite_client.init_db()
+    results = []
+    for mode in ("direct", "write-behind"):
+        results.append(await run_streams(mode, args.streams, args.stream_seconds, args.seed))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+"""
+Offline benchmark for /chat/stream with fake LLM and embedding backends.
+
+Drives the FastAPI app in-process for greeting, CHAT and RAG turns and
+reports end-to-end and per-stage p50/p95/p99, throughput and per-turn
+allocations. Each scenario is run --repeat times and every figure is the
+median over the runs, so one slow run (GC, a busy machine) doesn't move it.
+Results can be stored as a baseline and later checked against it: a median
+fails the check only if it is both --threshold and --min-delta-ms slower
+than the slowest of the baseline's runs, so run-to-run noise (easily 30% on
+a small machine) doesn't fail it.
+
+Usage:
+    python -m benchmarks.chat_pipeline --turns 200 --concurrency 20
+    python -m benchmarks.chat_pipeline --save-baseline
+    python -m benchmarks.chat_pipeline --check --threshold 0.25 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from benchmarks.common import isolated_environment, summarize
+
+isolated_environment()
+
+import httpx  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.services.tracing import trace_store  # noqa: E402
+from benchmarks.fakes import FakeLatency, install_fakes  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "chat_pipeline.json")
+
+SCENARIOS = {
+    "greeting": ["halo", "terima kasih", "ok"],
+    "CHAT": ["apa kabar hari ini teman?", "kamu bisa bantu apa saja ya?"],
+    "RAG": [
+        "berapa total reimburse Angga bulan Agustus 2025?",
+        "tampilkan data reimburse Andika bulan Oktober",
+        "klaim transportasi Ancika bulan September berapa?",
+    ],
+}
+
+STAGES = ("rewrite", "classify", "chat", "retrieval", "first_token", "generation")
+
+SAMPLE_REPORTS = {
+    "Angga": {"Agustus": [("2025-08-04", "Tiket KRL perjalanan dinas", "Transportasi", 12000),
+                          ("2025-08-08", "Makan siang dengan tim proyek", "Makan Siang", 65000)]},
+    "Andika": {"Oktober": [("2025-10-04", "Grab Bike antar dokumen", "Transportasi", 20000),
+                           ("2025-10-09", "Makan siang tim (6 orang)", "Makan Siang", 185000)]},
+    "Ancika": {"September": [("2025-09-05", "Taksi online ke venue event", "Transportasi", 45000),
+                             ("2025-09-18", "Beli tinta printer untuk kantor", "Peralatan Kantor", 85000)]},
+}
+
+
+def sample_documents() -> List[tuple]:
+    files = []
+    for name, months in SAMPLE_REPORTS.items():
+        for month, rows in months.items():
+            lines = [f"# Laporan Reimburse {name} - {month} 2025", "", "| Tanggal | Deskripsi | Kategori | Jumlah (Rp) |", "| --- | --- | --- | --- |"]
+            lines += [f"| {d} | {desc} | {cat} | {amount} |" for d, desc, cat, amount in rows]
+            lines.append(f"| | Grand Total | | {sum(r[3] for r in rows)} |")
+            files.append((f"reimburse-{name}-{month}-2025.md", "\n".join(lines).encode()))
+    return files
+
+
+def parse_events(body: str) -> List[Dict]:
+    return [json.loads(line[6:]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+async def setup(client: httpx.AsyncClient) -> Dict[str, str]:
+    await client.post("/api/v1/auth/register", data={"username": "bench", "password": "bench"})
+    token = (await client.post("/api/v1/auth/token", data={"username": "bench", "password": "bench"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    files = [("files", (name, content, "text/markdown")) for name, content in sample_documents()]
+    response = await client.post("/api/v1/admin/upload", files=files, headers=headers)
+    response.raise_for_status()
+    return headers
+
+
+async def run_turn(client: httpx.AsyncClient, headers: Dict, query: str) -> Dict:
+    start = time.perf_counter()
+    response = await client.post("/api/v1/chat/stream", json={"query": query}, headers=headers)
+    elapsed = time.perf_counter() - start
+    events = parse_events(response.text)
+    ok = response.status_code == 200 and any(e["type"] == "done" for e in events)
+    return {"elapsed": elapsed, "ok": ok}
+
+
+async def run_scenario(client, headers, name: str, turns: int, concurrency: int, spans: List) -> Dict:
+    queries = SCENARIOS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    spans.clear()
+
+    async def one(i: int):
+        async with semaphore:
+            results.append(await run_turn(client, headers, queries[i % len(queries)]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(turns)))
+    wall = time.perf_counter() - start
+
+    stages = {}
+    for stage in STAGES:
+        values = [s.metadata[stage] for s in spans if s.metadata.get(stage) is not None]
+        if values:
+            stages[stage] = summarize(values)
+
+    return {
+        "turns": turns,
+        "errors": sum(1 for r in results if not r["ok"]),
+        "throughput_rps": round(turns / wall, 2),
+        "e2e": summarize([r["elapsed"] for r in results]),
+        "stages": stages,
+    }
+
+
+async def measure_allocations(client, headers, name: str, turns: int) -> Dict:
+    """Peak traced memory per turn, run sequentially so turns don't overlap."""
+    queries = SCENARIOS[name]
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(turns):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await run_turn(client, headers, queries[i % len(queries)])
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {"peak_kib_p50": round(peaks[len(peaks) // 2] / 1024, 1), "peak_kib_max": round(peaks[-1] / 1024, 1)}
+
+
+def gated_metrics(data: Dict) -> Dict[str, float]:
+    """The figures of one scenario result that --check compares."""
+    # p99 over a few hundred turns is too noisy to gate on
+    metrics = {f"e2e.{key}": data["e2e"][key] for key in ("p50_ms", "p95_ms")}
+    for stage, summary in data["stages"].items():
+        metrics[f"{stage}.p50_ms"] = summary["p50_ms"]
+    return metrics
+
+
+def median_of_runs(runs: List[Dict]) -> Dict:
+    """One scenario result whose figures are the medians over `runs`."""
+    def median(summaries: List[Dict]) -> Dict:
+        return {key: round(statistics.median(s[key] for s in summaries), 2) for key in summaries[0]}
+
+    stages = {}
+    for stage in STAGES:
+        summaries = [run["stages"][stage] for run in runs if stage in run["stages"]]
+        if summaries:
+            stages[stage] = median(summaries)
+    spread = {}
+    for values in map(gated_metrics, runs):
+        for key, value in values.items():
+            fastest, slowest = spread.get(key, (value, value))
+            spread[key] = [min(fastest, value), max(slowest, value)]
+    return {
+        "turns": runs[0]["turns"],
+        "runs": len(runs),
+        "errors": sum(run["errors"] for run in runs),
+        "throughput_rps": round(statistics.median(run["throughput_rps"] for run in runs), 2),
+        "e2e": median([run["e2e"] for run in runs]),
+        "stages": stages,
+        # Fastest and slowest run of each gated figure, i.e. how much of a
+        # difference is noise
+        "spread": spread,
+    }
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    return {
+        f"{scenario}.{key}": value
+        for scenario, data in results["scenarios"].items()
+        for key, value in gated_metrics(data).items()
+    }
+
+
+def check_regressions(results: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    """
+    Gated figures of `results` (medians) more than `threshold` and
+    `min_delta_ms` slower than the slowest baseline run. The median of a new
+    process lands anywhere within the baseline's run-to-run spread, so
+    comparing against its median fails on noise alone.
+    """
+    current, previous = flatten(results), flatten(baseline)
+    for scenario, data in baseline["scenarios"].items():
+        for key, (_, slowest) in data.get("spread", {}).items():
+            previous[f"{scenario}.{key}"] = slowest
+    failures = []
+    for key, before in previous.items():
+        after = current.get(key)
+        if after is None:
+            continue
+        if after > before * (1 + threshold) and after - before > min_delta_ms:
+            failures.append(f"{key}: {before} -> {after} ms (+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200, help="turns per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--alloc-turns", type=int, default=20, help="sequential turns for allocation tracking (0 to skip)")
+    parser.add_argument("--first-token-latency", type=float, default=0.0, help="fake LLM seconds before first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake LLM streaming rate (0 = instant)")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="fake embedding seconds per request")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if slower than the stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown for --check")
+    parser.add_argument("--min-delta-ms", type=float, default=15.0, help="ignore regressions smaller than this")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario; figures are medians over them")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    install_fakes(FakeLatency(
+        first_token=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        embed_request=args.embed_latency,
+    ))
+
+    spans = []
+    record = trace_store.record
+    trace_store.record = lambda span: (spans.append(span), record(span))
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "check", "baseline")},
+        "scenarios": {},
+    }
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            headers = await setup(client)
+            for name in args.scenarios.split(","):
+                # Warm up imports, chains and the vector store before timing
+                await run_turn(client, headers, SCENARIOS[name][0])
+                runs = [await run_scenario(client, headers, name, args.turns, args.concurrency, spans) for _ in range(args.repeat)]
+                data = median_of_runs(runs)
+                if args.alloc_turns:
+                    data["allocations"] = await measure_allocations(client, headers, name, args.alloc_turns)
+                results["scenarios"][name] = data
+
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if failures:
+            print("Regressions against baseline:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
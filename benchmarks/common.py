@@ -0,0 +1,45 @@
+# Shared helpers for the benchmark scripts
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+# Allow running the scripts from the repository root like create_admin.py
+sys.path.append(os.getcwd())
+
+
+def isolated_environment(prefix: str = "rag-bench-") -> str:
+    """
+    Point the backend at a throwaway SQLite database and Chroma directory.
+
+    Must be called before anything under backend/ is imported, because
+    settings are read at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["SQLITE_DB_PATH"] = os.path.join(workdir, "rag_web.db")
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = os.path.join(workdir, "chroma")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["LANGCHAIN_API_KEY"] = ""
+    # Benchmarks warm up explicitly before timing
+    os.environ["WARMUP_ENABLED"] = "false"
+    return workdir
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max in milliseconds for a list of durations in seconds."""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
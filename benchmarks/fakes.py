@@ -0,0 +1,180 @@
+"""
+Deterministic, latency-configurable stand-ins for ChatOpenAI and
+OpenAIEmbeddings so the pipeline can be measured without network access.
+
+install_fakes() swaps them into langchain_openai, which the backend imports
+them from when it builds a client, so it must be called before the first
+request.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+@dataclass
+class FakeLatency:
+    # Seconds before the first token of any chat completion
+    first_token: float = 0.0
+    # Streaming rate for generated tokens; 0 means instantaneous
+    tokens_per_second: float = 0.0
+    # Per embedding request plus per embedded text
+    embed_request: float = 0.0
+    embed_per_text: float = 0.0
+
+
+LATENCY = FakeLatency()
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def _last_quoted(text: str, marker: str) -> str:
+    """Pull the user query out of the classifier/rewriter prompts."""
+    index = text.rfind(marker)
+    if index == -1:
+        return ""
+    match = re.search(r'"(.*?)"', text[index:], re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def fake_completion(prompt: str) -> str:
+    """Deterministic answer for each of the prompts the backend sends."""
+    if "Respond with ONLY one word" in prompt:
+        query = _last_quoted(prompt, "Query:").lower()
+        return "RAG" if re.search(r"reimburse|klaim|total|biaya|data|bulan|pengeluaran", query) else "CHAT"
+    if "Rewrite this query" in prompt:
+        return _last_quoted(prompt, "Query:")
+    if "Balasan singkat" in prompt:
+        return "Halo! Saya siap membantu pertanyaan seputar data reimbursement."
+
+    refs = sorted(set(re.findall(r"\[ref:(\d+)\]", prompt)), key=int)[:2]
+    citation = " ".join(f"[ref:{r}]" for r in refs)
+    return (
+        "Berikut ringkasan data reimbursement yang ditemukan pada dokumen. "
+        "| Tanggal | Deskripsi | Jumlah |\n|---|---|---|\n| 2025-08-04 | Transportasi | Rp 12.000 |\n"
+        f"Total pengajuan sesuai laporan yang tersedia. {citation}"
+    ).strip()
+
+
+def split_tokens(text: str) -> List[str]:
+    # Roughly word-sized pieces with their trailing whitespace, like a BPE stream
+    return re.findall(r"\S+\s*", text) or [text]
+
+
+class FakeChatOpenAI(BaseChatModel):
+    """Accepts ChatOpenAI's constructor arguments and ignores the ones it doesn't use."""
+
+    model_name: str = "fake"
+    streaming: bool = False
+
+    def __init__(self, model: Optional[str] = None, **kwargs: Any):
+        known = {k: v for k, v in kwargs.items() if k in ("streaming",)}
+        super().__init__(model_name=model or "fake", **known)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-openai"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        text = fake_completion(_prompt_text(messages))
+        time.sleep(LATENCY.first_token + self._stream_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        text = fake_completion(_prompt_text(messages))
+        await _sleep(LATENCY.first_token + self._stream_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        text = fake_completion(_prompt_text(messages))
+        time.sleep(LATENCY.first_token)
+        for token in split_tokens(text):
+            if LATENCY.tokens_per_second:
+                time.sleep(1 / LATENCY.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        text = fake_completion(_prompt_text(messages))
+        await _sleep(LATENCY.first_token)
+        for token in split_tokens(text):
+            if LATENCY.tokens_per_second:
+                await asyncio.sleep(1 / LATENCY.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    @staticmethod
+    def _stream_seconds(text: str) -> float:
+        if not LATENCY.tokens_per_second:
+            return 0.0
+        return len(split_tokens(text)) / LATENCY.tokens_per_second
+
+
+async def _sleep(seconds: float):
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+def hashed_embedding(text: str, dimensions: int = 256) -> List[float]:
+    """
+    Bag-of-words feature hashing: texts sharing words get similar vectors,
+    which keeps retrieval meaningful without a model.
+    """
+    vector = [0.0] * dimensions
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddings(Embeddings):
+    """Accepts OpenAIEmbeddings' constructor arguments."""
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None, **kwargs: Any):
+        self.model = model
+        self.dimensions = dimensions or 256
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(LATENCY.embed_request + LATENCY.embed_per_text * len(texts))
+        return [hashed_embedding(t, self.dimensions) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def install_fakes(latency: Optional[FakeLatency] = None):
+    """Swap the OpenAI clients used by the backend for the fakes above."""
+    import langchain_openai
+    from backend.chains import rag_chain, retriever_chroma
+    from backend.services import query_classifier, query_rewriter
+
+    if latency is not None:
+        for field in ("first_token", "tokens_per_second", "embed_request", "embed_per_text"):
+            setattr(LATENCY, field, getattr(latency, field))
+
+    # The backend imports these from langchain_openai when building a client
+    langchain_openai.ChatOpenAI = FakeChatOpenAI
+    langchain_openai.OpenAIEmbeddings = FakeEmbeddings
+
+    # Drop any real clients created before the patch
+    rag_chain._rag_chains.clear()
+    retriever_chroma._numpy_store = None
+    query_classifier._classifier_llms.clear()
+    query_rewriter._rewriter_llms.clear()
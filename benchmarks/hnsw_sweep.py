@@ -0,0 +1,141 @@
+"""
+HNSW parameter sweep for the Chroma collection.
+
+Builds one collection per (M, construction_ef) combination over the same
+synthetic clustered embeddings as benchmarks.vector_backends, then for each
+search_ef (a copy of the collection's embeddings built with it, as
+PUT /admin/vectorstore/hnsw does) measures recall@k against exact search and
+single-query latency. Build time, on-disk
+index size and RSS growth are reported per build.
+
+Usage:
+    python -m benchmarks.hnsw_sweep
+    python -m benchmarks.hnsw_sweep --chunks 20000 --dimensions 3072 --m 8,16,32 --construction-ef 100,200 --search-ef 10,50,100,200
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import replace
+
+from benchmarks.vector_backends import (
+    LookupEmbeddings,
+    directory_mb,
+    exact_top_k,
+    rss_mb,
+    synthetic_vectors,
+)  # isolates the environment first
+
+import chromadb  # noqa: E402
+from langchain_chroma import Chroma  # noqa: E402
+
+from backend.services.vector_collections import HnswParams, collection_params  # noqa: E402
+from benchmarks.common import summarize  # noqa: E402
+from benchmarks.retrieval_eval import _ints  # noqa: E402
+
+CURRENT = HnswParams()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=_ints, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=_ints, default=[100, 200])
+    parser.add_argument("--search-ef", type=_ints, default=[10, 25, 50, 100, 200])
+    parser.add_argument("--batch-size", type=int, default=1000, help="chunks per add_texts call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    vectors, queries, assignment = synthetic_vectors(args.chunks, args.queries, args.dimensions, args.clusters, args.seed)
+    truth = exact_top_k(vectors, queries, args.k)
+    embedding = LookupEmbeddings(vectors, queries)
+
+    workdir = tempfile.mkdtemp(prefix="rag-hnsw-")
+    results = []
+    try:
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                params = HnswParams(m=m, construction_ef=construction_ef, search_ef=max(args.search_ef))
+                path = os.path.join(workdir, f"m{m}_ef{construction_ef}")
+                rss_before = rss_mb()
+                start = time.perf_counter()
+                client = chromadb.PersistentClient(path=path)
+                store = Chroma(
+                    collection_name="sweep",
+                    embedding_function=embedding,
+                    client=client,
+                    collection_metadata=params.metadata(),
+                )
+                for i in range(0, args.chunks, args.batch_size):
+                    stop = min(i + args.batch_size, args.chunks)
+                    store.add_texts(
+                        texts=[f"chunk-{j}" for j in range(i, stop)],
+                        metadatas=[{"document_id": f"doc-{assignment[j]}"} for j in range(i, stop)],
+                        ids=[f"chunk-{j}" for j in range(i, stop)],
+                    )
+                build_seconds = time.perf_counter() - start
+                build = {
+                    "m": m,
+                    "construction_ef": construction_ef,
+                    "build_s": round(build_seconds, 2),
+                    "disk_mb": round(directory_mb(path), 1),
+                    "rss_growth_mb": round(rss_mb() - rss_before, 1),
+                }
+
+                stored = store.get(include=["embeddings", "documents", "metadatas"])
+                for search_ef in args.search_ef:
+                    # A loaded index keeps the ef_search it was opened with
+                    store = Chroma(
+                        collection_name=f"sweep_ef{search_ef}",
+                        embedding_function=embedding,
+                        client=client,
+                        collection_metadata=replace(params, search_ef=search_ef).metadata(),
+                    )
+                    for i in range(0, args.chunks, args.batch_size):
+                        store._collection.add(
+                            ids=stored["ids"][i:i + args.batch_size],
+                            embeddings=stored["embeddings"][i:i + args.batch_size],
+                            documents=stored["documents"][i:i + args.batch_size],
+                            metadatas=stored["metadatas"][i:i + args.batch_size],
+                        )
+                    assert collection_params(store._collection).search_ef == search_ef
+                    latencies, recalls = [], []
+                    for q in range(args.queries):
+                        begin = time.perf_counter()
+                        found = store.similarity_search_with_score(f"query-{q}", k=args.k)
+                        latencies.append(time.perf_counter() - begin)
+                        recalls.append(len({doc.page_content for doc, _ in found} & truth[q]) / args.k)
+                    latency = summarize(latencies)
+                    results.append({
+                        **build,
+                        "search_ef": search_ef,
+                        f"recall@{args.k}": round(sum(recalls) / len(recalls), 4),
+                        "p50_ms": latency["p50_ms"],
+                        "p95_ms": latency["p95_ms"],
+                        "current": (m, construction_ef, search_ef) == (CURRENT.m, CURRENT.construction_ef, CURRENT.search_ef),
+                    })
+                print(f"M={m} construction_ef={construction_ef} done", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'M':>3} {'c_ef':>5} {'s_ef':>5} {'recall':>7} {'p50ms':>7} {'p95ms':>7} {'build_s':>8} {'disk_mb':>8} {'rss_mb':>7}")
+    for r in results:
+        marker = "  <- current" if r["current"] else ""
+        print(f"{r['m']:>3} {r['construction_ef']:>5} {r['search_ef']:>5} {r[f'recall@{args.k}']:>7.4f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['build_s']:>8.2f} {r['disk_mb']:>8.1f} {r['rss_growth_mb']:>7.1f}{marker}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "current": CURRENT.__dict__, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
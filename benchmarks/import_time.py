@@ -0,0 +1,165 @@
+"""
+Import-time report for the API and the admin CLI utilities.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports, per target, the median import time, the packages that account for
+it (self time summed per top-level package) and which of the heavy modules
+that should only load on first use (ML stack, document converters) were
+imported. Results can be stored as a baseline and later checked against it;
+--check also fails when a deferred module is imported eagerly again.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --top 15
+    python -m benchmarks.import_time --save-baseline
+    python -m benchmarks.import_time --check --threshold 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.common import isolated_environment
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "import_time.json")
+
+TARGETS = {
+    "api": "backend.main",
+    "create_admin": "create_admin",
+}
+
+# Loaded on first use (or by the startup warm-up), never at import
+DEFERRED_MODULES = (
+    "langchain_openai",
+    "langchain_chroma",
+    "chromadb",
+    "fitz",
+    "docx",
+    "langsmith.run_helpers",
+    "tiktoken",
+    "numpy",
+)
+# CLI utilities that don't need the web framework either
+CLI_TARGETS = ("create_admin",)
+CLI_EXCLUDED_MODULES = ("fastapi", "jose")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Rows of `-X importtime` output: module, self and cumulative microseconds."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def run_once(module: str, env: Dict) -> List[Dict]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, cwd=os.getcwd(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure(module: str, runs: int, top: int, env: Dict) -> Dict:
+    totals, by_package = [], defaultdict(list)
+    loaded = set()
+    for _ in range(runs):
+        rows = run_once(module, env)
+        totals.append(sum(row["self_us"] for row in rows))
+        per_run = defaultdict(int)
+        for row in rows:
+            per_run[row["module"].split(".")[0]] += row["self_us"]
+            loaded.add(row["module"])
+        for package, us in per_run.items():
+            by_package[package].append(us)
+    packages = sorted(
+        ((package, statistics.median(values)) for package, values in by_package.items()),
+        key=lambda item: -item[1],
+    )
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "modules": len(loaded),
+        "top_packages_ms": {package: round(us / 1000, 1) for package, us in packages[:top]},
+        "deferred_loaded": [name for name in DEFERRED_MODULES if name in loaded],
+        "_loaded": loaded,
+    }
+
+
+def check_regressions(results: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    failures = []
+    for name, data in results["targets"].items():
+        for module in data["deferred_loaded"]:
+            failures.append(f"{name}: {module} is imported at startup")
+        for module in data.get("cli_excluded_loaded", []):
+            failures.append(f"{name}: {module} is imported by a CLI utility")
+        before = baseline["targets"].get(name, {}).get("import_ms")
+        after = data["import_ms"]
+        if before and after > before * (1 + threshold) and after - before > min_delta_ms:
+            failures.append(f"{name}: {before} -> {after} ms (+{(after / before - 1) * 100:.0f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters per target; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="packages listed per target")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if slower than the stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown for --check")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="ignore regressions smaller than this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    isolated_environment()
+    env = {**os.environ, "PYTHONWARNINGS": "ignore"}
+    # Compile once so every measured run reads bytecode
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "backend", *[f"{m}.py" for m in CLI_TARGETS]], cwd=os.getcwd())
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "check", "baseline")},
+        "python": sys.version.split()[0],
+        "targets": {},
+    }
+    for name in args.targets.split(","):
+        data = measure(TARGETS[name], args.runs, args.top, env)
+        loaded = data.pop("_loaded")
+        if name in CLI_TARGETS:
+            data["cli_excluded_loaded"] = [m for m in CLI_EXCLUDED_MODULES if m in loaded]
+        results["targets"][name] = data
+
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if failures:
+            print("Regressions against baseline:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
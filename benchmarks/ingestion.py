@@ -0,0 +1,128 @@
+"""
+Ingestion throughput through the real /admin/upload path.
+
+Builds a synthetic corpus with dummy_datasets.build_corpus, uploads it to the
+in-process app with a fake embedding backend, and reports documents/sec,
+pages/sec, chunks/sec, peak RSS and per-stage time (read, convert, chunk,
+embed_store, persist).
+
+Usage:
+    python -m benchmarks.ingestion --employees 20 --months 12 --rows 5-40
+    python -m benchmarks.ingestion --formats pdf=0.6,docx=0.2,txt=0.1,md=0.1 --embed-per-text 0.002
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+from benchmarks.common import isolated_environment
+
+isolated_environment()
+
+import httpx  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.services.metrics import INGESTION_STAGE_SECONDS  # noqa: E402
+from benchmarks.fakes import FakeLatency, install_fakes  # noqa: E402
+from dummy_datasets import _parse_formats, _parse_range, build_corpus, render_report  # noqa: E402
+
+STAGES = ("read", "convert", "chunk", "embed_store", "persist")
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+    "md": "text/markdown",
+}
+
+
+def count_pages(item, content: bytes) -> int:
+    if item["format"] != "pdf":
+        return 1
+    import fitz
+
+    with fitz.open(stream=content, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--rows", type=_parse_range, default=(5, 40))
+    parser.add_argument("--formats", type=_parse_formats, default={"pdf": 0.7, "docx": 0.1, "txt": 0.1, "md": 0.1})
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-files", type=int, default=10, help="files per upload request")
+    parser.add_argument("--concurrency", type=int, default=1, help="upload requests in flight")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="fake embedding seconds per request")
+    parser.add_argument("--embed-per-text", type=float, default=0.0, help="fake embedding seconds per chunk")
+    args = parser.parse_args()
+
+    install_fakes(FakeLatency(embed_request=args.embed_latency, embed_per_text=args.embed_per_text))
+
+    items = build_corpus(args.employees, args.months, args.rows, args.formats, args.seed)
+    t = time.perf_counter()
+    files = [(item, render_report(item)) for item in items]
+    render_seconds = time.perf_counter() - t
+    pages = sum(count_pages(item, content) for item, content in files)
+    rss_before = peak_rss_mib()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/api/v1/auth/register", data={"username": "bench", "password": "bench"})
+            token = (await client.post("/api/v1/auth/token", data={"username": "bench", "password": "bench"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            batches = [files[i:i + args.batch_files] for i in range(0, len(files), args.batch_files)]
+            semaphore = asyncio.Semaphore(args.concurrency)
+            uploaded, failed, chunks = 0, 0, 0
+
+            async def upload(batch):
+                nonlocal uploaded, failed, chunks
+                form = [("files", (item["filename"], content, CONTENT_TYPES[item["format"]])) for item, content in batch]
+                async with semaphore:
+                    response = await client.post("/api/v1/admin/upload", files=form, headers=headers)
+                body = response.json()
+                uploaded += body["uploaded"]
+                failed += body["failed"]
+                chunks += sum(r["chunks"] for r in body["results"])
+
+            start = time.perf_counter()
+            await asyncio.gather(*(upload(batch) for batch in batches))
+            elapsed = time.perf_counter() - start
+
+    stages = {}
+    for stage in STAGES:
+        snapshot = INGESTION_STAGE_SECONDS.snapshot(stage=stage)
+        if snapshot["count"]:
+            stages[stage] = {
+                "total_s": round(snapshot["sum"], 3),
+                "mean_ms": round(snapshot["sum"] / snapshot["count"] * 1000, 2),
+                "share": round(snapshot["sum"] / elapsed, 3),
+            }
+
+    print(json.dumps({
+        "config": {k: v for k, v in vars(args).items()},
+        "documents": len(files),
+        "pages": pages,
+        "uploaded": uploaded,
+        "failed": failed,
+        "chunks": chunks,
+        "render_s": round(render_seconds, 2),
+        "elapsed_s": round(elapsed, 2),
+        "documents_per_s": round(uploaded / elapsed, 2),
+        "pages_per_s": round(pages / elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+        "peak_rss_mib": {"before_ingest": rss_before, "after_ingest": peak_rss_mib()},
+        "stages": stages,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,269 @@
+"""
+End-to-end load test against a real uvicorn server and a local OpenAI stub.
+
+Starts benchmarks.openai_stub and the backend (pointed at the stub through
+OPENAI_BASE_URL, with a throwaway database), seeds users and a small corpus,
+then runs scripted user sessions: login, multi-turn chat, history fetch and
+session list. Reports throughput, error rate and latency percentiles per
+endpoint, plus time to first token for chat streams, and the resident memory
+of the API workers (and Chroma server) at the end of the run.
+
+With --chroma-server the workers go through one `chroma run` process
+(CHROMA_SERVER_URL) instead of each opening the persist directory.
+
+Usage:
+    python -m benchmarks.load_test --users 50 --turns 4 --workers 1
+    python -m benchmarks.load_test --users 200 --first-token-latency 0.5 --tokens-per-second 60
+    python -m benchmarks.load_test --workers 4 --chroma-server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import summarize
+from dummy_datasets import build_corpus, render_report
+
+QUESTIONS = [
+    "halo",
+    "berapa total reimburse {name} bulan {month}?",
+    "tampilkan klaim transportasi {name} bulan {month}",
+    "kalau bulan {month} bagaimana?",
+    "terima kasih",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def process_rss_mb(pid: int) -> float:
+    """Resident memory of a process and its descendants."""
+    total = 0.0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) / 1024
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                total += sum(process_rss_mb(int(child)) for child in f.read().split())
+    except FileNotFoundError:
+        pass
+    return total
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, endpoint: str, coro):
+        start = time.perf_counter()
+        try:
+            response = await coro
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[endpoint] += 1
+        return response if ok else None
+
+
+async def chat_turn(client: httpx.AsyncClient, recorder: Recorder, headers: Dict, query: str, session_id=None):
+    """Stream one turn; records full latency and time to first token."""
+    start = time.perf_counter()
+    first_token = None
+    ok = False
+    try:
+        async with client.stream(
+            "POST", "/api/v1/chat/stream",
+            json={"query": query, "session_id": session_id}, headers=headers,
+        ) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event["type"] == "session_id":
+                    session_id = event["session_id"]
+                elif event["type"] == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif event["type"] == "done":
+                    ok = True
+                elif event["type"] == "error":
+                    break
+    except httpx.HTTPError:
+        pass
+
+    recorder.latencies["POST /chat/stream"].append(time.perf_counter() - start)
+    if first_token is not None:
+        recorder.latencies["chat first token"].append(first_token)
+    if not ok:
+        recorder.errors["POST /chat/stream"] += 1
+    return session_id
+
+
+async def user_session(client: httpx.AsyncClient, recorder: Recorder, username: str, turns: int, rng: random.Random, corpus):
+    response = await recorder.call(
+        "POST /auth/token",
+        client.post("/api/v1/auth/token", data={"username": username, "password": "loadtest"}),
+    )
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    item = rng.choice(corpus)
+    session_id = None
+    for turn in range(turns):
+        query = QUESTIONS[turn % len(QUESTIONS)].format(name=item["name"], month=item["month"])
+        session_id = await chat_turn(client, recorder, headers, query, session_id)
+        if session_id:
+            await recorder.call("GET /chat/history", client.get(f"/api/v1/chat/history/{session_id}", headers=headers))
+        await recorder.call("GET /chat/sessions", client.get("/api/v1/chat/sessions", headers=headers))
+        # Think time between turns
+        await asyncio.sleep(rng.uniform(0, 0.5))
+
+
+async def seed(client: httpx.AsyncClient, users: int, corpus) -> None:
+    await client.post("/api/v1/auth/register", data={"username": "loadadmin", "password": "loadtest"})
+    token = (await client.post("/api/v1/auth/token", data={"username": "loadadmin", "password": "loadtest"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(users):
+        await client.post("/api/v1/admin/users", json={"username": f"user{i}", "password": "loadtest"}, headers=headers)
+    files = [("files", (item["filename"], render_report(item), "text/markdown")) for item in corpus]
+    response = await client.post("/api/v1/admin/upload", files=files, headers=headers)
+    response.raise_for_status()
+    if response.json()["failed"]:
+        raise RuntimeError(f"Seeding failed: {response.json()['results']}")
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="rag-load-")
+    stub_port, app_port, chroma_port = free_port(), free_port(), free_port()
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "SQLITE_DB_PATH": os.path.join(workdir, "rag_web.db"),
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(workdir, "chroma"),
+        "LANGCHAIN_API_KEY": "",
+        "LANGCHAIN_TRACING_V2": "false",
+    }
+    if args.chroma_server:
+        env["CHROMA_SERVER_URL"] = f"http://127.0.0.1:{chroma_port}"
+    logs = open(os.path.join(workdir, "server.log"), "w")
+    processes = [
+        subprocess.Popen([
+            sys.executable, "-m", "benchmarks.openai_stub", "--port", str(stub_port),
+            "--first-token-latency", str(args.first_token_latency),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--embed-latency", str(args.embed_latency),
+        ], env=env, stdout=logs, stderr=subprocess.STDOUT),
+        subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning",
+        ], env=env, stdout=logs, stderr=subprocess.STDOUT),
+    ]
+    chroma = None
+    if args.chroma_server:
+        chroma = subprocess.Popen([
+            shutil.which("chroma") or "chroma", "run", "--path", env["CHROMA_PERSIST_DIRECTORY"],
+            "--host", "127.0.0.1", "--port", str(chroma_port),
+        ], env=env, stdout=logs, stderr=subprocess.STDOUT)
+        processes.insert(0, chroma)
+
+    try:
+        base_url = f"http://127.0.0.1:{app_port}"
+        await wait_ready(f"http://127.0.0.1:{stub_port}/docs")
+        if chroma:
+            await wait_ready(f"{env['CHROMA_SERVER_URL']}/api/v2/heartbeat")
+        await wait_ready(base_url + "/ready")
+
+        corpus = build_corpus(employees=args.employees, months=args.months, formats={"md": 1.0}, seed=args.seed)
+        limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await seed(client, args.users, corpus)
+
+            recorder = Recorder()
+            rng = random.Random(args.seed)
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                user_session(client, recorder, f"user{i}", args.turns, random.Random(rng.random()), corpus)
+                for i in range(args.users)
+            ))
+            elapsed = time.perf_counter() - start
+
+        memory = {"api_rss_mb": round(process_rss_mb(processes[-1].pid), 1)}
+        if chroma:
+            memory["chroma_server_rss_mb"] = round(process_rss_mb(chroma.pid), 1)
+        endpoints = {}
+        for endpoint, values in sorted(recorder.latencies.items()):
+            errors = recorder.errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                **summarize(values),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "error_rate": round(errors / len(values), 4) if values else 0.0,
+            }
+        print(json.dumps({
+            "config": vars(args),
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": endpoints,
+            "memory": memory,
+            "server_log": logs.name,
+        }, indent=2))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        logs.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="concurrent scripted users")
+    parser.add_argument("--turns", type=int, default=4, help="chat turns per user session")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--chroma-server", action="store_true", help="share one Chroma server between the workers")
+    parser.add_argument("--employees", type=int, default=5, help="employees in the seeded corpus")
+    parser.add_argument("--months", type=int, default=4, help="months per employee in the seeded corpus")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
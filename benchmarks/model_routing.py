@@ -0,0 +1,150 @@
+"""
+Offline evaluation of RAG generation model routing.
+
+Runs the golden questions from benchmarks.retrieval_eval, plus discovery,
+comparison and follow-up questions, through the production retrieval,
+selection, packing and routing steps over a synthetic corpus. Reports which
+model each kind of question is routed to.
+
+With --compare, every question routed away from RAG_DEFAULT_MODEL is also
+answered by the default model. The two answers are compared on the facts they
+state (Rupiah amounts, dates and cited refs), and per-model latency and output
+length are reported. --compare calls the configured OpenAI endpoint
+(OPENAI_API_KEY / OPENAI_BASE_URL); add --fake to exercise it offline with the
+deterministic fakes.
+
+Usage:
+    python -m benchmarks.model_routing
+    OPENAI_API_KEY=sk-... python -m benchmarks.model_routing --compare --questions 40
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from benchmarks.retrieval_eval import build_index, golden_questions  # isolates the environment first
+
+from backend.chains.rag_chain import format_docs_with_refs, get_rag_chain  # noqa: E402
+from backend.services.context_packer import pack_context  # noqa: E402
+from backend.services.context_selector import get_selection_params, select_context  # noqa: E402
+from backend.services.model_router import choose_generation_model, query_signals  # noqa: E402
+from backend.utils.config import settings  # noqa: E402
+from benchmarks.common import summarize  # noqa: E402
+from dummy_datasets import build_corpus  # noqa: E402
+
+AMOUNT = re.compile(r"Rp\s?[\d.,]+")
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+REF = re.compile(r"\[ref:\d+\]")
+
+
+def extra_questions(items: List[Dict], count: int, seed: int) -> List[Dict]:
+    """Questions the routing policy should keep on the default model."""
+    rng = random.Random(seed + 1)
+    questions = []
+    for i in range(count):
+        a, b = rng.sample(items, 2)
+        kind = ("discovery", "comparison", "follow_up")[i % 3]
+        if kind == "discovery":
+            query, history = f"siapa saja yang mengajukan reimburse bulan {a['month']} {a['year']}?", ""
+        elif kind == "comparison":
+            query, history = f"bandingkan reimburse {a['name']} bulan {a['month']} dan {b['month']}", ""
+        else:
+            query = f"kalau bulan {b['month']}?"
+            history = f"user: berapa total reimburse {a['name']} bulan {a['month']}?\nassistant: Totalnya tersedia di laporan."
+        questions.append({"kind": kind, "query": query, "history": history})
+    return questions
+
+
+def facts(answer: str) -> set:
+    return set(AMOUNT.findall(answer)) | set(DATE.findall(answer)) | set(REF.findall(answer))
+
+
+def agreement(a: str, b: str) -> float:
+    fa, fb = facts(a), facts(b)
+    if not fa and not fb:
+        return 1.0
+    return len(fa & fb) / len(fa | fb)
+
+
+async def generate(model: str, context: str, question: Dict) -> Dict:
+    start = time.perf_counter()
+    answer = await get_rag_chain(model).ainvoke({
+        "context": context,
+        "question": question["query"],
+        "chat_history": question.get("history", ""),
+    })
+    return {"answer": answer, "seconds": time.perf_counter() - start}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--questions", type=int, default=60, help="lookup questions from the golden set")
+    parser.add_argument("--extra-questions", type=int, default=30, help="discovery/comparison/follow-up questions")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--compare", action="store_true", help="answer routed questions with both models")
+    parser.add_argument("--fake", action="store_true", help="use the fake LLM for --compare")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.fake:
+        from benchmarks.fakes import install_fakes
+        install_fakes()
+
+    items = build_corpus(args.employees, args.months, (5, 40), {"md": 1.0}, args.seed)
+    store, _ = build_index(items, args.chunk_size, args.chunk_overlap, dimensions=256)
+    questions = golden_questions(items, args.questions, args.seed) + extra_questions(items, args.extra_questions, args.seed)
+
+    routing = defaultdict(Counter)
+    comparisons = []
+    latency = defaultdict(list)
+    for question in questions:
+        docs_with_scores = store.similarity_search_with_score(question["query"], k=get_selection_params().candidate_k)
+        docs_with_scores, _ = select_context(docs_with_scores)
+        docs_with_scores, packing = pack_context(docs_with_scores)
+        signals = query_signals(question["query"], docs_with_scores, packing["tokens"], question.get("history", ""))
+        model, rule = choose_generation_model(signals)
+        routing[question["kind"]][model] += 1
+
+        if args.compare and model != settings.RAG_DEFAULT_MODEL:
+            context = format_docs_with_refs([doc for doc, _ in docs_with_scores])
+            routed, default = await asyncio.gather(
+                generate(model, context, question),
+                generate(settings.RAG_DEFAULT_MODEL, context, question),
+            )
+            latency[model].append(routed["seconds"])
+            latency[settings.RAG_DEFAULT_MODEL].append(default["seconds"])
+            comparisons.append({
+                "kind": question["kind"],
+                "agreement": agreement(routed["answer"], default["answer"]),
+                "length_ratio": len(routed["answer"]) / max(1, len(default["answer"])),
+            })
+
+    results = {
+        "policy": settings.RAG_MODEL_POLICY,
+        "default_model": settings.RAG_DEFAULT_MODEL,
+        "routing": {kind: dict(models) for kind, models in routing.items()},
+    }
+    if comparisons:
+        by_kind = defaultdict(list)
+        for c in comparisons:
+            by_kind[c["kind"]].append(c["agreement"])
+        results["comparison"] = {
+            "questions": len(comparisons),
+            "agreement_mean": round(sum(c["agreement"] for c in comparisons) / len(comparisons), 3),
+            "agreement_by_kind": {kind: round(sum(v) / len(v), 3) for kind, v in by_kind.items()},
+            "full_agreement_rate": round(sum(c["agreement"] == 1.0 for c in comparisons) / len(comparisons), 3),
+            "length_ratio_mean": round(sum(c["length_ratio"] for c in comparisons) / len(comparisons), 2),
+            "latency": {model: summarize(values) for model, values in latency.items()},
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+"""
+Local OpenAI-compatible stub server for load tests.
+
+Implements /v1/chat/completions (plain and streaming) and /v1/embeddings with
+the deterministic responses from benchmarks.fakes and configurable latency.
+
+Usage:
+    python -m benchmarks.openai_stub --port 8099 --first-token-latency 0.3 --tokens-per-second 80
+"""
+import argparse
+import asyncio
+import base64
+import json
+import struct
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmarks.fakes import LATENCY, fake_completion, hashed_embedding, split_tokens
+
+app = FastAPI(title="openai-stub")
+
+DEFAULT_DIMENSIONS = 256
+
+
+# System prompts seen so far; a repeat is reported as a prompt-cache hit
+_seen_prefixes = set()
+
+
+def _usage(prompt: str, completion: str, messages=()) -> dict:
+    prompt_tokens = len(split_tokens(prompt))
+    completion_tokens = len(split_tokens(completion))
+    cached_tokens = 0
+    if messages and messages[0].get("role") == "system":
+        prefix = _prompt(messages[:1])
+        if prefix in _seen_prefixes:
+            cached_tokens = len(split_tokens(prefix))
+        _seen_prefixes.add(prefix)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _prompt(messages) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    messages = body.get("messages", [])
+    prompt = _prompt(messages)
+    text = fake_completion(prompt)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        await asyncio.sleep(LATENCY.first_token)
+        if LATENCY.tokens_per_second:
+            await asyncio.sleep(len(split_tokens(text)) / LATENCY.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": _usage(prompt, text, messages),
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: dict, finish_reason=None, usage=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+        }
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream():
+        await asyncio.sleep(LATENCY.first_token)
+        yield chunk({"role": "assistant", "content": ""})
+        for token in split_tokens(text):
+            if LATENCY.tokens_per_second:
+                await asyncio.sleep(1 / LATENCY.tokens_per_second)
+            yield chunk({"content": token})
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, usage=_usage(prompt, text, messages))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    dimensions = body.get("dimensions") or DEFAULT_DIMENSIONS
+
+    await asyncio.sleep(LATENCY.embed_request + LATENCY.embed_per_text * len(inputs))
+
+    data = []
+    for i, item in enumerate(inputs):
+        # Token-id inputs (the default for api.openai.com clients) hash like words
+        text = item if isinstance(item, str) else " ".join(str(t) for t in item)
+        vector = hashed_embedding(text, dimensions)
+        if body.get("encoding_format") == "base64":
+            vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+        data.append({"object": "embedding", "index": i, "embedding": vector})
+
+    tokens = sum(len(item) if not isinstance(item, str) else len(item.split()) for item in inputs)
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "stub"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--embed-per-text", type=float, default=0.0)
+    args = parser.parse_args()
+
+    LATENCY.first_token = args.first_token_latency
+    LATENCY.tokens_per_second = args.tokens_per_second
+    LATENCY.embed_request = args.embed_latency
+    LATENCY.embed_per_text = args.embed_per_text
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
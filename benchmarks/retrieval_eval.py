@@ -0,0 +1,205 @@
+"""
+Offline retrieval quality and latency evaluation.
+
+Chunks a synthetic reimbursement corpus (dummy_datasets.build_corpus) with
+backend.services.chunker.chunk_text, indexes it in an in-memory Chroma
+collection using the deterministic hashed embedding from benchmarks.fakes, and
+runs a generated golden question set through similarity_search_with_score the
+way chat_stream does. For every chunk size / overlap / k / distance threshold
+combination it reports recall@k, MRR, context tokens sent to the LLM and
+retrieval latency, plus one "adaptive" row per chunking for the context
+selector chat_stream uses (backend.services.context_selector).
+
+Golden questions come in three kinds:
+  total  - "berapa total reimburse <name> bulan <month> <year>?"; relevant chunks
+           are those of that report holding the grand total
+  row    - a single expense line; relevant chunks hold that line
+  list   - "tampilkan semua klaim <name> ..."; every chunk of the report is relevant
+
+Usage:
+    python -m benchmarks.retrieval_eval
+    python -m benchmarks.retrieval_eval --chunk-sizes 500,1000,2000 --overlaps 0,200 --k 3,5,10 --thresholds none,0.6,0.8
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from benchmarks.common import isolated_environment, summarize
+
+isolated_environment()
+
+import chromadb  # noqa: E402
+from langchain_chroma import Chroma  # noqa: E402
+
+from backend.services.chunker import chunk_text  # noqa: E402
+from backend.services.context_selector import get_selection_params, select_context  # noqa: E402
+from backend.utils.tokens import count_tokens  # noqa: E402
+from benchmarks.fakes import FakeEmbeddings  # noqa: E402
+from dummy_datasets import _parse_range, build_corpus, create_rupiah_format, render_md  # noqa: E402
+
+# What chat_stream and the uploader use today
+PRODUCTION = {"chunk_size": 1000, "chunk_overlap": 200, "k": "adaptive", "threshold": None}
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _thresholds(value: str) -> List[Optional[float]]:
+    return [None if v == "none" else float(v) for v in value.split(",") if v]
+
+
+def golden_questions(items: List[Dict], count: int, seed: int) -> List[Dict]:
+    """
+    Questions paired with a relevance test: a chunk is relevant when it comes
+    from `filename` and contains every string in `needles`.
+    """
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        item = rng.choice(items)
+        period = f"{item['month']} {item['year']}"
+        kind = ("total", "row", "list")[i % 3]
+        if kind == "total":
+            query = f"berapa total reimburse {item['name']} bulan {period}?"
+            needles = ["Grand Total"]
+        elif kind == "row":
+            date, description, category, amount = rng.choice(item["data"])
+            query = f"kapan {item['name']} mengajukan {description.lower()} bulan {period}?"
+            needles = [date, description, create_rupiah_format(amount)]
+        else:
+            query = f"tampilkan semua klaim {item['name']} bulan {period}"
+            needles = []
+        questions.append({"kind": kind, "query": query, "filename": item["filename"], "needles": needles})
+    return questions
+
+
+def is_relevant(question: Dict, filename: str, text: str) -> bool:
+    return filename == question["filename"] and all(n in text for n in question["needles"])
+
+
+def build_index(items: List[Dict], chunk_size: int, chunk_overlap: int, dimensions: int):
+    """Chunk and index the corpus; returns the store plus chunk texts by filename."""
+    store = Chroma(
+        collection_name=f"eval_{uuid.uuid4().hex[:8]}",
+        embedding_function=FakeEmbeddings(dimensions=dimensions),
+        client=chromadb.EphemeralClient(),
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+    chunks_by_file: Dict[str, List[str]] = {}
+    texts, metadatas = [], []
+    for item in items:
+        chunks = chunk_text(render_md(item).decode("utf-8"), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        chunks_by_file[item["filename"]] = chunks
+        texts += chunks
+        metadatas += [{"filename": item["filename"], "chunk_index": i} for i in range(len(chunks))]
+    store.add_texts(texts=texts, metadatas=metadatas)
+    return store, chunks_by_file
+
+
+def score(questions: List[Dict], ranked, chunks_by_file, select) -> Dict:
+    """Quality and context size when `select` picks the chunks sent for each result list."""
+    recalls, reciprocal_ranks, tokens, sent = [], [], [], []
+    by_kind: Dict[str, List[float]] = {}
+    for q, results in zip(questions, ranked):
+        selected = select(results)
+        relevant_total = sum(1 for text in chunks_by_file[q["filename"]] if is_relevant(q, q["filename"], text))
+        hits = [is_relevant(q, doc.metadata["filename"], doc.page_content) for doc, _ in selected]
+        recall = sum(hits) / relevant_total if relevant_total else 0.0
+        recalls.append(recall)
+        by_kind.setdefault(q["kind"], []).append(recall)
+        reciprocal_ranks.append(next((1 / (i + 1) for i, hit in enumerate(hits) if hit), 0.0))
+        tokens.append(sum(count_tokens(doc.page_content) for doc, _ in selected))
+        sent.append(len(selected))
+    return {
+        "recall": round(sum(recalls) / len(recalls), 3),
+        "recall_by_kind": {kind: round(sum(v) / len(v), 3) for kind, v in by_kind.items()},
+        "mrr": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 3),
+        "chunks_sent_mean": round(sum(sent) / len(sent), 2),
+        "context_tokens_mean": round(sum(tokens) / len(tokens), 1),
+        "context_tokens_max": max(tokens),
+    }
+
+
+def evaluate(store, chunks_by_file, questions: List[Dict], ks: List[int], thresholds: List[Optional[float]], repeats: int) -> List[Dict]:
+    selection = get_selection_params()
+    fetch_k = max(ks + [selection.candidate_k])
+    ranked = [store.similarity_search_with_score(q["query"], k=fetch_k) for q in questions]
+
+    # Query cost depends on k, not on the threshold applied afterwards
+    latency = {}
+    for k in sorted(set(ks + [selection.candidate_k])):
+        samples = []
+        for _ in range(repeats):
+            for q in questions:
+                start = time.perf_counter()
+                store.similarity_search_with_score(q["query"], k=k)
+                samples.append(time.perf_counter() - start)
+        latency[k] = {key: summarize(samples)[key] for key in ("p50_ms", "p95_ms")}
+
+    rows = []
+    for k in ks:
+        for threshold in thresholds:
+            select = lambda results: [(doc, s) for doc, s in results[:k] if threshold is None or s <= threshold]  # noqa: E731
+            rows.append({"k": k, "threshold": threshold, **score(questions, ranked, chunks_by_file, select), "latency": latency[k]})
+
+    # The adaptive selector chat_stream applies to candidate_k results
+    select = lambda results: select_context(results[:selection.candidate_k], selection)[0]  # noqa: E731
+    rows.append({"k": "adaptive", "threshold": None, **score(questions, ranked, chunks_by_file, select),
+                 "latency": latency[selection.candidate_k]})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--rows", type=_parse_range, default=(5, 40))
+    parser.add_argument("--questions", type=int, default=150)
+    parser.add_argument("--chunk-sizes", type=_ints, default=[500, 1000, 2000])
+    parser.add_argument("--overlaps", type=_ints, default=[0, 200])
+    parser.add_argument("--k", type=_ints, default=[3, 5, 10])
+    parser.add_argument("--thresholds", type=_thresholds, default=[None, 0.6, 0.8], help="cosine distance cutoffs, 'none' for no cutoff")
+    parser.add_argument("--dimensions", type=int, default=256, help="hashed embedding size")
+    parser.add_argument("--repeats", type=int, default=3, help="latency samples per question and k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    items = build_corpus(args.employees, args.months, args.rows, {"md": 1.0}, args.seed)
+    questions = golden_questions(items, args.questions, args.seed)
+
+    results = []
+    for chunk_size in args.chunk_sizes:
+        for chunk_overlap in args.overlaps:
+            if chunk_overlap >= chunk_size:
+                continue
+            start = time.perf_counter()
+            store, chunks_by_file = build_index(items, chunk_size, chunk_overlap, args.dimensions)
+            index_seconds = time.perf_counter() - start
+            chunks = sum(len(c) for c in chunks_by_file.values())
+            for row in evaluate(store, chunks_by_file, questions, args.k, args.thresholds, args.repeats):
+                row = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunks": chunks,
+                       "index_s": round(index_seconds, 2), **row}
+                row["production"] = all(row[key] == value for key, value in PRODUCTION.items())
+                results.append(row)
+
+    print(f"{'size':>5} {'ovl':>4} {'k':>8} {'thr':>5} {'recall':>7} {'mrr':>6} {'chunks':>6} {'tokens':>7} {'p50ms':>7}")
+    for row in results:
+        threshold = "-" if row["threshold"] is None else f"{row['threshold']:.2f}"
+        marker = "  <- current" if row["production"] else ""
+        print(f"{row['chunk_size']:>5} {row['chunk_overlap']:>4} {row['k']:>8} {threshold:>5} "
+              f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['chunks_sent_mean']:>6.1f} "
+              f"{row['context_tokens_mean']:>7.0f} {row['latency']['p50_ms']:>7.2f}{marker}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "documents": len(items), "questions": len(questions), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
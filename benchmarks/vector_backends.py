@@ -0,0 +1,206 @@
+"""
+Vector store backend comparison: Chroma (HNSW) against the memory-mapped NumPy
+index (backend.services.numpy_vectorstore) at float32, float16 and int8, with
+and without truncated dimensions.
+
+Embeddings are synthetic: unit vectors drawn around `--clusters` centres (one
+per "report"), so neighbours are meaningful and the scale can go well beyond
+what the hashed fake embedding handles. Queries are perturbed copies of
+random chunks. Ground truth is an exact float32 scan of the full vectors.
+
+For every backend it reports build time, single-query latency through
+similarity_search_with_score (the call chat_stream makes), batched query
+throughput where supported, latency with a document_id filter, recall@k
+against the ground truth, on-disk size and the RSS growth while building and
+querying (approximate; backends run one after another in this process).
+
+Usage:
+    python -m benchmarks.vector_backends
+    python -m benchmarks.vector_backends --chunks 50000 --dimensions 3072 --k 10
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import isolated_environment, summarize
+
+isolated_environment()
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+from langchain_chroma import Chroma  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from backend.services.numpy_vectorstore import NumpyVectorStore  # noqa: E402
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors for the "chunk-N" / "query-N" texts."""
+
+    def __init__(self, chunks: np.ndarray, queries: np.ndarray):
+        self.chunks = chunks
+        self.queries = queries
+
+    def _vector(self, text: str) -> List[float]:
+        kind, index = text.split("-")
+        return (self.chunks if kind == "chunk" else self.queries)[int(index)].tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def synthetic_vectors(chunks: int, queries: int, dimensions: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    assignment = rng.integers(0, clusters, chunks)
+    vectors = centres[assignment] + 0.8 * rng.standard_normal((chunks, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    picked = rng.integers(0, chunks, queries)
+    query_vectors = vectors[picked] + 0.05 * rng.standard_normal((queries, dimensions)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors, assignment
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ vectors.T
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [{f"chunk-{i}" for i in row} for row in best]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def directory_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 / 1024
+
+
+def build(backend: Dict, embedding: Embeddings, assignment: np.ndarray, workdir: str, batch_size: int):
+    path = os.path.join(workdir, backend["name"])
+    if backend["kind"] == "chroma":
+        store = Chroma(
+            collection_name="bench",
+            embedding_function=embedding,
+            client=chromadb.PersistentClient(path=path),
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+    else:
+        store = NumpyVectorStore(path, embedding, dtype=backend["dtype"], dimensions=backend.get("dimensions"))
+
+    for start in range(0, len(assignment), batch_size):
+        stop = min(start + batch_size, len(assignment))
+        store.add_texts(
+            texts=[f"chunk-{i}" for i in range(start, stop)],
+            metadatas=[{"document_id": f"doc-{assignment[i]}", "chunk_index": i} for i in range(start, stop)],
+            ids=[f"chunk-{i}" for i in range(start, stop)],
+        )
+    return store, path
+
+
+def run_backend(backend: Dict, args, embedding, assignment, truth, workdir) -> Dict:
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    store, path = build(backend, embedding, assignment, workdir, args.batch_size)
+    build_seconds = time.perf_counter() - start
+
+    latencies, recalls = [], []
+    for q in range(args.queries):
+        start = time.perf_counter()
+        results = store.similarity_search_with_score(f"query-{q}", k=args.k)
+        latencies.append(time.perf_counter() - start)
+        found = {doc.page_content for doc, _ in results}
+        recalls.append(len(found & truth[q]) / args.k)
+
+    filtered = []
+    for q in range(min(args.queries, 100)):
+        where = {"document_id": f"doc-{assignment[q]}"}
+        start = time.perf_counter()
+        store.similarity_search_with_score(f"query-{q}", k=args.k, filter=where)
+        filtered.append(time.perf_counter() - start)
+
+    result = {
+        "backend": backend["name"],
+        "build_s": round(build_seconds, 2),
+        "query": summarize(latencies),
+        "filtered_query": summarize(filtered),
+        f"recall@{args.k}": round(sum(recalls) / len(recalls), 4),
+        "disk_mb": round(directory_mb(path), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+    }
+    if hasattr(store, "search_by_vectors"):
+        vectors = embedding.queries[:args.queries]
+        start = time.perf_counter()
+        for i in range(0, len(vectors), args.query_batch):
+            store.search_by_vectors(vectors[i:i + args.query_batch], k=args.k)
+        result["batched_qps"] = round(len(vectors) / (time.perf_counter() - start), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=3072, help="text-embedding-3-large size")
+    parser.add_argument("--clusters", type=int, default=2000, help="synthetic documents")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--query-batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000, help="chunks per add_texts call")
+    parser.add_argument("--truncate", type=int, default=1024, help="dimensions for the truncated int8 variant, 0 to skip")
+    parser.add_argument("--backends", default="chroma,float32,float16,int8,int8-truncated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    vectors, queries, assignment = synthetic_vectors(args.chunks, args.queries, args.dimensions, args.clusters, args.seed)
+    truth = exact_top_k(vectors, queries, args.k)
+    embedding = LookupEmbeddings(vectors, queries)
+
+    backends = {
+        "chroma": {"name": "chroma", "kind": "chroma"},
+        "float32": {"name": "numpy-float32", "kind": "numpy", "dtype": "float32"},
+        "float16": {"name": "numpy-float16", "kind": "numpy", "dtype": "float16"},
+        "int8": {"name": "numpy-int8", "kind": "numpy", "dtype": "int8"},
+        "int8-truncated": {"name": f"numpy-int8-{args.truncate}d", "kind": "numpy", "dtype": "int8", "dimensions": args.truncate},
+    }
+    selected = [backends[name] for name in args.backends.split(",") if name]
+    if not args.truncate:
+        selected = [b for b in selected if not b.get("dimensions")]
+
+    workdir = tempfile.mkdtemp(prefix="rag-vectors-")
+    results = []
+    try:
+        for backend in selected:
+            results.append(run_backend(backend, args, embedding, assignment, truth, workdir))
+            print(f"{backend['name']} done", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'backend':<22} {'build_s':>8} {'p50ms':>7} {'p95ms':>7} {'filt_p50':>8} {'recall':>7} {'qps_b':>7} {'disk_mb':>8} {'rss_mb':>7}")
+    for r in results:
+        print(f"{r['backend']:<22} {r['build_s']:>8.2f} {r['query']['p50_ms']:>7.2f} {r['query']['p95_ms']:>7.2f} "
+              f"{r['filtered_query']['p50_ms']:>8.2f} {r[f'recall@{args.k}']:>7.4f} {r.get('batched_qps', '-'):>7} "
+              f"{r['disk_mb']:>8.1f} {r['rss_growth_mb']:>7.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
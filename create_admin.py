@@ -6,7 +6,7 @@ import os
 sys.path.append(os.getcwd())
 
 from backend.services.sqlite_client import create_user, init_db
-from backend.utils.security import get_password_hash
+from backend.utils.passwords import get_password_hash
 import uuid
 
 async def main():
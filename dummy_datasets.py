@@ -1,5 +1,19 @@
-from fpdf import FPDF
+"""
+Synthetic reimbursement reports for demos and benchmarks.
+
+Without arguments this writes the original 12 PDF reports to the current
+directory. With --employees/--months it builds a larger deterministic corpus
+(N employees x M months) in a mix of PDF, DOCX, TXT and MD.
+
+Usage:
+    python dummy_datasets.py
+    python dummy_datasets.py --employees 50 --months 12 --rows 5-40 --formats pdf=0.6,docx=0.2,txt=0.1,md=0.1 --out corpus/
+"""
+import argparse
 import os
+import random
+from io import BytesIO
+from typing import Dict, List, Tuple
 
 # Data untuk 12 Laporan (Sesuai output sebelumnya)
 dataset = [
@@ -165,26 +179,129 @@ dataset = [
     },
 ]
 
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 14)
-        # Title placeholder, will be set per document
-    
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, 'Halaman ' + str(self.page_no()), 0, 0, 'C')
 
-def create_rupiah_format(amount):
-    return "Rp " + "{:,.0f}".format(amount).replace(",", ".")
+MONTHS = [
+    "Januari", "Februari", "Maret", "April", "Mei", "Juni",
+    "Juli", "Agustus", "September", "Oktober", "November", "Desember",
+]
+
+FIRST_NAMES = [
+    "Angga", "Andika", "Ancika", "Budi", "Citra", "Dewi", "Eka", "Fajar", "Gita", "Hendra",
+    "Indah", "Joko", "Kartika", "Lestari", "Made", "Nadia", "Oka", "Putri", "Rizky", "Sari",
+    "Taufik", "Umar", "Vina", "Wahyu", "Yoga", "Zahra",
+]
+
+# Category -> (description templates, amount range in Rupiah)
+EXPENSES = {
+    "Transportasi": ([
+        "Tiket KRL perjalanan dinas", "Grab ke lokasi meeting klien", "Parkir di gedung kantor klien",
+        "Tiket Transjakarta ke cabang", "Taksi dari hotel ke bandara", "Bensin untuk kunjungan lapangan",
+        "Toll perjalanan dinas ke {city}", "Tiket kereta menuju {city}", "Tiket pesawat Jakarta - {city}",
+    ], (7000, 750000)),
+    "Makan Siang": ([
+        "Makan siang dengan tim proyek", "Makan siang dengan vendor", "Makan malam lembur",
+        "Makan siang meeting klien baru", "Makan siang tim ({n} orang)", "Makan siang dinas di {city}",
+    ], (35000, 185000)),
+    "Peralatan Kantor": ([
+        "Beli map dan kertas A4", "Beli notes dan pulpen", "Beli mouse dan keyboard cadangan",
+        "Beli tinta printer untuk kantor", "Beli flashdisk backup data", "Beli charger laptop pengganti",
+    ], (15000, 150000)),
+    "Akomodasi": ([
+        "Penginapan ({n} malam) di {city}", "Hotel ({n} malam) di {city}",
+    ], (350000, 900000)),
+    "Lain-lain": ([
+        "Biaya fotocopy dokumen", "Biaya jasa kurir dokumen", "Biaya registrasi webinar",
+        "Biaya domain untuk prototype", "Biaya laundry selama dinas", "Biaya download asset desain",
+    ], (10000, 150000)),
+}
+
+CITIES = ["Bandung", "Surabaya", "Semarang", "Medan", "Bogor", "Yogyakarta", "Makassar", "Denpasar"]
+
+FORMATS = ("pdf", "docx", "txt", "md")
+
+
+def employee_names(count: int) -> List[str]:
+    names = FIRST_NAMES[:count]
+    # Past the name list, number repeated names to keep filenames unique
+    for i in range(len(names), count):
+        names.append(f"{FIRST_NAMES[i % len(FIRST_NAMES)]}{i // len(FIRST_NAMES) + 1}")
+    return names
+
+
+def _expense_row(rng: random.Random, year: int, month_index: int) -> list:
+    category = rng.choice(list(EXPENSES))
+    templates, (low, high) = EXPENSES[category]
+    description = rng.choice(templates).format(city=rng.choice(CITIES), n=rng.randint(2, 6))
+    day = rng.randint(1, 28)
+    # Round to 500 like real receipts
+    amount = rng.randint(low // 500, high // 500) * 500
+    return [f"{year}-{month_index + 1:02d}-{day:02d}", description, category, amount]
+
+
+def build_corpus(
+    employees: int = 3,
+    months: int = 4,
+    rows: Tuple[int, int] = (5, 8),
+    formats: Dict[str, float] = None,
+    seed: int = 42,
+    start_year: int = 2025,
+    start_month: int = 8,
+) -> List[Dict]:
+    """
+    Deterministic list of report items (same shape as `dataset`, plus "format").
+
+    Months run consecutively from start_month/start_year; rows is an inclusive
+    (min, max) range of expense lines per report; formats maps a file format to
+    its relative weight.
+    """
+    rng = random.Random(seed)
+    formats = formats or {"pdf": 1.0}
+    format_names = list(formats)
+    weights = [formats[f] for f in format_names]
+
+    items = []
+    for name in employee_names(employees):
+        for offset in range(months):
+            month_index = (start_month - 1 + offset) % 12
+            year = start_year + (start_month - 1 + offset) // 12
+            month = MONTHS[month_index]
+            count = rng.randint(rows[0], rows[1])
+            data = sorted(_expense_row(rng, year, month_index) for _ in range(count))
+            fmt = rng.choices(format_names, weights)[0]
+            items.append({
+                "filename": f"reimburse-{name}-{month}-{year}.{fmt}",
+                "name": name,
+                "month": month,
+                "year": year,
+                "format": fmt,
+                "data": data,
+            })
+    return items
+
+
+def _title(item) -> str:
+    return f"Laporan Reimburse {item['name']} - {item['month']} {item.get('year', 2025)}"
+
+
+def render_pdf(item) -> bytes:
+    from fpdf import FPDF
+
+    class PDF(FPDF):
+        def header(self):
+            self.set_font('Arial', 'B', 14)
+            # Title placeholder, will be set per document
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 10, 'Halaman ' + str(self.page_no()), 0, 0, 'C')
 
-def generate_pdf(item):
     pdf = PDF()
     pdf.add_page()
     
     # Title
     pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, f"Laporan Reimburse {item['name']} - {item['month']} 2025", ln=True, align='C')
+    pdf.cell(0, 10, _title(item), ln=True, align='C')
     pdf.ln(10)
     
     # Table Header
@@ -211,14 +328,100 @@ def generate_pdf(item):
     pdf.set_font('Arial', 'B', 10)
     pdf.cell(150, 10, 'Grand Total', 1, 0, 'R')
     pdf.cell(40, 10, create_rupiah_format(total), 1, 1, 'R')
-    
-    # Save file
-    pdf.output(item['filename'])
-    print(f"Generated: {item['filename']}")
+
+    # PyFPDF returns a latin-1 str, fpdf2 a bytearray
+    output = pdf.output(dest='S')
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+
+def render_docx(item) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading(_title(item), level=1)
+    table = doc.add_table(rows=1, cols=4)
+    for cell, text in zip(table.rows[0].cells, ["Tanggal", "Deskripsi", "Kategori", "Jumlah (Rp)"]):
+        cell.text = text
+    for date, desc, cat, amount in item['data']:
+        cells = table.add_row().cells
+        for cell, text in zip(cells, [date, desc, cat, create_rupiah_format(amount)]):
+            cell.text = text
+    cells = table.add_row().cells
+    cells[1].text = "Grand Total"
+    cells[3].text = create_rupiah_format(sum(row[3] for row in item['data']))
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_txt(item) -> bytes:
+    lines = [_title(item).upper(), ""]
+    for date, desc, cat, amount in item['data']:
+        lines.append(f"- {date} | {desc} | {cat} | {create_rupiah_format(amount)}")
+    lines += ["", f"Grand Total: {create_rupiah_format(sum(row[3] for row in item['data']))}"]
+    return "\n".join(lines).encode("utf-8")
+
+
+def render_md(item) -> bytes:
+    lines = [f"# {_title(item)}", "", "| Tanggal | Deskripsi | Kategori | Jumlah (Rp) |", "| --- | --- | --- | --- |"]
+    for date, desc, cat, amount in item['data']:
+        lines.append(f"| {date} | {desc} | {cat} | {create_rupiah_format(amount)} |")
+    lines.append(f"| | **Grand Total** | | {create_rupiah_format(sum(row[3] for row in item['data']))} |")
+    return "\n".join(lines).encode("utf-8")
+
+
+RENDERERS = {"pdf": render_pdf, "docx": render_docx, "txt": render_txt, "md": render_md}
+
+
+def render_report(item) -> bytes:
+    return RENDERERS[item.get("format", "pdf")](item)
+
+
+def create_rupiah_format(amount):
+    return "Rp " + "{:,.0f}".format(amount).replace(",", ".")
+
+
+def write_report(item, out_dir: str = "."):
+    path = os.path.join(out_dir, item['filename'])
+    with open(path, "wb") as f:
+        f.write(render_report(item))
+    print(f"Generated: {path}")
+
+
+def _parse_formats(value: str) -> Dict[str, float]:
+    formats = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FORMATS:
+            raise argparse.ArgumentTypeError(f"Unknown format: {name}. Supported: {', '.join(FORMATS)}")
+        formats[name] = float(weight or 1)
+    return formats
+
+
+def _parse_range(value: str) -> Tuple[int, int]:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
 
 # Main Execution
 if __name__ == "__main__":
-    print("Generating 12 PDF files...")
-    for item in dataset:
-        generate_pdf(item)
-    print("Done! Semua file telah dibuat.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, help="number of employees (default: the original 12 reports)")
+    parser.add_argument("--months", type=int, default=4)
+    parser.add_argument("--rows", type=_parse_range, default=(5, 8), help="expense lines per report, e.g. 5-40")
+    parser.add_argument("--formats", type=_parse_formats, default={"pdf": 1.0}, help="e.g. pdf=0.7,docx=0.1,txt=0.1,md=0.1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=".")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.employees:
+        items = build_corpus(args.employees, args.months, args.rows, args.formats, args.seed)
+    else:
+        items = dataset
+
+    print(f"Generating {len(items)} files...")
+    for item in items:
+        write_report(item, args.out)
+    print("Done! Semua file telah dibuat.")
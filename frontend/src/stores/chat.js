@@ -67,7 +67,10 @@ export const useChatStore = defineStore('chat', () => {
                 messages.value[assistantMessageIndex].streaming = false
                 loading.value = false
               } else if (data.type === 'error') {
-                throw new Error(data.message)
+                // e.g. "busy" when the server's model call queue is full
+                messages.value[assistantMessageIndex].content = data.message
+                messages.value[assistantMessageIndex].streaming = false
+                loading.value = false
               }
             } catch (e) {
               console.error('Error parsing SSE data:', e)
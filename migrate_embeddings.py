@@ -0,0 +1,181 @@
+"""
+Re-embed the Chroma corpus with another embedding model or dimension while
+the API keeps serving from the current collection.
+
+Chunk texts are re-embedded in batches, at most --rate chunks per second,
+into a new collection; uploads and deletes made meanwhile are caught up, then
+the active collection is switched for every worker at once (queries follow
+the model recorded on the collection). If the run is interrupted it resumes
+where it stopped the next time it is started with the same target; --abort
+drops the partial collection instead.
+
+Usage:
+    EMBEDDING_DIMENSIONS=1024 python migrate_embeddings.py
+    python migrate_embeddings.py --model text-embedding-3-small --rate 50
+    python migrate_embeddings.py --abort
+
+Set EMBEDDING_MODEL / EMBEDDING_DIMENSIONS to the new values as well, so
+collections created later (and the numpy backend) use them. Prints index size
+and search latency of the collection before and after.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# Add the current directory to sys.path to allow importing backend modules
+sys.path.append(os.getcwd())
+
+from backend.services.chroma_client import get_chroma_client
+from backend.services.embedding_model import EmbeddingSpec, get_embedding_model
+from backend.services.sqlite_client import delete_config_value, init_db, set_config_value
+from backend.services.vector_collections import (
+    MIGRATION_KEY,
+    collection_embedding,
+    collection_params,
+    get_rebuild_status,
+    new_collection_name,
+    pending_migration,
+    rebuild_collection,
+    refresh_active_collection,
+)
+from backend.utils.config import settings
+
+SAMPLE_QUERIES = 50
+TOP_K = 5
+
+
+def index_mb(collection) -> float:
+    """On-disk size of the collection's HNSW segment (0 when the Chroma server's files aren't local)."""
+    path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return 0.0
+    with sqlite3.connect(path) as db:
+        rows = db.execute(
+            "SELECT id FROM segments WHERE collection = ? AND scope = 'VECTOR'", (str(collection.id),)
+        ).fetchall()
+    total = 0
+    for (segment_id,) in rows:
+        for root, _, files in os.walk(os.path.join(settings.CHROMA_PERSIST_DIRECTORY, segment_id)):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 / 1024
+
+
+def measure(name: str, queries: list) -> dict:
+    """Size and search latency of a collection for sample query texts."""
+    collection = get_chroma_client().get_collection(name)
+    spec = collection_embedding(name)
+    vectors = get_embedding_model(spec).embed_documents(queries) if queries else []
+    latencies, results = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        found = collection.query(query_embeddings=[vector], n_results=TOP_K, include=[])
+        latencies.append(time.perf_counter() - start)
+        results.append(set(found["ids"][0]))
+    latencies.sort()
+    dimensions = len(vectors[0]) if vectors else spec.dimensions
+    return {
+        "collection": name,
+        "embedding": str(spec),
+        "chunks": collection.count(),
+        "dimensions": dimensions,
+        "vector_mb": round(collection.count() * (dimensions or 0) * 4 / 1024 / 1024, 1),
+        "index_mb": round(index_mb(collection), 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        "results": results,
+    }
+
+
+def sample_queries(name: str, count: int) -> list:
+    """Chunk openings as stand-in questions; the same texts are used before and after."""
+    ids = get_chroma_client().get_collection(name).get(include=[])["ids"]
+    picked = random.Random(0).sample(ids, min(count, len(ids)))
+    if not picked:
+        return []
+    documents = get_chroma_client().get_collection(name).get(ids=picked, include=["documents"])["documents"]
+    return [document[:200] for document in documents]
+
+
+async def report_progress():
+    while True:
+        await asyncio.sleep(10)
+        status = get_rebuild_status()
+        print(f"  {status.get('state')}: {status.get('copying', '')} {status.get('progress', '')}", flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--dimensions", type=int, default=settings.EMBEDDING_DIMENSIONS, help="0 for the model's native size")
+    parser.add_argument("--rate", type=float, default=100, help="chunks embedded per second, 0 for no limit")
+    parser.add_argument("--keep-previous", action="store_true", help="keep the old collection so the switch can be undone")
+    parser.add_argument("--abort", action="store_true", help="drop the collection of an interrupted run")
+    args = parser.parse_args()
+
+    if settings.VECTOR_STORE_BACKEND != "chroma":
+        sys.exit("Embedding migration works on the chroma backend; re-run migrate_vectors.py after migrating")
+    await init_db()
+    active = await refresh_active_collection()
+    pending = await pending_migration()
+
+    if pending == active:
+        # Interrupted after the switch, nothing left to copy
+        await delete_config_value(MIGRATION_KEY)
+        pending = None
+    if args.abort:
+        if pending:
+            get_chroma_client().delete_collection(pending)
+            await delete_config_value(MIGRATION_KEY)
+            print(f"Dropped {pending}")
+        else:
+            print("No migration in progress")
+        return
+
+    target = EmbeddingSpec(model=args.model, dimensions=args.dimensions or None)
+    current = collection_embedding(active)
+    if pending and collection_embedding(pending) != target:
+        sys.exit(f"A migration to {collection_embedding(pending)} is pending in {pending}; resume it or --abort first")
+    if target == current and not pending:
+        print(f"{active} already uses {target}")
+        return
+
+    new_name = pending or new_collection_name()
+    print(f"Re-embedding {active} ({current}) into {new_name} ({target})" + (" (resuming)" if pending else ""))
+    await set_config_value(MIGRATION_KEY, new_name)
+
+    queries = sample_queries(active, SAMPLE_QUERIES)
+    before = measure(active, queries)
+    params = collection_params(get_chroma_client().get_collection(active))
+    progress = asyncio.create_task(report_progress())
+    try:
+        report = await rebuild_collection(
+            params,
+            new_name,
+            embedding=target,
+            rate=args.rate or None,
+            resume=True,
+            drop_previous=not args.keep_previous,
+        )
+    finally:
+        progress.cancel()
+    await delete_config_value(MIGRATION_KEY)
+    after = measure(new_name, queries)
+
+    overlap = [len(a & b) / TOP_K for a, b in zip(before["results"], after["results"])]
+    print(f"\nSwitched to {new_name} in {report['seconds']}s: {report}")
+    print(f"\n{'':<12} {'embedding':<42} {'chunks':>7} {'vector_mb':>9} {'index_mb':>8} {'p50ms':>7} {'p95ms':>7}")
+    for label, m in (("before", before), ("after", after)):
+        print(f"{label:<12} {m['embedding']:<42} {m['chunks']:>7} {m['vector_mb']:>9} {m['index_mb']:>8} "
+              f"{m['p50_ms'] if m['p50_ms'] is not None else '-':>7} {m['p95_ms'] if m['p95_ms'] is not None else '-':>7}")
+    if overlap:
+        print(f"\nTop-{TOP_K} overlap with the previous collection on {len(overlap)} sample queries: {sum(overlap) / len(overlap):.2f}")
+    if not args.keep_previous:
+        print(f"{active} was dropped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
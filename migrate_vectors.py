@@ -0,0 +1,65 @@
+"""
+Copy the Chroma collection into the NumPy vector index, reusing the stored
+embeddings so nothing is re-embedded. Chunks already in the index are
+replaced, so the copy can be re-run.
+
+Usage:
+    VECTOR_INDEX_DTYPE=int8 python migrate_vectors.py
+
+Then set VECTOR_STORE_BACKEND=numpy and restart the API. The Chroma data is
+left untouched; documents uploaded or deleted while on the numpy backend are
+not reflected in it.
+"""
+import asyncio
+import sys
+import os
+
+# Add the current directory to sys.path to allow importing backend modules
+sys.path.append(os.getcwd())
+
+from langchain_chroma import Chroma
+from backend.services.chroma_client import get_chroma_client
+from backend.services.embedding_model import EmbeddingSpec, get_embedding_model
+from backend.services.numpy_vectorstore import NumpyVectorStore
+from backend.services.vector_collections import collection_embedding, collection_metadata, refresh_active_collection
+from backend.utils.config import settings
+
+BATCH_SIZE = 1000
+
+
+def main():
+    collection_name = asyncio.run(refresh_active_collection())
+    # The index is queried with EMBEDDING_MODEL, so the stored vectors must come from it
+    if collection_embedding(collection_name) != EmbeddingSpec():
+        sys.exit(
+            f"{collection_name} was embedded with {collection_embedding(collection_name)}, not {EmbeddingSpec()}; "
+            "run migrate_embeddings.py first or change EMBEDDING_MODEL / EMBEDDING_DIMENSIONS to match"
+        )
+    embedding = get_embedding_model()
+    chroma = Chroma(
+        collection_name=collection_name,
+        embedding_function=embedding,
+        client=get_chroma_client(),
+        collection_metadata=collection_metadata()
+    )
+    index = NumpyVectorStore(
+        settings.VECTOR_INDEX_DIRECTORY,
+        embedding,
+        dtype=settings.VECTOR_INDEX_DTYPE,
+        dimensions=settings.VECTOR_INDEX_DIMENSIONS,
+    )
+
+    copied = 0
+    while True:
+        batch = chroma.get(include=["embeddings", "documents", "metadatas"], limit=BATCH_SIZE, offset=copied)
+        if not batch["ids"]:
+            break
+        index.add_embeddings(batch["documents"], batch["embeddings"], batch["metadatas"], batch["ids"])
+        copied += len(batch["ids"])
+        print(f"Copied {copied} chunks...")
+
+    print(f"\nSUCCESS: {len(index)} chunks in {settings.VECTOR_INDEX_DIRECTORY} ({index.dtype}, {index.dimensions} dimensions)")
+
+
+if __name__ == "__main__":
+    main()